@@ -10,7 +10,13 @@ load_dotenv()
 AWS_IOT_ENDPOINT = os.getenv('AWS_IOT_ENDPOINT')
 AWS_IOT_PORT = int(os.getenv('AWS_IOT_PORT', 8883))
 AWS_IOT_CLIENT_ID = os.getenv('AWS_IOT_CLIENT_ID', 'Python_Receiver')
-AWS_IOT_TOPIC = os.getenv('AWS_IOT_TOPIC', 'esp32/mpu6050/data')
+# Filtro de suscripción; el nivel '+' identifica al dispositivo
+# (ej. esp32/<device_id>/mpu6050/data). Sin comodín se usa DEFAULT_DEVICE_ID.
+AWS_IOT_TOPIC = os.getenv('AWS_IOT_TOPIC', 'esp32/+/mpu6050/data')
+# Tópico fijo de los dispositivos anteriores a multi-dispositivo; sus mensajes
+# se guardan como DEFAULT_DEVICE_ID (vacío = no suscribirse)
+AWS_IOT_LEGACY_TOPIC = os.getenv('AWS_IOT_LEGACY_TOPIC', 'esp32/mpu6050/data')
+DEFAULT_DEVICE_ID = os.getenv('DEFAULT_DEVICE_ID', 'esp32')
 
 # Certificados (desarrollo local)
 AWS_ROOT_CA = os.getenv('AWS_ROOT_CA', 'backend/certs/root-CA.pem')
@@ -28,14 +34,98 @@ TIMESCALE_PORT = int(os.getenv('TIMESCALE_PORT', 5432))
 TIMESCALE_DB = os.getenv('TIMESCALE_DB', 'tsdb')
 TIMESCALE_USER = os.getenv('TIMESCALE_USER')
 TIMESCALE_PASSWORD = os.getenv('TIMESCALE_PASSWORD')
+TIMESCALE_CONNECT_TIMEOUT = int(os.getenv('TIMESCALE_CONNECT_TIMEOUT', 5))  # segundos
+
+# Particiones por hash de device_id en el hypertable
+DEVICE_PARTITIONS = int(os.getenv('DEVICE_PARTITIONS', 4))
+
+# Tamaño de chunk (ms). CHUNK_TIME_INTERVAL es el intervalo de las tablas
+# nuevas; manage.py tune-chunks/migrate lo recalculan según el ritmo de
+# ingesta medido para que cada chunk (datos + índices) ronde CHUNK_TARGET_MB
+CHUNK_TIME_INTERVAL = int(os.getenv('CHUNK_TIME_INTERVAL_MS', 24 * 60 * 60 * 1000))
+CHUNK_TARGET_MB = float(os.getenv('CHUNK_TARGET_MB', 256))
+CHUNK_INTERVAL_MIN = int(os.getenv('CHUNK_INTERVAL_MIN_MS', 60 * 60 * 1000))
+CHUNK_INTERVAL_MAX = int(os.getenv('CHUNK_INTERVAL_MAX_MS', 30 * 24 * 60 * 60 * 1000))
+CHUNK_RATE_WINDOW = int(os.getenv('CHUNK_RATE_WINDOW_MS', 24 * 60 * 60 * 1000))  # ventana de medición
+CHUNK_ROW_BYTES = int(os.getenv('CHUNK_ROW_BYTES', 100))  # estimación si no hay datos
+
+# Migración de esquema: rango de timestamps copiado por transacción
+MIGRATION_BATCH_MS = int(os.getenv('MIGRATION_BATCH_MS', 60 * 60 * 1000))
+
+# Método de escritura: 'batch' (INSERT con execute_batch), 'copy' (COPY texto)
+# o 'copy_binary' (COPY en formato binario)
+DB_WRITE_METHODS = ('batch', 'copy', 'copy_binary')
+DB_WRITE_METHOD = os.getenv('DB_WRITE_METHOD', 'copy_binary')
+
+# Agregados continuos (rollups) sobre sensor_data, en milisegundos:
+# vista -> (ancho de intervalo, start_offset, end_offset, schedule_interval en s)
+ROLLUPS = {
+    'sensor_data_1s': (1000, 10 * 60 * 1000, 1000, 60),
+    'sensor_data_1m': (60 * 1000, 2 * 60 * 60 * 1000, 60 * 1000, 5 * 60),
+    'sensor_data_1h': (60 * 60 * 1000, 2 * 24 * 60 * 60 * 1000, 60 * 60 * 1000, 30 * 60),
+}
+
+# Compresión nativa de sensor_data: por dispositivo y ordenada por tiempo,
+# para los chunks con más de COMPRESS_AFTER ms de antigüedad
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESS_AFTER = int(float(os.getenv('COMPRESS_AFTER_HOURS', 24)) * 60 * 60 * 1000)
+
+# Retención en ms (0 = sin límite): datos crudos y cada agregado continuo.
+# Los agregados conservan su histórico aunque se borren los datos crudos.
+DAY_MS = 24 * 60 * 60 * 1000
+RAW_RETENTION = int(float(os.getenv('RAW_RETENTION_DAYS', 30)) * DAY_MS)
+ROLLUP_RETENTION = {
+    'sensor_data_1s': int(float(os.getenv('ROLLUP_1S_RETENTION_DAYS', 7)) * DAY_MS),
+    'sensor_data_1m': int(float(os.getenv('ROLLUP_1M_RETENTION_DAYS', 90)) * DAY_MS),
+    'sensor_data_1h': int(float(os.getenv('ROLLUP_1H_RETENTION_DAYS', 0)) * DAY_MS),
+}
 
 # Aplicación
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_FORMAT_WORKER = '%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
 DASH_DEBUG = os.getenv('DASH_DEBUG', 'False').lower() == 'true'
 DASH_HOST = os.getenv('DASH_HOST', '0.0.0.0')
 DASH_PORT = int(os.getenv('DASH_PORT', 8050))
 
+# Canal de NOTIFY emitido tras cada lote guardado, con el dispositivo y el
+# primer y último timestamp insertados (vacío = desactivado); debe coincidir con NOTIFY_CHANNEL
+# en frontend/config.py
+NOTIFY_CHANNEL = os.getenv('NOTIFY_CHANNEL', 'sensor_data_changes')
+
+# Endpoint de métricas de Prometheus del receptor (/metrics; 0 = desactivado)
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+
+# Ingesta (cola de escritura diferida)
+INGEST_QUEUE_MAX_SIZE = int(os.getenv('INGEST_QUEUE_MAX_SIZE', 1000))  # mensajes
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 2000))  # muestras por transacción
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 1.0))  # segundos
+INGEST_PUT_TIMEOUT = float(os.getenv('INGEST_PUT_TIMEOUT', 5.0))  # segundos de espera con cola llena
+INGEST_DRAIN_TIMEOUT = float(os.getenv('INGEST_DRAIN_TIMEOUT', 25.0))  # segundos para vaciar al detener
+
+# Procesos escritores (0 = decodificación y escritura en el proceso del
+# receptor). Con N > 0 el callback MQTT solo encola el payload y N procesos,
+# cada uno con su conexión, lo decodifican y escriben; los dispositivos se
+# reparten por hash para conservar el orden de cada uno
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 0))
+INGEST_WORKER_QUEUE_SIZE = int(os.getenv('INGEST_WORKER_QUEUE_SIZE', 1000))  # payloads por proceso
+
+# Filtro en memoria de duplicados recientes (reentrega de QoS 1 tras reconectar)
+DEDUP_MESSAGES = int(os.getenv('DEDUP_MESSAGES', 10000))  # payloads recordados (0 = desactivado)
+DEDUP_SAMPLES_PER_DEVICE = int(os.getenv('DEDUP_SAMPLES_PER_DEVICE', 20000))  # timestamps por dispositivo
+
+# Spool en disco para lotes que no se pudieron guardar (usar un disco
+# persistente para conservarlo entre despliegues)
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'backend/spool')
+SPOOL_SEGMENT_MB = float(os.getenv('SPOOL_SEGMENT_MB', 8))
+SPOOL_MAX_MB = float(os.getenv('SPOOL_MAX_MB', 512))
+# Un segmento que falla tantas veces seguidas justo después de reconectar se
+# aparta a SPOOL_DIR/quarantine en vez de bloquear la reproducción
+SPOOL_REPLAY_ATTEMPTS = int(os.getenv('SPOOL_REPLAY_ATTEMPTS', 3))
+DB_RETRY_MIN = float(os.getenv('DB_RETRY_MIN', 1.0))  # segundos entre reconexiones (inicial)
+DB_RETRY_MAX = float(os.getenv('DB_RETRY_MAX', 60.0))  # segundos entre reconexiones (máximo)
+
 def validate_config():
     """Validar variables críticas"""
     required = {
@@ -53,6 +143,20 @@ def validate_config():
             f"Verifica tu archivo .env o las variables del servidor"
         )
     
+    if DB_WRITE_METHOD not in DB_WRITE_METHODS:
+        raise ValueError(
+            f"DB_WRITE_METHOD inválido: {DB_WRITE_METHOD} "
+            f"(opciones: {', '.join(DB_WRITE_METHODS)})"
+        )
+    
+    # Los agregados se refrescan desde los datos crudos: estos deben
+    # conservarse al menos durante la ventana de refresco
+    for view, (width, start_offset, end_offset, schedule) in ROLLUPS.items():
+        if RAW_RETENTION and RAW_RETENTION <= start_offset:
+            raise ValueError(
+                f"RAW_RETENTION_DAYS debe superar la ventana de refresco de {view}"
+            )
+    
     return True
 
 # Validar al importar
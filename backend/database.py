@@ -3,19 +3,241 @@ Gestión de base de datos TimescaleDB
 """
 import psycopg2
 from psycopg2.extras import execute_batch
+import json
 import logging
+import struct
+import time
+import numpy as np
 from config import (
     TIMESCALE_HOST, TIMESCALE_PORT, TIMESCALE_DB,
-    TIMESCALE_USER, TIMESCALE_PASSWORD
+    TIMESCALE_USER, TIMESCALE_PASSWORD, TIMESCALE_CONNECT_TIMEOUT,
+    DB_WRITE_METHOD, ROLLUPS, DEFAULT_DEVICE_ID, DEVICE_PARTITIONS,
+    CHUNK_TIME_INTERVAL, COMPRESSION_ENABLED, COMPRESS_AFTER,
+    RAW_RETENTION, ROLLUP_RETENTION, NOTIFY_CHANNEL
+)
+from samples import AXES, from_dicts
+from metrics import (
+    BATCH_SAMPLES, COMMIT_SECONDS, SAMPLES_WRITTEN, DUPLICATE_SAMPLES, DB_ERRORS
 )
 
 logger = logging.getLogger(__name__)
 
+# ====
+# ESQUEMA
+# ====
+# Sin columna id: un SERIAL obliga a cada inserción a pasar por la
+# secuencia y las consultas identifican las filas por (device_id, timestamp).
+# Columnas de ancho fijo primero y device_id (TEXT) al final, para no
+# desperdiciar relleno de alineación en cada fila.
+SENSOR_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        timestamp BIGINT NOT NULL,
+        ax DOUBLE PRECISION NOT NULL,
+        ay DOUBLE PRECISION NOT NULL,
+        az DOUBLE PRECISION NOT NULL,
+        gx DOUBLE PRECISION NOT NULL,
+        gy DOUBLE PRECISION NOT NULL,
+        gz DOUBLE PRECISION NOT NULL,
+        received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        device_id TEXT NOT NULL
+    );
+"""
+
+# Hypertable por tiempo con particiones por dispositivo. Sin los índices por
+# defecto de TimescaleDB, que duplicarían los de SENSOR_INDEXES
+SENSOR_HYPERTABLE_SQL = """
+    SELECT create_hypertable(%(table)s, 'timestamp',
+        partitioning_column => 'device_id',
+        number_partitions => %(partitions)s,
+        chunk_time_interval => %(interval)s::BIGINT,
+        create_default_indexes => FALSE,
+        if_not_exists => TRUE);
+"""
+
+# Índices según los accesos. La clave única (device_id, timestamp) descarta
+# las muestras repetidas al escribir (ON CONFLICT DO NOTHING) y sirve a las
+# consultas del dashboard, que filtran siempre por dispositivo y rango (y
+# piden la última muestra de cada uno); el índice por tiempo es para el
+# refresco de los agregados continuos
+SENSOR_UNIQUE_INDEX = 'uq_sensor_device_timestamp'
+SENSOR_INDEXES = {
+    SENSOR_UNIQUE_INDEX: "CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} (device_id, timestamp DESC)",
+    'idx_sensor_timestamp': "CREATE INDEX IF NOT EXISTS {name} ON {table} (timestamp DESC)",
+}
+
+# Índice (device_id, timestamp) no único anterior a la clave única
+LEGACY_DEVICE_INDEX = 'idx_sensor_device_timestamp'
+
+# ====
+# COPY
+# ====
+# Los lotes se cargan en una tabla temporal (sin índices ni restricciones)
+# y se pasan a sensor_data omitiendo las claves ya existentes, de modo que
+# la reentrega de mensajes no duplica filas. El paso devuelve, por
+# dispositivo, las filas realmente insertadas y su último timestamp
+SAMPLE_COLUMNS = "device_id, timestamp, ax, ay, az, gx, gy, gz"
+
+STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS sensor_data_staging (
+        device_id TEXT,
+        timestamp BIGINT,
+        ax DOUBLE PRECISION, ay DOUBLE PRECISION, az DOUBLE PRECISION,
+        gx DOUBLE PRECISION, gy DOUBLE PRECISION, gz DOUBLE PRECISION
+    ) ON COMMIT DELETE ROWS;
+"""
+
+COPY_SQL = f"COPY sensor_data_staging ({SAMPLE_COLUMNS}) FROM STDIN"
+
+MERGE_STAGING_SQL = f"""
+    WITH inserted AS (
+        INSERT INTO sensor_data ({SAMPLE_COLUMNS})
+        SELECT {SAMPLE_COLUMNS} FROM sensor_data_staging
+        ON CONFLICT DO NOTHING
+        RETURNING device_id, timestamp
+    )
+    SELECT device_id, COUNT(*), MIN(timestamp), MAX(timestamp) FROM inserted GROUP BY device_id
+"""
+
+# Aviso a los dashboards (LISTEN): se entrega solo si la transacción se
+# confirma, así que nunca anuncia datos que no llegaron a guardarse
+NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+# Formato binario de COPY: firma + flags + longitud de extensión de cabecera
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('!h', -1)
+
+def pgcopy_row_dtype(device_len):
+    """Formato de fila de COPY binario para un device_id de device_len bytes.
+
+    Por fila: nº de campos y, por campo, longitud + valor (TEXT, BIGINT y
+    6 DOUBLE), en big-endian y sin relleno, para construir el lote completo
+    con NumPy. Dentro de un mismo dispositivo todas las filas miden igual.
+    """
+    return np.dtype(
+        [('fields', '>i2'), ('device_len', '>i4'), ('device', f'S{device_len}'),
+         ('t_len', '>i4'), ('t', '>i8')]
+        + [field for axis in AXES for field in ((f'{axis}_len', '>i4'), (axis, '>f8'))]
+    )
+
+# Filas agrupadas por cada bloque que se entrega a psycopg2
+COPY_CHUNK_ROWS = 1000
+
+# ====
+# AGREGADOS CONTINUOS
+# ====
+ACCEL_MAGNITUDE_SQL = "sqrt(ax * ax + ay * ay + az * az)"
+GYRO_MAGNITUDE_SQL = "sqrt(gx * gx + gy * gy + gz * gz)"
+
+# Estadísticas por eje y de magnitud; samples permite recombinar medias
+ROLLUP_VIEW_SQL = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {{view}}
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT
+        device_id,
+        time_bucket({{width}}::BIGINT, timestamp) AS bucket,
+        COUNT(*) AS samples,
+        AVG(ax) AS ax_avg, AVG(ay) AS ay_avg, AVG(az) AS az_avg,
+        AVG(gx) AS gx_avg, AVG(gy) AS gy_avg, AVG(gz) AS gz_avg,
+        MIN({ACCEL_MAGNITUDE_SQL}) AS accel_min,
+        MAX({ACCEL_MAGNITUDE_SQL}) AS accel_max,
+        AVG({ACCEL_MAGNITUDE_SQL}) AS accel_avg,
+        MIN({GYRO_MAGNITUDE_SQL}) AS gyro_min,
+        MAX({GYRO_MAGNITUDE_SQL}) AS gyro_max,
+        AVG({GYRO_MAGNITUDE_SQL}) AS gyro_avg
+    FROM sensor_data
+    GROUP BY device_id, bucket
+    WITH NO DATA;
+"""
+
+def _text_chunks(groups):
+    """Generar bloques de COPY en formato texto ({device_id: muestras})"""
+    lines = []
+    for device_id, samples in groups.items():
+        for t, ax, ay, az, gx, gy, gz in samples.tolist():
+            lines.append('%s\t%d\t%r\t%r\t%r\t%r\t%r\t%r\n' % (
+                device_id, t, ax, ay, az, gx, gy, gz
+            ))
+            if len(lines) >= COPY_CHUNK_ROWS:
+                yield ''.join(lines).encode('utf-8')
+                lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+def _binary_chunks(groups):
+    """Generar el contenido de COPY binario para {device_id: muestras}.
+
+    Las filas de cada dispositivo se arman en un único array estructurado
+    con el formato de PostgreSQL, sin pasar por objetos Python por muestra.
+    """
+    yield PGCOPY_HEADER
+    for device_id, samples in groups.items():
+        device = device_id.encode('utf-8')
+        rows = np.empty(len(samples), dtype=pgcopy_row_dtype(len(device)))
+        rows['fields'] = 2 + len(AXES)
+        rows['device_len'] = len(device)
+        rows['device'] = device
+        rows['t_len'] = 8
+        rows['t'] = samples['t']
+        for axis in AXES:
+            rows[f'{axis}_len'] = 8
+            rows[axis] = samples[axis]
+        yield rows.tobytes()
+    yield PGCOPY_TRAILER
+
+class CopyStream:
+    """Fichero de solo lectura que produce el contenido de COPY bajo demanda.
+
+    Permite pasar las muestras a copy_expert sin materializar todo el
+    lote en un único buffer.
+    """
+    
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b'')
+        self._offset = 0
+    
+    def read(self, size=-1):
+        parts = []
+        remaining = size
+        while remaining != 0:
+            if self._offset >= len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk = memoryview(chunk)
+                self._offset = 0
+            
+            end = len(self._chunk)
+            if remaining > 0:
+                end = min(end, self._offset + remaining)
+                remaining -= end - self._offset
+            parts.append(self._chunk[self._offset:end])
+            self._offset = end
+        return b''.join(parts)
+    
+    def readline(self, size=-1):
+        return self.read(size)
+
+class BatchRejected(Exception):
+    """La base de datos rechazó el contenido de un lote: reintentarlo no sirve"""
+
+# Errores que no dependen del lote (conexión caída, sin respuesta, réplica de
+# solo lectura, esquema pendiente): el lote se reintenta más tarde
+RETRYABLE_ERRORS = (
+    psycopg2.OperationalError, psycopg2.InterfaceError,
+    psycopg2.InternalError, psycopg2.ProgrammingError,
+)
+
 class DatabaseManager:
     """Gestor de conexión y operaciones con TimescaleDB"""
     
-    def __init__(self):
+    def __init__(self, write_method=DB_WRITE_METHOD):
         self.conn = None
+        self.write_method = write_method
+        self.duplicate_samples = 0
+        # Esquema sin verificar (p. ej. sin conexión al iniciar): al reconectar
+        self.schema_pending = False
+        self._staging_ready = False
     
     def connect(self):
         """Establecer conexión con TimescaleDB"""
@@ -28,10 +250,17 @@ class DatabaseManager:
                 database=TIMESCALE_DB,
                 user=TIMESCALE_USER,
                 password=TIMESCALE_PASSWORD,
-                sslmode='require'
+                sslmode='require',
+                connect_timeout=TIMESCALE_CONNECT_TIMEOUT,
+                # Detectar conexiones muertas en vez de bloquear el commit
+                keepalives=1,
+                keepalives_idle=30,
+                keepalives_interval=10,
+                keepalives_count=3
             )
             
             self.conn.autocommit = False
+            self._staging_ready = False
             logger.info("Conectado a TimescaleDB")
             
         except psycopg2.OperationalError as e:
@@ -50,31 +279,47 @@ class DatabaseManager:
                 logger.info(f"TimescaleDB versión: {version[0]}")
             
             # Crear tabla
+            cursor.execute(SENSOR_TABLE_SQL.format(table='sensor_data'))
+            
+            # Tablas anteriores a multi-dispositivo: los datos existentes
+            # pertenecen al dispositivo por defecto. ALTER TABLE bloquea el
+            # hypertable y todos sus chunks, así que solo se ejecuta si falta
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sensor_data (
-                    id SERIAL,
-                    timestamp BIGINT NOT NULL,
-                    ax DOUBLE PRECISION NOT NULL,
-                    ay DOUBLE PRECISION NOT NULL,
-                    az DOUBLE PRECISION NOT NULL,
-                    gx DOUBLE PRECISION NOT NULL,
-                    gy DOUBLE PRECISION NOT NULL,
-                    gz DOUBLE PRECISION NOT NULL,
-                    received_at TIMESTAMPTZ DEFAULT NOW()
-                );
+                SELECT column_default FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'sensor_data' AND column_name = 'device_id'
             """)
+            device_column = cursor.fetchone()
+            if device_column is None:
+                cursor.execute(
+                    "ALTER TABLE sensor_data ADD COLUMN device_id TEXT NOT NULL DEFAULT %s",
+                    (DEFAULT_DEVICE_ID,)
+                )
+                logger.info(f"Columna device_id agregada (datos existentes: {DEFAULT_DEVICE_ID})")
+            if device_column is None or device_column[0] is not None:
+                cursor.execute("ALTER TABLE sensor_data ALTER COLUMN device_id DROP DEFAULT")
             self.conn.commit()
             logger.info("Tabla sensor_data verificada")
             
-            # Convertir a hypertable
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'sensor_data' AND column_name = 'id'
+            """)
+            if cursor.fetchone():
+                logger.warning(
+                    "sensor_data tiene el esquema anterior (columna id SERIAL); "
+                    "migrar con: python backend/manage.py migrate"
+                )
+            
+            # Convertir a hypertable, con particiones por dispositivo
             try:
-                cursor.execute("""
-                    SELECT create_hypertable('sensor_data', 'timestamp', 
-                        chunk_time_interval => 8640000, 
-                        if_not_exists => TRUE);
-                """)
+                cursor.execute(SENSOR_HYPERTABLE_SQL, {
+                    'table': 'sensor_data',
+                    'partitions': DEVICE_PARTITIONS,
+                    'interval': CHUNK_TIME_INTERVAL,
+                })
                 self.conn.commit()
-                logger.info("Hypertable creada")
+                logger.info("Hypertable verificada")
             except Exception as e:
                 if "already a hypertable" in str(e):
                     logger.info("Hypertable ya existe")
@@ -82,42 +327,311 @@ class DatabaseManager:
                     logger.warning(f"No se pudo crear hypertable: {e}")
                 self.conn.rollback()
             
-            # Crear índice
+            # Hypertables creados sin dimensión de dispositivo (solo si están vacíos)
+            try:
+                cursor.execute("""
+                    SELECT add_dimension('sensor_data', 'device_id',
+                        number_partitions => %s, if_not_exists => TRUE);
+                """, (DEVICE_PARTITIONS,))
+                self.conn.commit()
+            except Exception as e:
+                logger.warning(
+                    f"No se pudo particionar sensor_data por dispositivo "
+                    f"(migrar con: python backend/manage.py migrate): {e}"
+                )
+                self.conn.rollback()
+            
+            self.conn.commit()
+            
+            # Crear índices. La clave única falla si ya hay duplicados: se
+            # conserva el índice anterior hasta migrar los datos
+            for name, sql in SENSOR_INDEXES.items():
+                try:
+                    cursor.execute(sql.format(name=name, table='sensor_data'))
+                    self.conn.commit()
+                except psycopg2.IntegrityError as e:
+                    self.conn.rollback()
+                    logger.warning(
+                        f"No se pudo crear {name}, sensor_data tiene filas duplicadas "
+                        f"(migrar con: python backend/manage.py migrate): {e}"
+                    )
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {LEGACY_DEVICE_INDEX} "
+                        f"ON sensor_data (device_id, timestamp DESC)"
+                    )
+                    self.conn.commit()
+            cursor.execute(f"""
+                SELECT 1 FROM pg_indexes
+                WHERE tablename = 'sensor_data' AND indexname = '{SENSOR_UNIQUE_INDEX}'
+            """)
+            if cursor.fetchone():
+                cursor.execute(f"DROP INDEX IF EXISTS {LEGACY_DEVICE_INDEX}")
+            
+            # Dispositivos conocidos (para el selector del dashboard)
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_sensor_timestamp 
-                ON sensor_data (timestamp DESC);
+                CREATE TABLE IF NOT EXISTS devices (
+                    device_id TEXT PRIMARY KEY,
+                    first_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+            """)
+            cursor.execute("""
+                INSERT INTO devices (device_id)
+                SELECT DISTINCT device_id FROM sensor_data
+                WHERE NOT EXISTS (SELECT 1 FROM devices)
+                ON CONFLICT DO NOTHING;
             """)
             self.conn.commit()
             cursor.close()
+            
+            self.initialize_rollups()
+            self.initialize_policies()
             logger.info("Base de datos inicializada")
             
         except Exception as e:
             logger.error(f"Error al inicializar BD: {e}")
             raise
     
-    def save_samples(self, samples):
-        """Guardar muestras en la base de datos"""
+    def initialize_rollups(self):
+        """Crear agregados continuos y sus políticas de refresco"""
+        try:
+            cursor = self.conn.cursor()
+            
+            # Los hypertables con tiempo entero necesitan una función "ahora"
+            # para las políticas (timestamps en ms desde epoch)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION sensor_data_now() RETURNS BIGINT
+                LANGUAGE SQL STABLE AS
+                $$ SELECT (EXTRACT(EPOCH FROM NOW()) * 1000)::BIGINT $$;
+            """)
+            cursor.execute("""
+                SELECT set_integer_now_func('sensor_data', 'sensor_data_now',
+                    replace_if_exists => TRUE);
+            """)
+            self.conn.commit()
+            
+            created = []
+            for view, (width, start_offset, end_offset, schedule) in ROLLUPS.items():
+                cursor.execute("""
+                    SELECT 1 FROM timescaledb_information.continuous_aggregates
+                    WHERE view_name = %s
+                """, (view,))
+                exists = cursor.fetchone() is not None
+                
+                # Agregados anteriores a multi-dispositivo: recrearlos
+                if exists:
+                    cursor.execute("""
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_name = %s AND column_name = 'device_id'
+                    """, (view,))
+                    if not cursor.fetchone():
+                        logger.info(f"Recreando {view} con device_id")
+                        cursor.execute(f"DROP MATERIALIZED VIEW {view}")
+                        exists = False
+                
+                if not exists:
+                    cursor.execute(ROLLUP_VIEW_SQL.format(view=view, width=int(width)))
+                    created.append(view)
+                
+                cursor.execute("""
+                    SELECT add_continuous_aggregate_policy(%s,
+                        start_offset => %s::BIGINT,
+                        end_offset => %s::BIGINT,
+                        schedule_interval => make_interval(secs => %s),
+                        if_not_exists => TRUE);
+                """, (view, start_offset, end_offset, schedule))
+                self.conn.commit()
+                logger.info(f"Agregado continuo {view} verificado")
+            
+            cursor.close()
+            
+            # Materializar el histórico de los agregados recién creados
+            if created:
+                self.refresh_rollups(created)
+            
+        except Exception as e:
+            logger.warning(f"No se pudieron crear los agregados continuos: {e}")
+            self.conn.rollback()
+    
+    def initialize_policies(self):
+        """Configurar compresión y retención según config.py.
+
+        Las políticas se reemplazan en cada inicio para aplicar los cambios
+        de configuración. Requiere la función "ahora" de initialize_rollups.
+        """
+        try:
+            cursor = self.conn.cursor()
+            
+            # Compresión: segmentos por dispositivo, ordenados por tiempo
+            cursor.execute("""
+                SELECT remove_compression_policy('sensor_data', if_exists => TRUE);
+            """)
+            if COMPRESSION_ENABLED:
+                cursor.execute("""
+                    SELECT compression_enabled FROM timescaledb_information.hypertables
+                    WHERE hypertable_name = 'sensor_data'
+                """)
+                row = cursor.fetchone()
+                if row and not row[0]:
+                    cursor.execute("""
+                        ALTER TABLE sensor_data SET (
+                            timescaledb.compress,
+                            timescaledb.compress_segmentby = 'device_id',
+                            timescaledb.compress_orderby = 'timestamp DESC'
+                        );
+                    """)
+                cursor.execute("""
+                    SELECT add_compression_policy('sensor_data',
+                        compress_after => %s::BIGINT, if_not_exists => TRUE);
+                """, (COMPRESS_AFTER,))
+            self.conn.commit()
+            if COMPRESSION_ENABLED:
+                logger.info(f"Compresión de chunks con más de {COMPRESS_AFTER / 3600000:g} h")
+            else:
+                logger.info("Compresión desactivada")
+            
+            # Retención de datos crudos y de cada agregado
+            retention = dict(ROLLUP_RETENTION, sensor_data=RAW_RETENTION)
+            for relation, drop_after in retention.items():
+                cursor.execute(
+                    "SELECT remove_retention_policy(%s, if_exists => TRUE);", (relation,)
+                )
+                if drop_after:
+                    cursor.execute("""
+                        SELECT add_retention_policy(%s,
+                            drop_after => %s::BIGINT, if_not_exists => TRUE);
+                    """, (relation, drop_after))
+                self.conn.commit()
+                days = f'{drop_after / 86400000:g} días' if drop_after else 'sin límite'
+                logger.info(f"Retención de {relation}: {days}")
+            
+            cursor.close()
+            
+        except Exception as e:
+            logger.warning(f"No se pudieron configurar compresión y retención: {e}")
+            self.conn.rollback()
+    
+    def refresh_rollups(self, views=None, start=None, end=None):
+        """Refrescar agregados continuos en el rango [start, end) (ms)"""
+        # refresh_continuous_aggregate no admite bloques de transacción
+        self.conn.autocommit = True
+        try:
+            cursor = self.conn.cursor()
+            for view in views or ROLLUPS:
+                logger.info(f"Refrescando {view}...")
+                cursor.execute(
+                    "CALL refresh_continuous_aggregate(%s, %s::BIGINT, %s::BIGINT)",
+                    (view, start, end)
+                )
+            cursor.close()
+        finally:
+            self.conn.autocommit = False
+    
+    def is_connected(self):
+        """La conexión existe y no está cerrada"""
+        return self.conn is not None and not self.conn.closed
+    
+    def reconnect(self):
+        """Descartar la conexión actual y abrir una nueva (y verificar el esquema si falta)"""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+            self.conn = None
+        self.connect()
+        if self.schema_pending:
+            self.initialize_schema()
+            self.schema_pending = False
+    
+    def save_samples(self, samples, device_id=DEFAULT_DEVICE_ID):
+        """Guardar muestras del payload JSON ({'t', 'a', 'g'}) en la base de datos"""
+        return self.save_rows(from_dicts(samples), device_id)
+    
+    def save_rows(self, rows, device_id=DEFAULT_DEVICE_ID):
+        """Guardar un array de muestras (SAMPLE_DTYPE) de un dispositivo"""
+        return self.save_groups({device_id: rows})
+    
+    def save_groups(self, groups):
+        """Guardar {device_id: array de muestras} en una única transacción.
+
+        Las muestras cuya clave (device_id, timestamp) ya existe se omiten.
+        Devuelve False si no se pudieron guardar por la conexión (reintentar
+        más tarde) y lanza BatchRejected si el error es del propio lote
+        (valores fuera de rango, restricciones, datos que no se pueden
+        codificar).
+        """
+        if not self.is_connected():
+            return False
+
+        start = time.perf_counter()
         try:
             cursor = self.conn.cursor()
             
-            data_to_insert = [
-                (s['t'], s['a'][0], s['a'][1], s['a'][2], 
-                 s['g'][0], s['g'][1], s['g'][2])
-                for s in samples
-            ]
+            if not self._staging_ready:
+                cursor.execute(STAGING_TABLE_SQL)
+                self._staging_ready = True
+            
+            if self.write_method == 'copy_binary':
+                cursor.copy_expert(
+                    COPY_SQL + " WITH (FORMAT binary)",
+                    CopyStream(_binary_chunks(groups))
+                )
+            elif self.write_method == 'copy':
+                cursor.copy_expert(COPY_SQL, CopyStream(_text_chunks(groups)))
+            else:
+                execute_batch(cursor, f"""
+                    INSERT INTO sensor_data_staging ({SAMPLE_COLUMNS})
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, [(device_id,) + row
+                      for device_id, samples in groups.items()
+                      for row in samples.tolist()])
+            
+            cursor.execute(MERGE_STAGING_SQL)
+            changes = cursor.fetchall()
+            inserted = sum(count for _, count, _, _ in changes)
+            
+            # Los lotes repetidos por completo no generan aviso; el rango
+            # [min_ts, max_ts] permite ver también filas antiguas (spool)
+            if NOTIFY_CHANNEL and changes:
+                execute_batch(cursor, NOTIFY_SQL, [
+                    (NOTIFY_CHANNEL, json.dumps({'device': device_id,
+                                                 'min_ts': oldest, 'max_ts': newest}))
+                    for device_id, _, oldest, newest in changes
+                ])
             
             execute_batch(cursor, """
-                INSERT INTO sensor_data (timestamp, ax, ay, az, gx, gy, gz)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, data_to_insert)
+                INSERT INTO devices (device_id) VALUES (%s)
+                ON CONFLICT (device_id) DO UPDATE SET last_seen = NOW()
+            """, [(device_id,) for device_id in groups])
             
             self.conn.commit()
             cursor.close()
-            logger.info(f"{len(samples)} registros guardados")
+            total = sum(len(samples) for samples in groups.values())
+            self.duplicate_samples += total - inserted
+            COMMIT_SECONDS.observe(time.perf_counter() - start)
+            BATCH_SAMPLES.observe(total)
+            SAMPLES_WRITTEN.inc(inserted)
+            DUPLICATE_SAMPLES.inc(total - inserted)
+            logger.debug(
+                f"{inserted} registros guardados ({len(groups)} dispositivos, "
+                f"{total - inserted} duplicados descartados)"
+            )
+            return True
             
         except Exception as e:
+            DB_ERRORS.inc()
             logger.error(f"Error al guardar: {e}")
-            self.conn.rollback()
+            if self.is_connected():
+                try:
+                    self.conn.rollback()
+                except psycopg2.Error:
+                    pass
+            # La tabla temporal se crea en la transacción: con rollback desaparece
+            self._staging_ready = False
+            if isinstance(e, RETRYABLE_ERRORS):
+                return False
+            raise BatchRejected(str(e)) from e
     
     def get_stats(self):
         """Obtener estadísticas de la base de datos"""
@@ -0,0 +1,79 @@
+"""
+Filtro en memoria de mensajes y muestras recibidos recientemente
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import DEDUP_MESSAGES, DEDUP_SAMPLES_PER_DEVICE
+
+class RecentKeyFilter:
+    """Descarta antes de encolar los duplicados de la reentrega QoS 1.
+
+    Tras una reconexión el broker reenvía los mensajes sin confirmar con
+    el mismo payload, así que basta un resumen del payload por dispositivo
+    para descartarlos sin decodificarlos. Además se recuerdan los últimos
+    timestamps de cada dispositivo para filtrar muestras repetidas en
+    mensajes distintos. Lo que escape al filtro lo descarta la clave única
+    (device_id, timestamp) de la base de datos.
+
+    Las claves se registran con remember() solo cuando el mensaje se
+    encoló, para no descartar la reentrega de un mensaje que se perdió.
+    """
+
+    def __init__(self, max_messages=DEDUP_MESSAGES, samples_per_device=DEDUP_SAMPLES_PER_DEVICE):
+        self.max_messages = max_messages
+        self.samples_per_device = samples_per_device
+        self._messages = OrderedDict()
+        self._timestamps = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(device_id, payload):
+        digest = hashlib.blake2b(device_id.encode('utf-8') + b'\0', digest_size=16)
+        digest.update(payload)
+        return digest.digest()
+
+    def is_duplicate_message(self, device_id, payload):
+        """El mismo payload del mismo dispositivo ya se encoló"""
+        if not self.max_messages:
+            return False
+        with self._lock:
+            return self._digest(device_id, payload) in self._messages
+
+    def new_samples(self, device_id, samples):
+        """Muestras cuyo timestamp no se encoló recientemente para el dispositivo"""
+        if not self.samples_per_device or len(samples) == 0:
+            return samples
+        with self._lock:
+            recent = self._timestamps.get(device_id)
+            if recent is None:
+                return samples
+            ring, size, _ = recent
+            seen = np.isin(samples['t'], ring[:size])
+        return samples[~seen] if seen.any() else samples
+
+    def remember(self, device_id, payload, samples):
+        """Registrar el payload y los timestamps de un mensaje encolado"""
+        with self._lock:
+            if self.max_messages:
+                self._messages[self._digest(device_id, payload)] = None
+                while len(self._messages) > self.max_messages:
+                    self._messages.popitem(last=False)
+
+            if self.samples_per_device and len(samples):
+                self._remember_timestamps(device_id, samples['t'])
+
+    def _remember_timestamps(self, device_id, timestamps):
+        """Anexar timestamps al buffer circular del dispositivo"""
+        capacity = self.samples_per_device
+        ring, size, cursor = self._timestamps.get(device_id, (None, 0, 0))
+        if ring is None:
+            ring = np.empty(capacity, dtype=np.int64)
+
+        # El orden no importa para isin: se sobrescriben las posiciones más antiguas
+        timestamps = timestamps[-capacity:]
+        ring[(cursor + np.arange(len(timestamps))) % capacity] = timestamps
+        self._timestamps[device_id] = (
+            ring, min(capacity, size + len(timestamps)), (cursor + len(timestamps)) % capacity
+        )
@@ -0,0 +1,364 @@
+"""
+Cola de escritura diferida entre MQTT y TimescaleDB
+"""
+import logging
+import queue
+import threading
+import time
+from config import (
+    INGEST_QUEUE_MAX_SIZE, INGEST_BATCH_SIZE,
+    INGEST_FLUSH_INTERVAL, INGEST_PUT_TIMEOUT,
+    DB_RETRY_MIN, DB_RETRY_MAX, SPOOL_REPLAY_ATTEMPTS
+)
+from database import BatchRejected
+from metrics import (
+    DROPPED_MESSAGES, DB_ERRORS, DB_RECONNECTS, QUARANTINED_SAMPLES, LOST_SAMPLES
+)
+from samples import concat
+from spool import DiskSpool
+
+logger = logging.getLogger(__name__)
+
+def group_by_device(batch):
+    """Agrupar pares (device_id, muestras) en {device_id: array concatenado}"""
+    arrays = {}
+    for device_id, samples in batch:
+        arrays.setdefault(device_id, []).append(samples)
+    return {device_id: concat(parts) for device_id, parts in arrays.items()}
+
+class IngestQueue:
+    """Cola acotada con un hilo escritor que agrupa muestras en transacciones.
+
+    Si la base de datos no responde (o no había conexión al crearla), los
+    lotes se anexan al spool en disco y el mismo hilo reintenta la conexión
+    con espera exponencial; al recuperarla reproduce el spool segmento a
+    segmento, intercalado con los lotes nuevos.
+
+    Un lote que la base de datos rechaza por su contenido (BatchRejected)
+    no se reintenta: va a la cuarentena del spool. Lo mismo un segmento que
+    falla replay_attempts veces seguidas justo después de reconectar. Si el
+    spool no se puede escribir (p. ej. disco lleno) el lote se pierde y se
+    contabiliza, sin detener el hilo escritor.
+    """
+
+    def __init__(self, db_manager, spool=None, max_size=INGEST_QUEUE_MAX_SIZE,
+                 batch_size=INGEST_BATCH_SIZE, flush_interval=INGEST_FLUSH_INTERVAL,
+                 put_timeout=INGEST_PUT_TIMEOUT, replay_attempts=SPOOL_REPLAY_ATTEMPTS):
+        self.db_manager = db_manager
+        self.spool = spool or DiskSpool()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.replay_attempts = replay_attempts
+        self.queue = queue.Queue(maxsize=max_size)
+        self.dropped_messages = 0
+        self.lost_samples = 0
+        self.flushed_batches = 0
+        self.flushed_samples = 0
+        self.reconnects = 0
+        self.db_errors = 0
+        # Sin conexión inicial se empieza en modo spool
+        self.db_available = db_manager.is_connected()
+        self._spool_pending = self.spool.has_pending()
+        self._retry_delay = DB_RETRY_MIN
+        self._next_retry = 0.0
+        # Fallos seguidos del segmento en reproducción tras reconectar
+        self._replay_failures = (None, 0)
+        # Lote que el hilo escritor está guardando (para spool_remaining)
+        self._inflight = None
+        self._abandoned = None
+        self._spool_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Iniciar el hilo escritor"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='ingest-writer', daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Cola de ingesta iniciada (lote: {self.batch_size} muestras, "
+            f"intervalo: {self.flush_interval}s)"
+        )
+
+    def put(self, device_id, samples):
+        """Encolar el array de muestras de un mensaje de device_id.
+
+        Si la cola está llena bloquea al llamador hasta put_timeout
+        (contrapresión sobre el hilo de red MQTT); pasado ese tiempo el
+        mensaje se descarta y se contabiliza.
+        """
+        if len(samples) == 0:
+            return True
+
+        try:
+            self.queue.put((device_id, samples), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped_messages += 1
+            DROPPED_MESSAGES.inc()
+            logger.warning(
+                f"Cola de ingesta llena ({self.depth()} mensajes), "
+                f"mensaje descartado ({self.dropped_messages} en total)"
+            )
+            return False
+
+    def depth(self):
+        """Mensajes pendientes de escribir"""
+        return self.queue.qsize()
+
+    def stats(self):
+        """Contadores de la cola"""
+        return {
+            'depth': self.depth(),
+            'flushed_batches': self.flushed_batches,
+            'flushed_samples': self.flushed_samples,
+            'dropped_messages': self.dropped_messages,
+            'lost_samples': self.lost_samples,
+            'db_available': self.db_available,
+            'db_errors': self.db_errors,
+            'reconnects': self.reconnects,
+            'spool': self.spool.stats(),
+        }
+
+    def stop(self, timeout=None):
+        """Detener el hilo escritor tras vaciar la cola.
+
+        Devuelve False si la cola no terminó de vaciarse en timeout segundos.
+        """
+        if not self._thread:
+            return True
+
+        logger.info(f"Vaciando cola de ingesta ({self.depth()} mensajes pendientes)...")
+        self._stop_event.set()
+        self._thread.join(timeout)
+
+        if self._thread.is_alive():
+            logger.error(
+                f"La cola de ingesta no se vació en {timeout}s "
+                f"({self.depth()} mensajes pendientes)"
+            )
+            return False
+
+        self._thread = None
+        stats = self.stats()
+        logger.info(
+            f"Cola de ingesta detenida: {stats['flushed_samples']} muestras en "
+            f"{stats['flushed_batches']} lotes, {stats['dropped_messages']} mensajes descartados, "
+            f"{stats['spool']['pending_bytes']} bytes en spool"
+        )
+        return True
+
+    def spool_remaining(self, lock_timeout=5.0):
+        """Anexar al spool el lote en curso y lo que quede en la cola.
+
+        Para cuando stop() no terminó a tiempo (p. ej. la base de datos no
+        responde y el hilo escritor sigue bloqueado) y el proceso va a
+        terminar: lo pendiente se reproduce en el próximo inicio. Si el
+        lote en curso llega a guardarse, sus muestras se repiten al
+        reproducir y la clave única las descarta. Devuelve las muestras
+        anexadas.
+        """
+        self._abandoned = self._inflight
+        batch = list(self._abandoned or [])
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        groups = group_by_device(batch)
+        samples = sum(len(rows) for rows in groups.values())
+        if not samples:
+            return 0
+
+        # El hilo escritor pudo quedar bloqueado a mitad de una escritura en disco
+        if not self._spool_lock.acquire(timeout=lock_timeout):
+            logger.error(f"Spool ocupado, se pierden {samples} muestras pendientes")
+            return 0
+        try:
+            self.spool.append(groups)
+            self.spool.close()
+        except OSError as e:
+            self._lose(samples, e)
+            return 0
+        finally:
+            self._spool_lock.release()
+
+        logger.warning(f"{samples} muestras pendientes guardadas en el spool al detener")
+        return samples
+
+    def _run(self):
+        """Bucle del hilo escritor: vaciar por tamaño o por tiempo"""
+        batch = []
+        batch_samples = 0
+        deadline = None
+
+        while not (self._stop_event.is_set() and self.queue.empty()):
+            if deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = max(0.0, deadline - time.monotonic())
+            if self._spool_pending:
+                timeout = min(timeout, max(0.0, self._next_retry - time.monotonic()))
+
+            try:
+                device_id, samples = self.queue.get(timeout=timeout)
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append((device_id, samples))
+                batch_samples += len(samples)
+            except queue.Empty:
+                pass
+
+            if batch and (batch_samples >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                batch_samples = 0
+                deadline = None
+
+            # Al detener solo se vacía la cola; el spool queda para el próximo inicio
+            if self._spool_pending and not self._stop_event.is_set():
+                self._recover()
+
+        if batch:
+            self._flush(batch)
+        with self._spool_lock:
+            self.spool.close()
+
+    def _flush(self, batch):
+        """Escribir un lote en una única transacción (o en el spool si falla)"""
+        groups = group_by_device(batch)
+        self._inflight = batch
+        try:
+            saved = self.db_available and self.db_manager.save_groups(groups)
+        except BatchRejected as e:
+            self._quarantine_batch(groups, e)
+            return
+        finally:
+            self._inflight = None
+
+        if saved:
+            self.flushed_batches += 1
+            self.flushed_samples += sum(len(rows) for rows in groups.values())
+            return
+
+        # spool_remaining ya guardó este lote al detener
+        if batch is self._abandoned:
+            return
+
+        if self.db_available:
+            self._mark_db_down()
+        try:
+            with self._spool_lock:
+                self.spool.append(groups)
+        except OSError as e:
+            self._lose(sum(len(rows) for rows in groups.values()), e)
+            return
+        self._spool_pending = True
+
+    def _lose(self, samples, error):
+        """Contabilizar muestras que no se pudieron guardar ni en el spool"""
+        self.lost_samples += samples
+        LOST_SAMPLES.inc(samples)
+        logger.error(
+            f"Error escribiendo en el spool, se pierden {samples} muestras "
+            f"({self.lost_samples} en total): {error}"
+        )
+
+    def _quarantine_batch(self, groups, error):
+        """Apartar un lote rechazado por la base de datos (reintentarlo no sirve)"""
+        samples = sum(len(rows) for rows in groups.values())
+        try:
+            with self._spool_lock:
+                path = self.spool.quarantine_batch(groups)
+        except Exception as e:
+            # Tampoco se puede escribir (disco, device_id inválido): se pierde
+            self._lose(samples, e)
+            return
+        QUARANTINED_SAMPLES.inc(samples)
+        logger.error(f"Lote rechazado por la base de datos, {samples} muestras en {path}: {error}")
+
+    def _mark_db_down(self):
+        """Pasar a modo spool y programar el próximo intento de conexión"""
+        if self.db_available:
+            self.db_errors += 1
+            logger.error("Base de datos no disponible, guardando lotes en el spool")
+        else:
+            self._retry_delay = min(self._retry_delay * 2, DB_RETRY_MAX)
+        self.db_available = False
+        self._next_retry = time.monotonic() + self._retry_delay
+
+    def _recover(self):
+        """Reconectar si toca y reproducir un segmento del spool"""
+        if time.monotonic() < self._next_retry:
+            return
+
+        reconnected = False
+        if not self.db_available:
+            try:
+                self.db_manager.reconnect()
+            except Exception as e:
+                DB_ERRORS.inc()
+                self._mark_db_down()
+                logger.warning(f"Reconexión fallida, reintento en {self._retry_delay}s: {e}")
+                return
+            self.db_available = True
+            self.reconnects += 1
+            DB_RECONNECTS.inc()
+            self._retry_delay = DB_RETRY_MIN
+            reconnected = True
+            logger.info("Base de datos disponible, reproduciendo spool...")
+
+        with self._spool_lock:
+            path = self.spool.oldest()
+            if path is None:
+                self._spool_pending = False
+                logger.info("Spool reproducido por completo")
+                return
+            groups = group_by_device(self.spool.read(path))
+
+        samples = sum(len(rows) for rows in groups.values())
+        try:
+            saved = samples == 0 or self.db_manager.save_groups(groups)
+        except BatchRejected as e:
+            self._quarantine_segment(path, samples, e)
+            return
+
+        if saved:
+            with self._spool_lock:
+                self.spool.remove(path, samples)
+            self._replay_failures = (None, 0)
+            self.flushed_batches += 1
+            self.flushed_samples += samples
+            return
+
+        # Falla justo después de una reconexión correcta: puede ser el segmento
+        failed_path, failures = self._replay_failures
+        if reconnected:
+            failures = failures + 1 if failed_path == path else 1
+            self._replay_failures = (path, failures)
+        if failures >= self.replay_attempts:
+            self._quarantine_segment(
+                path, samples, f"{failures} fallos seguidos tras reconectar"
+            )
+            return
+        self._mark_db_down()
+
+    def _quarantine_segment(self, path, samples, error):
+        """Apartar un segmento que no se puede reproducir para no bloquear el resto"""
+        self._replay_failures = (None, 0)
+        try:
+            with self._spool_lock:
+                target = self.spool.quarantine(path, samples)
+        except OSError as e:
+            logger.error(f"No se pudo apartar {path}: {e}")
+            self._mark_db_down()
+            return
+        QUARANTINED_SAMPLES.inc(samples)
+        logger.error(f"Segmento del spool rechazado, {samples} muestras en {target}: {error}")
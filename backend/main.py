@@ -2,29 +2,77 @@
 Receptor principal de datos AWS IoT con TimescaleDB
 """
 import logging
-from config import LOG_LEVEL, LOG_FORMAT
+import signal
+import threading
+from config import (
+    LOG_LEVEL, LOG_FORMAT, INGEST_DRAIN_TIMEOUT, INGEST_WORKERS, METRICS_HOST, METRICS_PORT,
+    SPOOL_DIR
+)
 from database import DatabaseManager
+from ingest_queue import IngestQueue
+from metrics import MetricsServer, QUEUE_DEPTH
 from mqtt_handler import MQTTHandler
+from writer_pool import WriterPool, reshard_spool
 
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+def install_signal_handlers(shutdown_event):
+    """Detener el receptor con SIGTERM (Render al redesplegar) o SIGINT"""
+    def handle_signal(signum, frame):
+        logger.info(f"Señal {signal.Signals(signum).name} recibida")
+        shutdown_event.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
 def main():
     """Función principal"""
     db_manager = None
+    ingest_queue = None
     mqtt_handler = None
+    metrics_server = None
+    shutdown_event = threading.Event()
+    install_signal_handlers(shutdown_event)
     
     try:
         logger.info("Iniciando receptor AWS IoT...")
         
-        # Inicializar base de datos
+        # Inicializar base de datos. Sin conexión se recibe igual, como en los
+        # procesos escritores: los lotes van al spool y el esquema se
+        # verifica al reconectar
         db_manager = DatabaseManager()
-        db_manager.connect()
-        db_manager.initialize_schema()
-        db_manager.get_stats()
+        try:
+            db_manager.connect()
+            db_manager.initialize_schema()
+            db_manager.get_stats()
+        except Exception as e:
+            logger.error(f"Base de datos no disponible al iniciar, se usará el spool: {e}")
+            db_manager.schema_pending = True
+        
+        # Segmentos de otra configuración de INGEST_WORKERS: a los spools que
+        # se van a reproducir
+        try:
+            reshard_spool(SPOOL_DIR, INGEST_WORKERS)
+        except OSError as e:
+            logger.error(f"No se pudo repartir el spool pendiente: {e}")
+        
+        # Inicializar cola de escritura (en este proceso o en procesos escritores,
+        # antes de conectar MQTT)
+        if INGEST_WORKERS > 0:
+            ingest_queue = WriterPool(INGEST_WORKERS)
+        else:
+            ingest_queue = IngestQueue(db_manager)
+        ingest_queue.start()
+        QUEUE_DEPTH.set_function(ingest_queue.depth)
+        
+        # Endpoint de métricas (Prometheus)
+        if METRICS_PORT:
+            metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT)
+            metrics_server.start()
         
         # Inicializar MQTT
-        mqtt_handler = MQTTHandler(db_manager)
+        mqtt_handler = MQTTHandler(ingest_queue)
         
         if not mqtt_handler.connect():
             return
@@ -32,24 +80,24 @@ def main():
         if not mqtt_handler.subscribe():
             return
         
-        # Mantener corriendo
-        try:
-            while True:
-                pass
-        except KeyboardInterrupt:
-            logger.info("Deteniendo receptor...")
-        
-        # Estadísticas finales
-        db_manager.get_stats()
+        # Esperar sin consumir CPU hasta recibir la señal de parada
+        shutdown_event.wait()
+        logger.info("Deteniendo receptor...")
         
     except Exception as e:
         logger.error(f"Error: {e}")
     
     finally:
+        # Dejar de recibir antes de vaciar la cola
         if mqtt_handler:
             mqtt_handler.disconnect()
+        # Lo que no se escribió a tiempo queda en el spool para el próximo inicio
+        if ingest_queue and not ingest_queue.stop(timeout=INGEST_DRAIN_TIMEOUT):
+            ingest_queue.spool_remaining()
         if db_manager:
             db_manager.close()
+        if metrics_server:
+            metrics_server.stop()
 
 if __name__ == "__main__":
     main()
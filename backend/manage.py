@@ -0,0 +1,342 @@
+"""
+Tareas de mantenimiento del esquema de TimescaleDB
+
+Uso (con las mismas variables TIMESCALE_* que el receptor):
+    python backend/manage.py chunks
+    python backend/manage.py compression
+    python backend/manage.py tune-chunks [--apply]
+    python backend/manage.py migrate [--batch-ms 3600000] [--chunk-interval-ms N] [--drop-old]
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+from config import (
+    LOG_LEVEL, LOG_FORMAT, DEVICE_PARTITIONS, CHUNK_TARGET_MB,
+    CHUNK_INTERVAL_MIN, CHUNK_INTERVAL_MAX, CHUNK_RATE_WINDOW,
+    CHUNK_ROW_BYTES, MIGRATION_BATCH_MS
+)
+from database import (
+    DatabaseManager, SENSOR_TABLE_SQL, SENSOR_HYPERTABLE_SQL, SENSOR_INDEXES,
+    SENSOR_UNIQUE_INDEX
+)
+
+logger = logging.getLogger(__name__)
+
+HOUR_MS = 60 * 60 * 1000
+
+# Columnas copiadas por la migración (sin la columna id del esquema anterior)
+MIGRATION_COLUMNS = "timestamp, ax, ay, az, gx, gy, gz, received_at, device_id"
+
+# ====
+# CHUNKS
+# ====
+def chunk_report(cursor, table='sensor_data'):
+    """Número, tamaño e intervalo de los chunks de un hypertable"""
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(total_bytes), 0),
+               COALESCE(AVG(total_bytes), 0), COALESCE(MAX(total_bytes), 0)
+        FROM chunks_detailed_size(%s)
+    """, (table,))
+    chunks, total_bytes, avg_bytes, max_bytes = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT integer_interval FROM timescaledb_information.dimensions
+        WHERE hypertable_name = %s AND dimension_type = 'Time'
+    """, (table,))
+    row = cursor.fetchone()
+
+    return {
+        'table': table,
+        'chunks': chunks,
+        'total_bytes': int(total_bytes),
+        'avg_bytes': int(avg_bytes),
+        'max_bytes': int(max_bytes),
+        'interval_ms': row[0] if row else None,
+    }
+
+def format_report(report):
+    """Resumen de chunk_report en una línea"""
+    mb = 1024 * 1024
+    interval = report['interval_ms']
+    interval_str = f"{interval / HOUR_MS:.1f} h" if interval else "?"
+    return (
+        f"{report['table']}: {report['chunks']} chunks, "
+        f"{report['total_bytes'] / mb:.1f} MB (media {report['avg_bytes'] / mb:.1f} MB, "
+        f"máx {report['max_bytes'] / mb:.1f} MB), intervalo {interval_str}"
+    )
+
+def measure_ingest(cursor, window=CHUNK_RATE_WINDOW):
+    """Ritmo de ingesta reciente (filas/ms), bytes por fila y dispositivos activos.
+
+    El ritmo se mide sobre la última ventana de datos (relativa al último
+    timestamp) y los bytes por fila a partir del tamaño total del hypertable.
+    """
+    cursor.execute("""
+        SELECT COUNT(*), MIN(timestamp), MAX(timestamp), COUNT(DISTINCT device_id)
+        FROM sensor_data
+        WHERE timestamp > (SELECT MAX(timestamp) FROM sensor_data) - %s
+    """, (window,))
+    rows, first, last, devices = cursor.fetchone()
+    rate = rows / max(last - first, 1) if rows > 1 else 0.0
+
+    cursor.execute("""
+        SELECT hypertable_size('sensor_data'), approximate_row_count('sensor_data')
+    """)
+    size, approx_rows = cursor.fetchone()
+    row_bytes = size / approx_rows if size and approx_rows else CHUNK_ROW_BYTES
+
+    return {'rows_per_ms': rate, 'row_bytes': row_bytes, 'devices': devices}
+
+def recommended_interval(measurement, target_mb=CHUNK_TARGET_MB, partitions=DEVICE_PARTITIONS):
+    """Intervalo de chunk (ms, en horas enteras) para que cada chunk ronde target_mb.
+
+    Con particiones por dispositivo cada intervalo de tiempo se reparte
+    entre min(particiones, dispositivos) chunks.
+    """
+    if measurement['rows_per_ms'] <= 0:
+        return None
+
+    chunks_per_interval = max(1, min(partitions, measurement['devices']))
+    bytes_per_ms = measurement['rows_per_ms'] * measurement['row_bytes']
+    interval = target_mb * 1024 * 1024 * chunks_per_interval / bytes_per_ms
+    interval = int(interval // HOUR_MS) * HOUR_MS
+    return max(CHUNK_INTERVAL_MIN, min(CHUNK_INTERVAL_MAX, interval))
+
+def tune_chunks(db_manager, apply=False):
+    """Calcular (y opcionalmente aplicar) el intervalo de chunk recomendado.
+
+    set_chunk_time_interval solo afecta a los chunks nuevos.
+    """
+    cursor = db_manager.conn.cursor()
+    print(format_report(chunk_report(cursor)))
+
+    measurement = measure_ingest(cursor)
+    interval = recommended_interval(measurement)
+    print(
+        f"Ingesta: {measurement['rows_per_ms'] * 1000:.1f} filas/s, "
+        f"{measurement['row_bytes']:.0f} bytes/fila, {measurement['devices']} dispositivos"
+    )
+    if interval is None:
+        print("Sin datos suficientes para recomendar un intervalo")
+        cursor.close()
+        return None
+
+    print(f"Intervalo recomendado: {interval} ms ({interval / HOUR_MS:.0f} h)")
+    if apply:
+        cursor.execute("SELECT set_chunk_time_interval('sensor_data', %s::BIGINT)", (interval,))
+        db_manager.conn.commit()
+        print("Aplicado a los chunks nuevos")
+
+    cursor.close()
+    return interval
+
+# ====
+# COMPRESIÓN
+# ====
+def compression_report(cursor, table='sensor_data'):
+    """Tamaño antes y después de comprimir de cada chunk del hypertable"""
+    cursor.execute("""
+        SELECT s.chunk_name, s.compression_status,
+               s.before_compression_total_bytes, s.after_compression_total_bytes,
+               c.range_start_integer, c.range_end_integer
+        FROM chunk_compression_stats(%s) s
+        JOIN timescaledb_information.chunks c
+          ON c.chunk_schema = s.chunk_schema AND c.chunk_name = s.chunk_name
+        ORDER BY c.range_start_integer, s.chunk_name
+    """, (table,))
+    columns = ('chunk', 'status', 'before_bytes', 'after_bytes', 'range_start', 'range_end')
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def print_compression_report(chunks):
+    """Tabla de compresión por chunk y total de los comprimidos"""
+    mb = 1024 * 1024
+    print(f"{'chunk':<28} {'desde':<20} {'estado':<14} {'antes MB':>10} {'después MB':>11} {'ratio':>7}")
+
+    before_total = after_total = compressed = 0
+    for chunk in chunks:
+        start = datetime.fromtimestamp(chunk['range_start'] / 1000).strftime('%Y-%m-%d %H:%M')
+        if chunk['before_bytes'] and chunk['after_bytes']:
+            ratio = chunk['before_bytes'] / chunk['after_bytes']
+            before_total += chunk['before_bytes']
+            after_total += chunk['after_bytes']
+            compressed += 1
+            sizes = (f"{chunk['before_bytes'] / mb:>10.1f} {chunk['after_bytes'] / mb:>11.1f} "
+                     f"{ratio:>6.1f}x")
+        else:
+            sizes = f"{'-':>10} {'-':>11} {'-':>7}"
+        print(f"{chunk['chunk']:<28} {start:<20} {chunk['status']:<14} {sizes}")
+
+    if after_total:
+        print(
+            f"{compressed}/{len(chunks)} chunks comprimidos: {before_total / mb:.1f} MB -> "
+            f"{after_total / mb:.1f} MB ({before_total / after_total:.1f}x)"
+        )
+    else:
+        print(f"0/{len(chunks)} chunks comprimidos")
+
+# ====
+# MIGRACIÓN
+# ====
+def _copy_range(cursor, condition, params):
+    """Copiar a sensor_data_new las filas de sensor_data que cumplen condition.
+
+    Las filas duplicadas (misma clave device_id, timestamp) se omiten.
+    """
+    cursor.execute(f"""
+        INSERT INTO sensor_data_new ({MIGRATION_COLUMNS})
+        SELECT {MIGRATION_COLUMNS} FROM sensor_data
+        WHERE {condition}
+        ON CONFLICT DO NOTHING
+    """, params)
+    return cursor.rowcount
+
+def migrate(db_manager, batch_ms=MIGRATION_BATCH_MS, chunk_interval=None, drop_old=False):
+    """Migrar sensor_data al esquema actual sin bloquear la ingesta.
+
+    Los datos se copian a sensor_data_new por rangos de timestamps, cada
+    uno en su propia transacción, mientras el receptor sigue escribiendo
+    en sensor_data. Los rangos nuevos se copian en pasadas sucesivas hasta
+    que queda menos de batch_ms; ese resto se copia bloqueando solo las
+    escrituras (EXCLUSIVE, las lecturas siguen) y en la misma transacción
+    se intercambian las tablas. Las filas duplicadas se descartan en la
+    copia. Los agregados continuos se recrean sobre la tabla nueva y la
+    anterior queda como sensor_data_old.
+
+    Las filas que lleguen durante la migración con timestamps ya copiados
+    (p. ej. al reproducir el spool del receptor) no se trasladan: conviene
+    ejecutarla con el spool vacío.
+    """
+    conn = db_manager.conn
+    cursor = conn.cursor()
+    started = time.monotonic()
+
+    before = chunk_report(cursor)
+    print(f"Antes:   {format_report(before)}")
+
+    if chunk_interval is None:
+        chunk_interval = recommended_interval(measure_ingest(cursor)) or before['interval_ms']
+    logger.info(f"Intervalo de chunk: {chunk_interval} ms")
+
+    # Tabla nueva (se descarta una migración anterior interrumpida)
+    cursor.execute("DROP TABLE IF EXISTS sensor_data_new")
+    cursor.execute(SENSOR_TABLE_SQL.format(table='sensor_data_new'))
+    cursor.execute(SENSOR_HYPERTABLE_SQL, {
+        'table': 'sensor_data_new',
+        'partitions': DEVICE_PARTITIONS,
+        'interval': chunk_interval,
+    })
+    # La clave única hace falta durante la copia para descartar duplicados
+    cursor.execute(SENSOR_INDEXES[SENSOR_UNIQUE_INDEX].format(
+        name=f'{SENSOR_UNIQUE_INDEX}_new', table='sensor_data_new'
+    ))
+    conn.commit()
+
+    # Copia por rangos, en pasadas hasta alcanzar el último dato
+    cursor.execute("SELECT MIN(timestamp) FROM sensor_data")
+    first = cursor.fetchone()[0]
+    watermark = first - first % batch_ms if first is not None else 0
+    copied = 0
+
+    while True:
+        cursor.execute("SELECT MAX(timestamp) FROM sensor_data")
+        newest = cursor.fetchone()[0]
+        if newest is None or newest - watermark < batch_ms:
+            break
+
+        while watermark + batch_ms <= newest:
+            copied += _copy_range(
+                cursor, "timestamp >= %s AND timestamp < %s",
+                (watermark, watermark + batch_ms)
+            )
+            conn.commit()
+            watermark += batch_ms
+        logger.info(f"{copied} filas copiadas (hasta {watermark})")
+
+    # Resto de índices antes del intercambio, para que la tabla llegue lista
+    for name, sql in SENSOR_INDEXES.items():
+        cursor.execute(sql.format(name=f'{name}_new', table='sensor_data_new'))
+    conn.commit()
+
+    # Resto e intercambio en una transacción corta
+    cursor.execute("""
+        SELECT view_name FROM timescaledb_information.continuous_aggregates
+        WHERE hypertable_name = 'sensor_data'
+    """)
+    views = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("LOCK TABLE sensor_data IN EXCLUSIVE MODE")
+    copied += _copy_range(cursor, "timestamp >= %s", (watermark,))
+    for view in views:
+        cursor.execute(f"DROP MATERIALIZED VIEW {view}")
+    cursor.execute("DROP TABLE IF EXISTS sensor_data_old")
+    cursor.execute("ALTER TABLE sensor_data RENAME TO sensor_data_old")
+    cursor.execute("ALTER TABLE sensor_data_new RENAME TO sensor_data")
+    for name in SENSOR_INDEXES:
+        cursor.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_old")
+        cursor.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+    conn.commit()
+    logger.info(f"Tablas intercambiadas: {copied} filas migradas")
+
+    # Agregados continuos y políticas sobre la tabla nueva
+    db_manager.initialize_rollups()
+    db_manager.initialize_policies()
+
+    if drop_old:
+        cursor.execute("DROP TABLE sensor_data_old")
+        conn.commit()
+        logger.info("sensor_data_old eliminada")
+    else:
+        logger.info("La tabla anterior queda como sensor_data_old")
+
+    after = chunk_report(cursor)
+    cursor.close()
+
+    print(f"Después: {format_report(after)}")
+    print(f"{copied} filas migradas en {time.monotonic() - started:.1f}s")
+    return before, after
+
+# ====
+# CLI
+# ====
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('chunks', help="Número y tamaño de los chunks")
+    subparsers.add_parser('compression', help="Ratio de compresión por chunk")
+
+    tune = subparsers.add_parser('tune-chunks', help="Intervalo de chunk según la ingesta medida")
+    tune.add_argument('--apply', action='store_true', help="Aplicar a los chunks nuevos")
+
+    migration = subparsers.add_parser('migrate', help="Migrar sensor_data al esquema actual")
+    migration.add_argument('--batch-ms', type=int, default=MIGRATION_BATCH_MS)
+    migration.add_argument('--chunk-interval-ms', type=int,
+                           help="Por defecto, el recomendado según la ingesta medida")
+    migration.add_argument('--drop-old', action='store_true',
+                           help="Eliminar la tabla anterior al terminar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+
+    db_manager = DatabaseManager()
+    db_manager.connect()
+    try:
+        if args.command == 'chunks':
+            cursor = db_manager.conn.cursor()
+            print(format_report(chunk_report(cursor)))
+            cursor.close()
+        elif args.command == 'compression':
+            cursor = db_manager.conn.cursor()
+            print_compression_report(compression_report(cursor))
+            cursor.close()
+        elif args.command == 'tune-chunks':
+            tune_chunks(db_manager, apply=args.apply)
+        elif args.command == 'migrate':
+            db_manager.initialize_schema()
+            migrate(db_manager, args.batch_ms, args.chunk_interval_ms, args.drop_old)
+    finally:
+        db_manager.close()
+
+if __name__ == '__main__':
+    main()
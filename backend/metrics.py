@@ -0,0 +1,234 @@
+"""
+Métricas del receptor en formato de texto de Prometheus
+"""
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ====
+# REGISTRO
+# ====
+class Registry:
+    """Valores de todas las métricas en un único array de floats.
+
+    Cada métrica reserva posiciones al definirse; como los procesos
+    escritores importan este módulo en el mismo orden, las posiciones
+    coinciden entre procesos. share() mueve los valores a memoria
+    compartida y los procesos escritores se enlazan con attach(), de modo
+    que el endpoint del proceso principal expone la suma de todos y los
+    contadores sobreviven al reinicio de un escritor.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.values = []
+        self.lock = threading.Lock()
+
+    def register(self, metric, slots):
+        """Reservar slots posiciones para una métrica y devolver la primera"""
+        offset = len(self.values)
+        self.values.extend([0.0] * slots)
+        self.metrics.append(metric)
+        return offset
+
+    def add(self, updates):
+        """Sumar (posición, cantidad) en una sola sección crítica"""
+        with self.lock:
+            for index, amount in updates:
+                self.values[index] += amount
+
+    def set(self, index, value):
+        with self.lock:
+            self.values[index] = value
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.values)
+
+    def share(self, context):
+        """Pasar los valores a memoria compartida y devolver (valores, lock).
+
+        Los procesos se inician con el contexto de multiprocessing dado y
+        reciben el resultado para llamar a attach().
+        """
+        with self.lock:
+            values = context.RawArray('d', self.values)
+            lock = context.Lock()
+            self.values, self.lock = values, lock
+        return values, lock
+
+    def attach(self, shared):
+        """Usar los valores compartidos por el proceso principal"""
+        self.values, self.lock = shared
+
+    def render(self):
+        """Todas las métricas en formato de texto"""
+        values = self.snapshot()
+        return ''.join(metric.render(values) for metric in self.metrics)
+
+REGISTRY = Registry()
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Contador monótono"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.registry = registry
+        self.index = registry.register(self, 1)
+
+    def inc(self, amount=1):
+        self.registry.add(((self.index, amount),))
+
+    def header(self):
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.type}\n"
+
+    def render(self, values):
+        return self.header() + f"{self.name} {_format(values[self.index])}\n"
+
+class Gauge(Counter):
+    """Valor instantáneo, fijado con set() o leído de una función al exponerlo.
+
+    Las funciones solo se evalúan en el proceso que sirve el endpoint.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, registry=REGISTRY):
+        super().__init__(name, help, registry)
+        self.function = None
+
+    def set(self, value):
+        self.registry.set(self.index, value)
+
+    def set_function(self, function):
+        self.function = function
+
+    def render(self, values):
+        value = values[self.index]
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.debug(f"No se pudo leer {self.name}: {e}")
+        return self.header() + f"{self.name} {_format(value)}\n"
+
+class Histogram(Counter):
+    """Histograma con límites fijos (cuentas por intervalo, suma y total)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.registry = registry
+        self.buckets = sorted(buckets) + [float('inf')]
+        # Una posición por intervalo, más la suma y el total de observaciones
+        self.index = registry.register(self, len(self.buckets) + 2)
+
+    def observe(self, value):
+        bucket = bisect.bisect_left(self.buckets, value)
+        count = self.index + len(self.buckets)
+        self.registry.add(((self.index + bucket, 1), (count, value), (count + 1, 1)))
+
+    def render(self, values):
+        lines = [self.header()]
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            cumulative += values[self.index + i]
+            lines.append(f'{self.name}_bucket{{le="{_format(bound)}"}} {_format(cumulative)}\n')
+        total = self.index + len(self.buckets)
+        lines.append(f"{self.name}_sum {_format(values[total])}\n")
+        lines.append(f"{self.name}_count {_format(values[total + 1])}\n")
+        return ''.join(lines)
+
+# ====
+# MÉTRICAS DEL RECEPTOR
+# ====
+MESSAGES_RECEIVED = Counter(
+    'receiver_messages_received_total', "Mensajes MQTT recibidos")
+SAMPLES_RECEIVED = Counter(
+    'receiver_samples_received_total', "Muestras decodificadas de los mensajes recibidos")
+DECODE_ERRORS = Counter(
+    'receiver_decode_errors_total', "Payloads que no se pudieron decodificar")
+DUPLICATE_MESSAGES = Counter(
+    'receiver_duplicate_messages_total', "Mensajes reentregados descartados antes de encolar")
+DUPLICATE_SAMPLES = Counter(
+    'receiver_duplicate_samples_total', "Muestras repetidas descartadas (filtro y clave única)")
+DROPPED_MESSAGES = Counter(
+    'receiver_dropped_messages_total', "Mensajes descartados por cola llena")
+QUARANTINED_SAMPLES = Counter(
+    'receiver_quarantined_samples_total', "Muestras apartadas en cuarentena (lotes rechazados)")
+LOST_SAMPLES = Counter(
+    'receiver_lost_samples_total', "Muestras perdidas por errores al escribir el spool")
+SAMPLES_WRITTEN = Counter(
+    'receiver_samples_written_total', "Muestras guardadas en sensor_data")
+DB_ERRORS = Counter(
+    'receiver_db_errors_total', "Escrituras o reconexiones fallidas")
+DB_RECONNECTS = Counter(
+    'receiver_db_reconnects_total', "Reconexiones a la base de datos tras una caída")
+MQTT_RECONNECTS = Counter(
+    'receiver_mqtt_reconnects_total', "Conexiones MQTT restablecidas")
+QUEUE_DEPTH = Gauge(
+    'receiver_queue_depth', "Mensajes pendientes de escribir")
+BATCH_SAMPLES = Histogram(
+    'receiver_batch_samples', "Muestras por transacción de escritura",
+    [10, 50, 100, 250, 500, 1000, 2000, 5000, 10000, 25000])
+COMMIT_SECONDS = Histogram(
+    'receiver_commit_seconds', "Duración de cada transacción de escritura",
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+
+# ====
+# ENDPOINT HTTP
+# ====
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin una línea de log por cada scrape
+        pass
+
+class MetricsServer:
+    """Servidor HTTP de /metrics en un hilo en segundo plano"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='metrics-http', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Métricas disponibles en http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
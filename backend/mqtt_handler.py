@@ -1,9 +1,9 @@
 """
 Gestión de conexión MQTT con AWS IoT Core
 """
-import json
 import logging
 import os
+import re
 import tempfile
 import shutil
 from datetime import datetime
@@ -11,17 +11,55 @@ from awscrt import mqtt
 from awsiot import mqtt_connection_builder
 from config import (
     AWS_IOT_ENDPOINT, AWS_IOT_PORT, AWS_IOT_CLIENT_ID,
-    AWS_IOT_TOPIC, AWS_ROOT_CA, AWS_CERTIFICATE, AWS_PRIVATE_KEY,
-    AWS_ROOT_CA_CONTENT, AWS_CERTIFICATE_CONTENT, AWS_PRIVATE_KEY_CONTENT
+    AWS_IOT_TOPIC, AWS_IOT_LEGACY_TOPIC, AWS_ROOT_CA, AWS_CERTIFICATE, AWS_PRIVATE_KEY,
+    AWS_ROOT_CA_CONTENT, AWS_CERTIFICATE_CONTENT, AWS_PRIVATE_KEY_CONTENT,
+    DEFAULT_DEVICE_ID
 )
+from payload import decode_payload
+from dedup import RecentKeyFilter
+from metrics import (
+    MESSAGES_RECEIVED, SAMPLES_RECEIVED, DECODE_ERRORS, DUPLICATE_MESSAGES,
+    DUPLICATE_SAMPLES, MQTT_RECONNECTS
+)
+from writer_pool import WriterPool
 
 logger = logging.getLogger(__name__)
 
+# Identificadores de dispositivo aceptados (se guardan tal cual en la base de datos)
+DEVICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+# Nivel del tópico con el comodín '+' que identifica al dispositivo
+_TOPIC_LEVELS = AWS_IOT_TOPIC.split('/')
+DEVICE_TOPIC_LEVEL = _TOPIC_LEVELS.index('+') if '+' in _TOPIC_LEVELS else None
+
+# Tópicos a los que suscribirse: el configurado y el fijo anterior
+SUBSCRIBE_TOPICS = [AWS_IOT_TOPIC] + [
+    t for t in [AWS_IOT_LEGACY_TOPIC] if t and t != AWS_IOT_TOPIC
+]
+
+def device_from_topic(topic):
+    """Obtener el device_id del tópico (o el dispositivo por defecto sin comodín)"""
+    if DEVICE_TOPIC_LEVEL is None or topic == AWS_IOT_LEGACY_TOPIC:
+        return DEFAULT_DEVICE_ID
+    
+    levels = topic.split('/')
+    if len(levels) != len(_TOPIC_LEVELS):
+        raise ValueError(f"Tópico inesperado: {topic}")
+    
+    device_id = levels[DEVICE_TOPIC_LEVEL]
+    if not DEVICE_ID_PATTERN.match(device_id):
+        raise ValueError(f"device_id inválido en el tópico: {topic}")
+    return device_id
+
 class MQTTHandler:
     """Gestor de conexión MQTT con AWS IoT Core"""
     
-    def __init__(self, database_manager):
-        self.db_manager = database_manager
+    def __init__(self, ingest_queue, dedup=None):
+        # IngestQueue (escritura en este proceso) o WriterPool (procesos escritores)
+        self.ingest_queue = ingest_queue
+        self.dedup = dedup or RecentKeyFilter()
+        self.duplicate_messages = 0
+        self.duplicate_samples = 0
         self.mqtt_connection = None
         self.cert_dir = None
     
@@ -88,21 +126,47 @@ class MQTTHandler:
     
     def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
         """Callback: conexión restablecida"""
+        MQTT_RECONNECTS.inc()
         logger.info(f"Conexión MQTT restablecida (code: {return_code})")
     
     def on_message_received(self, topic, payload, dup, qos, retain, **kwargs):
         """Callback: mensaje recibido"""
+        MESSAGES_RECEIVED.inc()
         try:
-            message = json.loads(payload.decode('utf-8'))
-            num_samples = len(message.get('samples', []))
+            device_id = device_from_topic(topic)
+            
+            # Reentrega de un mensaje ya encolado (QoS 1)
+            if self.dedup.is_duplicate_message(device_id, payload):
+                self.duplicate_messages += 1
+                DUPLICATE_MESSAGES.inc()
+                logger.debug(f"Mensaje duplicado de {device_id} descartado (dup: {dup})")
+                return
             
-            logger.info(f"Mensaje recibido - {num_samples} muestras")
+            # Modo multiproceso: decodifican los procesos escritores
+            if isinstance(self.ingest_queue, WriterPool):
+                if self.ingest_queue.put(device_id, payload):
+                    self.dedup.remember(device_id, payload, ())
+                return
             
-            # Guardar en base de datos
-            self.db_manager.save_samples(message.get('samples', []))
+            # JSON o binario empaquetado, según el primer byte
+            samples = decode_payload(payload)
+            SAMPLES_RECEIVED.inc(len(samples))
+            fresh = self.dedup.new_samples(device_id, samples)
+            self.duplicate_samples += len(samples) - len(fresh)
+            DUPLICATE_SAMPLES.inc(len(samples) - len(fresh))
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Error al decodificar JSON: {e}")
+            logger.debug(
+                f"Mensaje recibido de {device_id} - {len(fresh)} muestras "
+                f"({len(samples) - len(fresh)} repetidas, cola: {self.ingest_queue.depth()})"
+            )
+            
+            # Encolar para escritura diferida en base de datos
+            if self.ingest_queue.put(device_id, fresh):
+                self.dedup.remember(device_id, payload, fresh)
+            
+        except ValueError as e:
+            DECODE_ERRORS.inc()
+            logger.error(f"Error al decodificar payload: {e}")
         except Exception as e:
             logger.error(f"Error al procesar mensaje: {e}")
     
@@ -140,18 +204,19 @@ class MQTTHandler:
             return False
     
     def subscribe(self):
-        """Suscribirse al tópico"""
+        """Suscribirse a los tópicos (el configurado y el fijo anterior)"""
         try:
-            logger.info(f"Suscribiéndose a: {AWS_IOT_TOPIC}")
-            
-            subscribe_future, packet_id = self.mqtt_connection.subscribe(
-                topic=AWS_IOT_TOPIC,
-                qos=mqtt.QoS.AT_LEAST_ONCE,
-                callback=self.on_message_received
-            )
-            
-            subscribe_result = subscribe_future.result()
-            logger.info(f"Suscrito con QoS: {subscribe_result['qos']}")
+            for topic in SUBSCRIBE_TOPICS:
+                logger.info(f"Suscribiéndose a: {topic}")
+                
+                subscribe_future, packet_id = self.mqtt_connection.subscribe(
+                    topic=topic,
+                    qos=mqtt.QoS.AT_LEAST_ONCE,
+                    callback=self.on_message_received
+                )
+                
+                subscribe_result = subscribe_future.result()
+                logger.info(f"Suscrito con QoS: {subscribe_result['qos']}")
             logger.info("Esperando mensajes...")
             
             return True
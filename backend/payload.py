@@ -0,0 +1,67 @@
+"""
+Decodificación de payloads MQTT del ESP32 (JSON o binario empaquetado)
+
+Formato binario v1 (little-endian):
+    byte 0      firma 0xA5
+    byte 1      versión (1)
+    bytes 2-3   número de muestras (uint16)
+    bytes 4-    muestras de 32 bytes: timestamp int64 (ms) y
+                ax, ay, az, gx, gy, gz float32
+
+Los payloads JSON empiezan por '{', por lo que el primer byte basta para
+distinguir el formato.
+"""
+import json
+import struct
+import numpy as np
+from samples import from_dicts
+
+BINARY_MAGIC = 0xA5
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<BBH')
+
+PACKED_SAMPLE_DTYPE = np.dtype([
+    ('t', '<i8'),
+    ('ax', '<f4'), ('ay', '<f4'), ('az', '<f4'),
+    ('gx', '<f4'), ('gy', '<f4'), ('gz', '<f4'),
+])
+
+def is_binary(payload):
+    """El payload usa el formato binario empaquetado"""
+    return len(payload) > 0 and payload[0] == BINARY_MAGIC
+
+def decode_binary(payload):
+    """Vista del payload como array estructurado, sin copiar los datos"""
+    if len(payload) < BINARY_HEADER.size:
+        raise ValueError("Payload binario sin cabecera completa")
+
+    magic, version, count = BINARY_HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Versión de payload binario no soportada: {version}")
+
+    expected = BINARY_HEADER.size + count * PACKED_SAMPLE_DTYPE.itemsize
+    if len(payload) != expected:
+        raise ValueError(
+            f"Tamaño de payload binario inválido: {len(payload)} bytes, "
+            f"se esperaban {expected} para {count} muestras"
+        )
+
+    return np.frombuffer(payload, dtype=PACKED_SAMPLE_DTYPE,
+                         count=count, offset=BINARY_HEADER.size)
+
+def encode_binary(samples):
+    """Empaquetar un array de muestras en el formato binario (referencia del ESP32)"""
+    packed = samples.astype(PACKED_SAMPLE_DTYPE)
+    return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(packed)) + packed.tobytes()
+
+def decode_payload(payload):
+    """Decodificar un payload en un array de muestras según su formato"""
+    if is_binary(payload):
+        return decode_binary(payload)
+
+    message = json.loads(payload.decode('utf-8'))
+    # Campos que faltan o con otro tipo: ValueError como el resto de errores de formato
+    try:
+        return from_dicts(message.get('samples', []))
+    except (AttributeError, KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Payload JSON con formato inesperado: {e!r}") from e
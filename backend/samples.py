@@ -0,0 +1,28 @@
+"""
+Representación en memoria de las muestras del MPU6050
+"""
+import numpy as np
+
+# Una fila por muestra: timestamp (ms) y los 6 ejes, sin relleno. Es también
+# el formato de las filas del spool en disco.
+SAMPLE_DTYPE = np.dtype([
+    ('t', '<i8'),
+    ('ax', '<f8'), ('ay', '<f8'), ('az', '<f8'),
+    ('gx', '<f8'), ('gy', '<f8'), ('gz', '<f8'),
+])
+
+AXES = ('ax', 'ay', 'az', 'gx', 'gy', 'gz')
+
+def from_dicts(samples):
+    """Convertir muestras del payload JSON ({'t', 'a', 'g'}) en un array"""
+    return np.array(
+        [(s['t'], s['a'][0], s['a'][1], s['a'][2], s['g'][0], s['g'][1], s['g'][2])
+         for s in samples],
+        dtype=SAMPLE_DTYPE
+    )
+
+def concat(arrays):
+    """Unir arrays de muestras (de cualquier formato con los mismos campos)"""
+    if not arrays:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    return np.concatenate([a.astype(SAMPLE_DTYPE, copy=False) for a in arrays])
@@ -0,0 +1,227 @@
+"""
+Spool local en disco para lotes que no se pudieron guardar en TimescaleDB
+"""
+import logging
+import os
+import struct
+import numpy as np
+from config import SPOOL_DIR, SPOOL_SEGMENT_MB, SPOOL_MAX_MB, DEFAULT_DEVICE_ID
+from samples import SAMPLE_DTYPE
+
+logger = logging.getLogger(__name__)
+
+# Cada registro: cabecera (firma, nº de muestras, longitud del device_id) +
+# device_id en UTF-8 + filas SAMPLE_DTYPE (timestamp int64 y los 6 ejes
+# float64, little-endian)
+RECORD_MAGIC = b'SPL2'
+RECORD_HEADER = struct.Struct('<4sIH')
+
+# Registros anteriores a multi-dispositivo: sin device_id
+LEGACY_RECORD_MAGIC = b'SPL1'
+LEGACY_RECORD_HEADER = struct.Struct('<4sI')
+
+SEGMENT_SUFFIX = '.seg'
+
+# Subdirectorio con los lotes y segmentos rechazados por la base de datos
+# (mismo formato, no se reproducen)
+QUARANTINE_DIR = 'quarantine'
+
+def _write_records(f, groups):
+    """Escribir un registro por dispositivo y forzarlo a disco"""
+    for device_id, rows in groups.items():
+        device = device_id.encode('utf-8')
+        f.write(RECORD_HEADER.pack(RECORD_MAGIC, len(rows), len(device)))
+        f.write(device)
+        f.write(rows.astype(SAMPLE_DTYPE, copy=False).tobytes())
+    f.flush()
+    os.fsync(f.fileno())
+
+class DiskSpool:
+    """Archivo segmentado de solo-anexado con los lotes pendientes.
+
+    Los lotes se escriben en el segmento activo hasta superar segment_mb;
+    al reproducir se cierra el activo y se leen los segmentos de más
+    antiguo a más nuevo. Si el total supera max_mb se descartan los
+    segmentos más antiguos. Los lotes que la base de datos rechaza se
+    apartan en QUARANTINE_DIR para revisarlos a mano.
+    """
+
+    def __init__(self, directory=SPOOL_DIR, segment_mb=SPOOL_SEGMENT_MB, max_mb=SPOOL_MAX_MB):
+        self.directory = directory
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.spooled_samples = 0
+        self.replayed_samples = 0
+        self.dropped_samples = 0
+        self.quarantined_samples = 0
+        self._active = None
+        self._active_path = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        self._next_seq = self._seq(segments[-1]) + 1 if segments else 1
+
+        if segments:
+            logger.warning(
+                f"Spool con {len(segments)} segmentos pendientes "
+                f"({self.pending_bytes() / 1024 / 1024:.1f} MB) en {self.directory}"
+            )
+
+    @staticmethod
+    def _seq(path):
+        return int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+
+    def segments(self):
+        """Rutas de los segmentos, del más antiguo al más nuevo"""
+        names = [n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX)]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def pending_bytes(self):
+        """Bytes en disco pendientes de reproducir"""
+        return sum(os.path.getsize(p) for p in self.segments())
+
+    def has_pending(self):
+        """Hay datos en el spool"""
+        return bool(self.segments())
+
+    def stats(self):
+        """Métricas del spool"""
+        return {
+            'segments': len(self.segments()),
+            'pending_bytes': self.pending_bytes(),
+            'spooled_samples': self.spooled_samples,
+            'replayed_samples': self.replayed_samples,
+            'dropped_samples': self.dropped_samples,
+            'quarantined_samples': self.quarantined_samples,
+        }
+
+    def append(self, groups):
+        """Anexar {device_id: array de muestras (SAMPLE_DTYPE)}.
+
+        Lanza OSError si no se puede escribir (p. ej. disco lleno); el
+        segmento activo se cierra para que un registro a medias no oculte
+        los siguientes.
+        """
+        groups = {device_id: rows for device_id, rows in groups.items() if len(rows)}
+        if not groups:
+            return
+
+        if self._active is None:
+            self._active_path = os.path.join(
+                self.directory, f"{self._next_seq:010d}{SEGMENT_SUFFIX}"
+            )
+            self._next_seq += 1
+            self._active = open(self._active_path, 'ab')
+
+        try:
+            _write_records(self._active, groups)
+        except OSError:
+            try:
+                self.rotate()
+            except OSError:
+                self._active = None
+                self._active_path = None
+            raise
+        self.spooled_samples += sum(len(rows) for rows in groups.values())
+
+        if self._active.tell() >= self.segment_bytes:
+            self.rotate()
+
+        self._enforce_cap()
+
+    def rotate(self):
+        """Cerrar el segmento activo"""
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+            self._active_path = None
+
+    def _enforce_cap(self):
+        """Descartar los segmentos más antiguos si se supera max_bytes"""
+        segments = self.segments()
+        total = sum(os.path.getsize(p) for p in segments)
+
+        for path in segments:
+            if total <= self.max_bytes or path == self._active_path:
+                break
+            size = os.path.getsize(path)
+            dropped = sum(len(rows) for _, rows in self.read(path))
+            os.remove(path)
+            total -= size
+            self.dropped_samples += dropped
+            logger.error(
+                f"Spool lleno ({self.max_bytes / 1024 / 1024:.0f} MB): "
+                f"descartado {os.path.basename(path)} con {dropped} muestras"
+            )
+
+    def read(self, path):
+        """Leer los lotes de un segmento como pares (device_id, array SAMPLE_DTYPE).
+
+        Un registro truncado (p. ej. por una caída durante la escritura) y
+        lo que le sigue se ignoran.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        batches = []
+        offset = 0
+        while offset + LEGACY_RECORD_HEADER.size <= len(data):
+            magic = data[offset:offset + 4]
+            if magic == RECORD_MAGIC and offset + RECORD_HEADER.size <= len(data):
+                _, count, device_len = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size + device_len
+                device_id = data[start - device_len:start].decode('utf-8', errors='replace')
+            elif magic == LEGACY_RECORD_MAGIC:
+                _, count = LEGACY_RECORD_HEADER.unpack_from(data, offset)
+                start = offset + LEGACY_RECORD_HEADER.size
+                device_id = DEFAULT_DEVICE_ID
+            else:
+                start = None
+
+            end = start + count * SAMPLE_DTYPE.itemsize if start is not None else None
+            if end is None or end > len(data):
+                logger.warning(f"Registro inválido en {os.path.basename(path)}, se ignora el resto")
+                break
+            batches.append((device_id, np.frombuffer(
+                data, dtype=SAMPLE_DTYPE, count=count, offset=start
+            )))
+            offset = end
+        return batches
+
+    def oldest(self):
+        """Segmento más antiguo listo para reproducir (cierra el activo si es el único)"""
+        segments = self.segments()
+        if not segments:
+            return None
+        if segments[0] == self._active_path:
+            self.rotate()
+        return segments[0]
+
+    def remove(self, path, samples):
+        """Eliminar un segmento ya reproducido"""
+        os.remove(path)
+        self.replayed_samples += samples
+
+    def quarantine(self, path, samples):
+        """Apartar un segmento que la base de datos rechaza"""
+        directory = os.path.join(self.directory, QUARANTINE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, os.path.basename(path))
+        os.replace(path, target)
+        self.quarantined_samples += samples
+        return target
+
+    def quarantine_batch(self, groups):
+        """Guardar en cuarentena un lote rechazado, sin pasar por la reproducción"""
+        directory = os.path.join(self.directory, QUARANTINE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"batch-{self._next_seq:010d}{SEGMENT_SUFFIX}")
+        self._next_seq += 1
+        with open(target, 'ab') as f:
+            _write_records(f, groups)
+        self.quarantined_samples += sum(len(rows) for rows in groups.values())
+        return target
+
+    def close(self):
+        """Cerrar el segmento activo"""
+        self.rotate()
@@ -0,0 +1,307 @@
+"""
+Pool de procesos escritores repartidos por dispositivo
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import zlib
+from config import (
+    LOG_LEVEL, LOG_FORMAT_WORKER, SPOOL_DIR, INGEST_WORKER_QUEUE_SIZE,
+    INGEST_PUT_TIMEOUT, INGEST_DRAIN_TIMEOUT
+)
+from database import DatabaseManager
+from dedup import RecentKeyFilter
+from ingest_queue import IngestQueue, group_by_device
+from metrics import (
+    REGISTRY, SAMPLES_RECEIVED, DECODE_ERRORS, DUPLICATE_SAMPLES, DROPPED_MESSAGES, LOST_SAMPLES
+)
+from payload import decode_payload
+from spool import DiskSpool
+
+logger = logging.getLogger(__name__)
+
+# Parte del tiempo de parada reservada para que un escritor que no terminó
+# de vaciar su cola la guarde en el spool antes de que stop() lo termine
+WORKER_SPOOL_GRACE = 5.0
+
+# Subdirectorio del spool de cada proceso escritor dentro de SPOOL_DIR
+WORKER_SPOOL_PREFIX = 'worker-'
+
+def shard_for(device_id, workers):
+    """Proceso que atiende a un dispositivo (estable entre procesos y reinicios)"""
+    return zlib.crc32(device_id.encode('utf-8')) % workers
+
+def worker_spool_dir(spool_dir, index):
+    """Directorio del spool del proceso escritor index"""
+    return os.path.join(spool_dir, f'{WORKER_SPOOL_PREFIX}{index}')
+
+def _worker_spool_dirs(spool_dir):
+    """{índice: directorio} de los spools de procesos escritores existentes"""
+    dirs = {}
+    for name in os.listdir(spool_dir):
+        suffix = name[len(WORKER_SPOOL_PREFIX):]
+        path = os.path.join(spool_dir, name)
+        if name.startswith(WORKER_SPOOL_PREFIX) and suffix.isdigit() and os.path.isdir(path):
+            dirs[int(suffix)] = path
+    return dirs
+
+def reshard_spool(spool_dir, workers):
+    """Repartir los segmentos que ningún escritor va a reproducir.
+
+    Con workers > 0 cada proceso solo lee su worker-k: los segmentos de la
+    raíz de SPOOL_DIR (de cuando se escribía en un solo proceso) y los de
+    worker-k con k >= workers (antes había más procesos) se leen y se
+    anexan al spool del shard de cada dispositivo. Con workers = 0 todos
+    los worker-k pasan a la raíz. Las cuarentenas no se tocan. Llamar antes
+    de iniciar la ingesta; devuelve las muestras movidas.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    sources = [
+        path for index, path in sorted(_worker_spool_dirs(spool_dir).items())
+        if index >= workers
+    ]
+    if workers > 0:
+        sources.insert(0, spool_dir)
+
+    targets = {}
+    moved = 0
+    try:
+        for directory in sources:
+            source = DiskSpool(directory)
+            for path in source.segments():
+                groups = group_by_device(source.read(path))
+                shards = {}
+                for device_id, rows in groups.items():
+                    index = shard_for(device_id, workers) if workers > 0 else None
+                    shards.setdefault(index, {})[device_id] = rows
+                for index, shard_groups in shards.items():
+                    if index not in targets:
+                        targets[index] = DiskSpool(
+                            spool_dir if index is None else worker_spool_dir(spool_dir, index)
+                        )
+                    targets[index].append(shard_groups)
+                # Si se corta aquí, las filas repetidas se descartan al reproducir
+                os.remove(path)
+                moved += sum(len(rows) for rows in groups.values())
+            source.close()
+            if directory != spool_dir and not os.listdir(directory):
+                os.rmdir(directory)
+    finally:
+        for target in targets.values():
+            target.close()
+
+    if moved:
+        logger.warning(f"{moved} muestras del spool repartidas entre {max(workers, 1)} escritores")
+    return moved
+
+def _worker_main(index, payloads, spool_dir, drain_timeout, metrics):
+    """Proceso escritor: decodificar payloads y escribirlos con su propia conexión.
+
+    Cada proceso tiene su IngestQueue (lotes, spool en su propio directorio
+    y reconexión), por lo que la escritura de un shard no depende de los
+    demás. Sus métricas se suman a las del proceso principal en memoria
+    compartida. Termina al recibir None tras vaciar su cola.
+    """
+    # La parada la coordina el proceso principal con el centinela
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT_WORKER)
+    REGISTRY.attach(metrics)
+
+    db_manager = DatabaseManager()
+    try:
+        db_manager.connect()
+    except Exception as e:
+        logger.error(f"Escritor {index} sin conexión inicial, se usará el spool: {e}")
+        # El proceso principal tampoco pudo verificar el esquema
+        db_manager.schema_pending = True
+
+    # Sin conexión la cola empieza en modo spool
+    ingest_queue = IngestQueue(db_manager, spool=DiskSpool(spool_dir))
+    ingest_queue.start()
+
+    # Los resúmenes de payload se comprueban en el proceso principal
+    dedup = RecentKeyFilter(max_messages=0)
+
+    while True:
+        item = payloads.get()
+        if item is None:
+            break
+
+        device_id, payload = item
+        try:
+            samples = decode_payload(payload)
+        except ValueError as e:
+            DECODE_ERRORS.inc()
+            logger.error(f"Error al decodificar payload de {device_id}: {e}")
+            continue
+
+        SAMPLES_RECEIVED.inc(len(samples))
+        fresh = dedup.new_samples(device_id, samples)
+        DUPLICATE_SAMPLES.inc(len(samples) - len(fresh))
+        if ingest_queue.put(device_id, fresh):
+            dedup.remember(device_id, payload, fresh)
+
+    if not ingest_queue.stop(timeout=drain_timeout):
+        ingest_queue.spool_remaining()
+    db_manager.close()
+
+class WriterPool:
+    """N procesos escritores alimentados con los payloads sin decodificar.
+
+    El callback MQTT solo calcula el shard del dispositivo y encola el
+    payload; la decodificación y la escritura se reparten entre procesos
+    (sin compartir GIL), cada uno con su conexión. Todos los mensajes de
+    un dispositivo van al mismo proceso, así que su orden se conserva.
+    """
+
+    def __init__(self, workers, queue_size=INGEST_WORKER_QUEUE_SIZE,
+                 put_timeout=INGEST_PUT_TIMEOUT, spool_dir=SPOOL_DIR):
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.spool_dir = spool_dir
+        self.dropped_messages = 0
+        self.restarts = 0
+        # spawn: los procesos no heredan los hilos del cliente MQTT
+        self._context = multiprocessing.get_context('spawn')
+        self._queues = [self._context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._processes = []
+        self._metrics = REGISTRY.share(self._context)
+
+    def start(self):
+        """Iniciar los procesos escritores"""
+        if self._processes:
+            return
+
+        self._processes = [self._spawn(index) for index in range(self.workers)]
+        logger.info(f"Pool de escritura iniciado ({self.workers} procesos)")
+
+    def _spawn(self, index):
+        """Iniciar el proceso escritor de un shard"""
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._queues[index],
+                  worker_spool_dir(self.spool_dir, index),
+                  max(0.0, INGEST_DRAIN_TIMEOUT - WORKER_SPOOL_GRACE), self._metrics),
+            name=f'writer-{index}'
+        )
+        process.start()
+        return process
+
+    def put(self, device_id, payload):
+        """Encolar el payload en el proceso del dispositivo.
+
+        Igual que IngestQueue.put, bloquea hasta put_timeout si la cola del
+        proceso está llena y después descarta el mensaje.
+        """
+        index = shard_for(device_id, self.workers)
+
+        # Un escritor caído se reinicia; su cola en memoria se conserva
+        if self._processes and not self._processes[index].is_alive():
+            logger.error(
+                f"{self._processes[index].name} terminó "
+                f"(código {self._processes[index].exitcode}), reiniciando..."
+            )
+            self.restarts += 1
+            self._processes[index] = self._spawn(index)
+
+        try:
+            self._queues[index].put(
+                (device_id, payload), timeout=self.put_timeout
+            )
+            return True
+        except queue.Full:
+            self.dropped_messages += 1
+            DROPPED_MESSAGES.inc()
+            logger.warning(
+                f"Cola del escritor de {device_id} llena, "
+                f"mensaje descartado ({self.dropped_messages} en total)"
+            )
+            return False
+
+    def depth(self):
+        """Mensajes pendientes en las colas de los procesos"""
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self):
+        """Contadores del pool"""
+        return {
+            'workers': self.workers,
+            'alive': sum(p.is_alive() for p in self._processes),
+            'depth': self.depth(),
+            'dropped_messages': self.dropped_messages,
+            'restarts': self.restarts,
+        }
+
+    def stop(self, timeout=None):
+        """Detener los procesos tras vaciar sus colas.
+
+        Devuelve False si alguno no terminó en timeout segundos; ese proceso
+        se termina a la fuerza y se pierde lo que aún tuviera en memoria.
+        """
+        if not self._processes:
+            return True
+
+        logger.info(f"Deteniendo pool de escritura ({self.depth()} mensajes pendientes)...")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for payloads in self._queues:
+            payloads.put(None)
+
+        clean = True
+        for process in self._processes:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            process.join(remaining)
+            if process.is_alive():
+                logger.error(f"{process.name} no terminó en {timeout}s, se detiene")
+                process.terminate()
+                process.join()
+                clean = False
+
+        self._processes = []
+        logger.info("Pool de escritura detenido")
+        return clean
+
+    def spool_remaining(self):
+        """Anexar al spool de cada escritor los payloads que no llegó a leer.
+
+        Para después de un stop() que tuvo que terminar procesos: lo que el
+        proceso ya había leído se pierde, pero lo que seguía en su cola se
+        decodifica aquí y se reproduce en el próximo inicio. Devuelve las
+        muestras anexadas.
+        """
+        total = 0
+        for index, payloads in enumerate(self._queues):
+            batch = []
+            while True:
+                try:
+                    item = payloads.get(timeout=0.1)
+                except (queue.Empty, OSError, ValueError):
+                    break
+                if item is None:
+                    continue
+                device_id, payload = item
+                try:
+                    batch.append((device_id, decode_payload(payload)))
+                except ValueError as e:
+                    DECODE_ERRORS.inc()
+                    logger.error(f"Error al decodificar payload de {device_id}: {e}")
+
+            groups = group_by_device(batch)
+            samples = sum(len(rows) for rows in groups.values())
+            if not samples:
+                continue
+            try:
+                spool = DiskSpool(worker_spool_dir(self.spool_dir, index))
+                spool.append(groups)
+                spool.close()
+            except OSError as e:
+                LOST_SAMPLES.inc(samples)
+                logger.error(f"Error escribiendo en el spool, se pierden {samples} muestras: {e}")
+                continue
+            total += samples
+            logger.warning(f"{samples} muestras de writer-{index} guardadas en el spool al detener")
+        return total
@@ -0,0 +1,14 @@
+"""
+Benchmarks de rendimiento del receptor y del dashboard
+
+Los módulos del backend usan imports planos (from config import ...),
+por lo que se añade backend/ al path antes de importarlos.
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,175 @@
+"""
+Benchmark de lectura: filas de psycopg2 (fetchall) frente a COPY binario a NumPy
+
+Uso (contra una base de datos de pruebas, configurada con TIMESCALE_*):
+    python -m benchmarks.copy_read --hours 1 6 24 --days 1 7
+    python -m benchmarks.copy_read --hours 24 --skip-seed --keep --output copy_read.json
+
+Siembra max(--days, --hours) de muestras del dispositivo bench-dashboard
+(igual que benchmarks.dashboard) y lee con ambos métodos:
+- muestras crudas de las últimas N horas (get_samples, análisis)
+- series por intervalos de los últimos N días (las consultas de
+  get_data_by_days, sin caché)
+Para cada lectura se informa la mediana en ms, las filas por segundo y la
+memoria pico de Python, y se comprueba que ambos métodos devuelven lo mismo.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+import benchmarks  # noqa: F401  (añade backend/ al path)
+from benchmarks.dashboard import DEVICE_ID, seed, cleanup
+from benchmarks.synthetic import SAMPLE_RATE_HZ
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('fetchall', 'copy_binary')
+HOUR_MS = 60 * 60 * 1000
+
+# ====
+# MEDICIÓN
+# ====
+def median_ms(call, repeat):
+    """Mediana en ms de repeat llamadas (tras una de calentamiento)"""
+    call()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+def peak_memory(call):
+    """Memoria pico (MB) asignada por Python durante call"""
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024 / 1024, 2)
+
+def same_columns(a, b):
+    """Ambos métodos devuelven las mismas columnas y valores"""
+    return a.keys() == b.keys() and all(
+        len(a[name]) == len(b[name]) and np.allclose(a[name], b[name], equal_nan=True)
+        for name in a
+    )
+
+def compare(label, read, repeat):
+    """Medir read(method) con cada método"""
+    results = {method: read(method) for method in METHODS}
+    rows = len(results['copy_binary']['timestamp'])
+    row = {'read': label, 'rows': rows,
+           'equal': same_columns(results['fetchall'], results['copy_binary'])}
+    for method in METHODS:
+        ms = median_ms(lambda: read(method), repeat)
+        row[method] = {
+            'ms': round(ms, 2),
+            'rows_per_s': round(rows / ms * 1000) if ms else None,
+            'peak_mb': peak_memory(lambda: read(method)),
+        }
+    row['speedup'] = round(row['fetchall']['ms'] / row['copy_binary']['ms'], 2) \
+        if row['copy_binary']['ms'] else None
+    return row
+
+# ====
+# EJECUCIÓN
+# ====
+def run(hours_list, days_list, repeat):
+    """Comparar ambos métodos en cada rango de muestras y de series"""
+    # Importado aquí para que la configuración del entorno ya esté fijada
+    import frontend.database as frontend_database
+
+    with frontend_database.db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(timestamp) FROM sensor_data WHERE device_id = %s", (DEVICE_ID,))
+        newest = cursor.fetchone()[0]
+        cursor.close()
+    if newest is None:
+        raise SystemExit(f"No hay datos de {DEVICE_ID}: ejecutar sin --skip-seed")
+
+    results = []
+    for hours in hours_list:
+        start = newest + 1 - hours * HOUR_MS
+
+        def read_samples(method):
+            return frontend_database.get_samples(start, newest + 1, DEVICE_ID, read_method=method)
+
+        results.append(compare(f"muestras {hours} h", read_samples, repeat))
+
+    for days in days_list:
+        plan = frontend_database.query_plan(days, method='bucket', device=DEVICE_ID)
+
+        def read_buckets(method):
+            with frontend_database.db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    return frontend_database._fetch_buckets(cursor, plan, read_method=method)
+                finally:
+                    cursor.close()
+
+        source = plan['view'] or 'sensor_data'
+        results.append(compare(f"series {days} d ({source})", read_buckets, repeat))
+
+    return results
+
+def print_table(results):
+    header = (f"{'lectura':<32}{'filas':>10}"
+              + ''.join(f"{method + ' ms':>18}{'MB':>8}" for method in METHODS)
+              + f"{'mejora':>8}{'iguales':>9}")
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(f"{row['read']:<32}{row['rows']:>10}"
+              + ''.join(f"{row[method]['ms']:>18.2f}{row[method]['peak_mb']:>8.2f}"
+                        for method in METHODS)
+              + f"{row['speedup'] or 0:>7.2f}x{'sí' if row['equal'] else 'NO':>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=int, nargs='+', default=[1, 6, 24],
+                        help="Rangos de muestras crudas")
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 7],
+                        help="Rangos de series por intervalos")
+    parser.add_argument('--rate-hz', type=int, default=SAMPLE_RATE_HZ,
+                        help="Frecuencia de las muestras sembradas")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por lectura")
+    parser.add_argument('--skip-seed', action='store_true',
+                        help="Reutilizar los datos de una ejecución con --keep")
+    parser.add_argument('--keep', action='store_true', help="No eliminar los datos sembrados")
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Lecturas siempre contra la base de datos y sin EXPLAIN de consultas lentas
+    os.environ['CACHE_ENABLED'] = 'False'
+    os.environ['QUERY_PROFILING'] = 'False'
+
+    if not args.skip_seed:
+        seed(max(max(args.days), math.ceil(max(args.hours) / 24)), args.rate_hz)
+
+    try:
+        results = run(args.hours, args.days, args.repeat)
+    finally:
+        if not args.keep:
+            cleanup()
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'rate_hz': args.rate_hz,
+                'repeat': args.repeat,
+                'results': results,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
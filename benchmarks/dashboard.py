@@ -0,0 +1,327 @@
+"""
+Benchmark de los callbacks del dashboard según el rango de datos
+
+Uso (contra una base de datos de pruebas, configurada con TIMESCALE_*):
+    python -m benchmarks.dashboard --days 1 7 30
+    python -m benchmarks.dashboard --days 1 7 --rate-hz 10 --keep --output dashboard.json
+    python -m benchmarks.dashboard --days 30 --skip-seed --method lttb
+
+Siembra sensor_data con max(--days) días de muestras hasta el momento
+actual para el dispositivo bench-dashboard (generadas en el servidor con
+generate_series y seguidas de un refresco de los agregados continuos) y
+llama sin servidor a get_data_by_days, get_latest_values y
+update_dashboard para cada rango. El tiempo de cada llamada se reparte en
+consulta (execute), lectura de filas (fetch), transformación en Python,
+construcción de figuras y serialización JSON de la respuesta; la memoria
+pico se mide con tracemalloc en una pasada aparte.
+
+La caché de muestras recientes se desactiva salvo con --cache, para que
+las consultas lleguen siempre a la base de datos.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import psycopg2.extensions
+
+import benchmarks  # noqa: F401  (añade backend/ al path)
+from benchmarks.synthetic import SAMPLE_RATE_HZ
+from config import ROLLUPS, DAY_MS
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+DEVICE_ID = 'bench-dashboard'
+STAGES = ('query', 'fetch', 'transform', 'figure', 'json')
+
+# Señal sintética: gravedad en az, oscilación lenta y ruido
+SEED_SQL = """
+    INSERT INTO sensor_data (timestamp, ax, ay, az, gx, gy, gz, device_id)
+    SELECT
+        t,
+        0.3 * sin(t / 5000.0) + random() * 0.2,
+        0.3 * cos(t / 7000.0) + random() * 0.2,
+        9.81 + random() * 0.2,
+        5 * sin(t / 3000.0) + random(),
+        5 * cos(t / 4000.0) + random(),
+        random(),
+        %(device)s
+    FROM generate_series(%(start)s::BIGINT, %(end)s::BIGINT - 1, %(step)s::BIGINT) AS t
+    ON CONFLICT DO NOTHING
+"""
+
+# ====
+# DATOS SINTÉTICOS
+# ====
+def seed(days, rate_hz):
+    """Insertar days días de muestras hasta ahora, día por día, y refrescar los rollups"""
+    db_manager = DatabaseManager()
+    db_manager.connect()
+    db_manager.initialize_schema()
+
+    end = int(time.time() * 1000)
+    step = max(1, 1000 // rate_hz)
+    cursor = db_manager.conn.cursor()
+    try:
+        for day in range(days):
+            day_end = end - day * DAY_MS
+            cursor.execute(SEED_SQL, {
+                'device': DEVICE_ID, 'start': day_end - DAY_MS, 'end': day_end, 'step': step,
+            })
+            db_manager.conn.commit()
+            print(f"Sembrado día {day + 1}/{days} ({cursor.rowcount} filas)")
+        cursor.execute(
+            "INSERT INTO devices (device_id, last_seen) VALUES (%s, NOW()) "
+            "ON CONFLICT (device_id) DO UPDATE SET last_seen = EXCLUDED.last_seen",
+            (DEVICE_ID,)
+        )
+        db_manager.conn.commit()
+
+        # refresh_continuous_aggregate no admite bloques de transacción
+        db_manager.conn.autocommit = True
+        for view in ROLLUPS:
+            try:
+                cursor.execute("CALL refresh_continuous_aggregate(%s, NULL, NULL)", (view,))
+            except Exception as e:
+                logger.warning(f"No se pudo refrescar {view}: {e}")
+    finally:
+        cursor.close()
+        db_manager.close()
+
+def cleanup():
+    """Eliminar las muestras y el dispositivo del benchmark"""
+    db_manager = DatabaseManager()
+    db_manager.connect()
+    cursor = db_manager.conn.cursor()
+    cursor.execute("DELETE FROM sensor_data WHERE device_id = %s", (DEVICE_ID,))
+    cursor.execute("DELETE FROM devices WHERE device_id = %s", (DEVICE_ID,))
+    db_manager.conn.commit()
+    cursor.close()
+    db_manager.close()
+
+# ====
+# MEDICIÓN POR ETAPAS
+# ====
+class StageTimer:
+    """Acumulador de segundos por etapa"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def reset(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+timer = StageTimer()
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor que separa el tiempo de consulta del de lectura de filas"""
+
+    def execute(self, query, vars=None):
+        with timer.stage('query'):
+            return super().execute(query, vars)
+
+    def fetchall(self):
+        with timer.stage('fetch'):
+            return super().fetchall()
+
+    def fetchone(self):
+        with timer.stage('fetch'):
+            return super().fetchone()
+
+    def copy_expert(self, sql, file, size=8192):
+        # COPY binario: consulta y transferencia en una sola llamada
+        with timer.stage('query'):
+            return super().copy_expert(sql, file, size)
+
+def instrument(frontend_database, frontend_app):
+    """Medir las etapas sin modificar el dashboard.
+
+    Las conexiones del pool usan TimedCursor y las funciones de
+    transformación (filas o buffer COPY a columnas, LTTB y series de los
+    gráficos) se envuelven con la etapa 'transform'. La construcción de
+    figuras es el resto del tiempo de update_dashboard.
+    """
+    import frontend.pgcopy as frontend_pgcopy
+    db_connection = frontend_database.db_connection
+
+    @contextmanager
+    def timed_connection():
+        with db_connection() as conn:
+            conn.cursor_factory = TimedCursor
+            yield conn
+
+    frontend_database.db_connection = timed_connection
+
+    def timed(module, name):
+        function = getattr(module, name)
+
+        def wrapper(*args, **kwargs):
+            with timer.stage('transform'):
+                return function(*args, **kwargs)
+
+        setattr(module, name, wrapper)
+
+    timed(frontend_database, 'to_columns')
+    timed(frontend_pgcopy, 'parse_copy')
+    timed(frontend_database, '_lttb_series')
+    timed(frontend_app, 'get_series')
+    timed(frontend_app, 'get_indicators')
+
+def measure(call, serialize=None):
+    """Ejecutar call y devolver (resultado, segundos por etapa, bytes JSON)"""
+    timer.reset()
+    start = time.perf_counter()
+    result = call()
+    total = time.perf_counter() - start
+
+    size = None
+    if serialize:
+        with timer.stage('json'):
+            size = len(serialize(result))
+
+    seconds = dict(timer.seconds)
+    if serialize:
+        seconds['figure'] = max(0.0, total - seconds['query'] - seconds['fetch'] - seconds['transform'])
+    return result, seconds, size
+
+def peak_memory(call):
+    """Memoria pico (MB) asignada por Python durante call"""
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024 / 1024, 2)
+
+def summarize(runs):
+    """Mediana en ms de cada etapa y del total sobre las repeticiones"""
+    summary = {
+        stage: round(float(np.median([r[stage] for r in runs])) * 1000, 2) for stage in STAGES
+    }
+    summary['total'] = round(float(np.median([sum(r.values()) for r in runs])) * 1000, 2)
+    return summary
+
+# ====
+# EJECUCIÓN
+# ====
+def run(days_list, repeat, method):
+    """Medir las tres llamadas para cada rango"""
+    # Importados aquí para que la configuración del entorno ya esté fijada
+    from plotly.io.json import to_json_plotly
+    import frontend.database as frontend_database
+    import frontend.app as frontend_app
+
+    instrument(frontend_database, frontend_app)
+
+    calls = {
+        'get_data_by_days': (
+            lambda days: frontend_database.get_data_by_days(days, method=method, device=DEVICE_ID),
+            None),
+        'get_latest_values': (
+            lambda days: frontend_database.get_latest_values(DEVICE_ID),
+            None),
+        'update_dashboard': (
+            lambda days: frontend_app.update_dashboard(days, DEVICE_ID),
+            to_json_plotly),
+    }
+
+    results = []
+    for days in days_list:
+        plan = frontend_database.query_plan(days, method=method, device=DEVICE_ID)
+        for name, (call, serialize) in calls.items():
+            # Primera llamada de calentamiento (conexión del pool, imports)
+            call(days)
+
+            runs = []
+            for _ in range(repeat):
+                result, seconds, size = measure(lambda: call(days), serialize)
+                runs.append(seconds)
+
+            row = {
+                'days': days,
+                'call': name,
+                # La última muestra siempre se lee de sensor_data
+                'source': 'sensor_data' if name == 'get_latest_values'
+                          else plan['view'] or 'sensor_data',
+                'width_ms': plan['width'],
+                'ms': summarize(runs),
+                'peak_mb': peak_memory(
+                    lambda: serialize(call(days)) if serialize else call(days)
+                ),
+            }
+            if name == 'get_data_by_days':
+                row['points'] = len(result['timestamp'])
+            if size is not None:
+                row['json_bytes'] = size
+            results.append(row)
+
+    return results
+
+def print_table(results):
+    header = f"{'días':>5} {'llamada':<18} {'fuente':<15}" + \
+        ''.join(f"{stage:>10}" for stage in STAGES + ('total',)) + f"{'pico MB':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(f"{row['days']:>5} {row['call']:<18} {row['source']:<15}"
+              + ''.join(f"{row['ms'][stage]:>10.2f}" for stage in STAGES + ('total',))
+              + f"{row['peak_mb']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 7, 30])
+    parser.add_argument('--rate-hz', type=int, default=SAMPLE_RATE_HZ,
+                        help="Frecuencia de las muestras sembradas")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por llamada")
+    parser.add_argument('--method', choices=('bucket', 'lttb'), default=None,
+                        help="Reducción de datos (por defecto DOWNSAMPLE_METHOD)")
+    parser.add_argument('--cache', action='store_true',
+                        help="Usar la caché de muestras recientes del dashboard")
+    parser.add_argument('--skip-seed', action='store_true',
+                        help="Reutilizar los datos de una ejecución con --keep")
+    parser.add_argument('--keep', action='store_true', help="No eliminar los datos sembrados")
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.environ['CACHE_ENABLED'] = str(args.cache)
+    from frontend.config import DOWNSAMPLE_METHOD
+    method = args.method or DOWNSAMPLE_METHOD
+
+    if not args.skip_seed:
+        seed(max(args.days), args.rate_hz)
+
+    try:
+        results = run(sorted(args.days), args.repeat, method)
+    finally:
+        if not args.keep:
+            cleanup()
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'rate_hz': args.rate_hz,
+                'method': method,
+                'cache': args.cache,
+                'repeat': args.repeat,
+                'results': results,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark de ingesta de extremo a extremo con una flota ESP32 sintética
+
+Uso (contra una base de datos de pruebas, configurada con TIMESCALE_*):
+    python -m benchmarks.ingest --devices 8 --rate 200 --batch-size 50 --duration 30
+    python -m benchmarks.ingest --transport broker --format binary --output ingest.json
+    python -m benchmarks.ingest --workers 4 --rate 0
+
+Los mensajes se generan de antemano y se entregan a
+MQTTHandler.on_message_received, directamente desde el hilo generador o a
+través de un broker local que, como el cliente de AWS IoT, despacha los
+callbacks desde un único hilo de red. La latencia se mide desde la
+recepción del mensaje hasta el commit de su última muestra. Las muestras
+se guardan con device_id bench-NN y se eliminan al terminar.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import benchmarks  # noqa: F401  (añade backend/ al path)
+from benchmarks.synthetic import generate_samples, SYNTHETIC_START_MS, SAMPLE_RATE_HZ
+from config import DB_WRITE_METHOD, DB_WRITE_METHODS, INGEST_BATCH_SIZE
+from database import DatabaseManager
+from ingest_queue import IngestQueue
+from mqtt_handler import MQTTHandler
+from payload import encode_binary
+from samples import from_dicts
+from spool import DiskSpool
+from writer_pool import WriterPool
+
+logger = logging.getLogger(__name__)
+
+DEVICE_PREFIX = 'bench-'
+TOPIC = 'esp32/{device}/mpu6050/data'
+
+# ====
+# CARGA SINTÉTICA
+# ====
+def build_messages(devices, messages_per_device, batch_size, payload_format, seed=42):
+    """Payloads de cada dispositivo, intercalados como los enviaría la flota.
+
+    Devuelve una lista de (device_id, último timestamp, payload).
+    """
+    per_device = []
+    for d in range(devices):
+        device_id = f'{DEVICE_PREFIX}{d:02d}'
+        samples = generate_samples(
+            messages_per_device * batch_size, start_ms=SYNTHETIC_START_MS, seed=seed + d
+        )
+        messages = []
+        for m in range(messages_per_device):
+            chunk = samples[m * batch_size:(m + 1) * batch_size]
+            binary = payload_format == 'binary' or (payload_format == 'mixed' and m % 2)
+            if binary:
+                payload = encode_binary(from_dicts(chunk))
+            else:
+                payload = json.dumps({'samples': chunk}).encode('utf-8')
+            messages.append((device_id, chunk[-1]['t'], payload))
+        per_device.append(messages)
+
+    return [msg for group in zip(*per_device) for msg in group]
+
+class LocalBroker:
+    """Sustituto local del broker: un hilo de red despacha los callbacks en orden"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='local-broker', daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, payload):
+        self._queue.put((topic, payload))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            topic, payload = item
+            self.callback(topic, payload, dup=False, qos=1, retain=False)
+
+    def close(self):
+        """Esperar a que se despachen los mensajes publicados"""
+        self._queue.put(None)
+        self._thread.join()
+
+# ====
+# MEDICIÓN
+# ====
+class LatencyTracker:
+    """Hora de recepción de cada mensaje y latencia hasta el commit de su última muestra"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.last_commit = None
+
+    def received(self, device_id, last_t):
+        with self._lock:
+            self._pending.setdefault(device_id, []).append((last_t, time.perf_counter()))
+
+    def committed(self, groups):
+        now = time.perf_counter()
+        with self._lock:
+            for device_id, samples in groups.items():
+                newest = int(samples['t'].max())
+                pending = self._pending.get(device_id, [])
+                done = [received for last_t, received in pending if last_t <= newest]
+                self._pending[device_id] = [p for p in pending if p[0] > newest]
+                self.latencies.extend(now - received for received in done)
+            self.last_commit = now
+
+class TrackedDatabaseManager(DatabaseManager):
+    """DatabaseManager que notifica cada commit y mide la duración de cada lote"""
+
+    def __init__(self, tracker, **kwargs):
+        super().__init__(**kwargs)
+        self.tracker = tracker
+        self.flush_times = []
+
+    def save_groups(self, groups):
+        start = time.perf_counter()
+        saved = super().save_groups(groups)
+        if saved:
+            self.flush_times.append(time.perf_counter() - start)
+            self.tracker.committed(groups)
+        return saved
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentiles en ms (None si no hay valores)"""
+    if not values:
+        return {f'p{p}': None for p in points} | {'max': None}
+    ms = np.asarray(values) * 1000
+    result = {f'p{p}': round(float(np.percentile(ms, p)), 2) for p in points}
+    result['max'] = round(float(ms.max()), 2)
+    return result
+
+def pool_latencies(db_manager, tracker):
+    """Latencias del modo multiproceso: el commit ocurre en otros procesos, así
+    que se usa received_at (inicio de la transacción que guardó la muestra)"""
+    keys = [(device_id, last_t, received)
+            for device_id, pending in tracker._pending.items()
+            for last_t, received in pending]
+    if not keys:
+        return
+
+    # Reloj de pared de cada recepción a partir del monotónico
+    offset = time.time() - time.perf_counter()
+    cursor = db_manager.conn.cursor()
+    cursor.execute("""
+        SELECT k.i, EXTRACT(EPOCH FROM s.received_at)
+        FROM unnest(%s::TEXT[], %s::BIGINT[]) WITH ORDINALITY AS k(device_id, t, i)
+        JOIN sensor_data s ON s.device_id = k.device_id AND s.timestamp = k.t
+    """, ([k[0] for k in keys], [k[1] for k in keys]))
+    for i, saved_at in cursor.fetchall():
+        tracker.latencies.append(float(saved_at) - (keys[i - 1][2] + offset))
+    cursor.close()
+
+def cleanup(db_manager):
+    """Eliminar las muestras y dispositivos del benchmark"""
+    cursor = db_manager.conn.cursor()
+    cursor.execute("DELETE FROM sensor_data WHERE device_id LIKE %s", (DEVICE_PREFIX + '%',))
+    cursor.execute("DELETE FROM devices WHERE device_id LIKE %s", (DEVICE_PREFIX + '%',))
+    db_manager.conn.commit()
+    cursor.close()
+
+# ====
+# EJECUCIÓN
+# ====
+def run(args):
+    """Ejecutar una pasada y devolver el informe"""
+    messages_per_device = max(1, int(args.rate * args.duration / args.devices)) if args.rate \
+        else args.messages_per_device
+    messages = build_messages(args.devices, messages_per_device, args.batch_size, args.format)
+    total_samples = len(messages) * args.batch_size
+
+    tracker = LatencyTracker()
+    db_manager = TrackedDatabaseManager(tracker, write_method=args.method)
+    db_manager.connect()
+    db_manager.initialize_schema()
+    cleanup(db_manager)
+
+    # Spool propio para no reenviar lo pendiente del worker real
+    spool_dir = tempfile.mkdtemp(prefix='bench-spool-')
+    if args.workers:
+        # Los procesos escritores leen la configuración del entorno al arrancar
+        os.environ['DB_WRITE_METHOD'] = args.method
+        ingest = WriterPool(args.workers, spool_dir=spool_dir)
+    else:
+        ingest = IngestQueue(db_manager, spool=DiskSpool(spool_dir),
+                             batch_size=args.ingest_batch_size)
+    ingest.start()
+    handler = MQTTHandler(ingest)
+    broker = LocalBroker(handler.on_message_received) if args.transport == 'broker' else None
+
+    try:
+        interval = 1.0 / args.rate if args.rate else 0.0
+        start = time.perf_counter()
+        for i, (device_id, last_t, payload) in enumerate(messages):
+            if interval:
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            topic = TOPIC.format(device=device_id)
+            tracker.received(device_id, last_t)
+            if broker:
+                broker.publish(topic, payload)
+            else:
+                handler.on_message_received(topic, payload, dup=False, qos=1, retain=False)
+        sent = time.perf_counter()
+
+        if broker:
+            broker.close()
+        drained = ingest.stop(timeout=args.drain_timeout)
+        finished = tracker.last_commit if not args.workers else time.perf_counter()
+        stats = ingest.stats()
+
+        if args.workers:
+            pool_latencies(db_manager, tracker)
+    finally:
+        cleanup(db_manager)
+        db_manager.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    elapsed = (finished or sent) - start
+    return {
+        'config': {
+            'devices': args.devices,
+            'rate': args.rate,
+            'batch_size': args.batch_size,
+            'format': args.format,
+            'transport': args.transport,
+            'workers': args.workers,
+            'write_method': args.method,
+            'ingest_batch_size': args.ingest_batch_size,
+            'messages': len(messages),
+            'samples': total_samples,
+            'avg_payload_bytes': round(sum(len(m[2]) for m in messages) / len(messages), 1),
+        },
+        'results': {
+            'send_seconds': round(sent - start, 3),
+            'total_seconds': round(elapsed, 3),
+            'drained': drained,
+            'offered_messages_per_second': round(len(messages) / (sent - start), 1),
+            'messages_per_second': round(len(messages) / elapsed, 1),
+            'samples_per_second': round(total_samples / elapsed, 1),
+            'dropped_messages': stats['dropped_messages'],
+            'latency_ms': percentiles(tracker.latencies),
+            'latency_source': 'received_at' if args.workers else 'commit',
+            'flush_ms': percentiles(db_manager.flush_times) if not args.workers else None,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=100.0,
+                        help="Mensajes/s de toda la flota (0 = sin límite)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument('--messages-per-device', type=int, default=500,
+                        help="Mensajes por dispositivo con --rate 0")
+    parser.add_argument('--batch-size', type=int, default=SAMPLE_RATE_HZ // 2,
+                        help="Muestras por mensaje")
+    parser.add_argument('--format', choices=('json', 'binary', 'mixed'), default='json')
+    parser.add_argument('--transport', choices=('direct', 'broker'), default='direct')
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Procesos escritores (0 = cola en el mismo proceso)")
+    parser.add_argument('--method', default=DB_WRITE_METHOD,
+                        choices=DB_WRITE_METHODS)
+    parser.add_argument('--ingest-batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--drain-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    report = run(args)
+    results = report['results']
+    latency = results['latency_ms']
+
+    print(f"{report['config']['messages']} mensajes, {report['config']['samples']} muestras "
+          f"({args.devices} dispositivos, {args.format}, {args.transport}, "
+          f"{args.workers or 'sin'} procesos escritores, {args.method})")
+    print(f"mensajes/s: {results['messages_per_second']:.1f} "
+          f"(ofrecidos {results['offered_messages_per_second']:.1f})")
+    print(f"muestras/s: {results['samples_per_second']:.1f}")
+    print(f"latencia ({results['latency_source']}): p50 {latency['p50']} ms, "
+          f"p99 {latency['p99']} ms, máx {latency['max']} ms")
+    if results['dropped_messages']:
+        print(f"descartados: {results['dropped_messages']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Comparación de throughput de DatabaseManager.save_samples por método de escritura
+
+Uso (contra una base de datos de pruebas, configurada con TIMESCALE_*):
+    python -m benchmarks.save_samples --samples 200000 --batch-size 2000
+
+Las muestras se insertan en sensor_data con timestamps sintéticos y el
+device_id bench-save-samples, y se eliminan al terminar cada método.
+"""
+import argparse
+import json
+import logging
+import time
+
+import benchmarks  # noqa: F401  (añade backend/ al path)
+from benchmarks.synthetic import generate_samples, SYNTHETIC_START_MS
+from config import DB_WRITE_METHODS
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Dispositivo propio: la limpieza no toca datos reales del mismo rango
+DEVICE_ID = 'bench-save-samples'
+
+def cleanup(db_manager, samples):
+    """Eliminar las muestras sintéticas insertadas y su dispositivo"""
+    cursor = db_manager.conn.cursor()
+    cursor.execute(
+        "DELETE FROM sensor_data WHERE device_id = %s AND timestamp BETWEEN %s AND %s",
+        (DEVICE_ID, samples[0]['t'], samples[-1]['t'])
+    )
+    cursor.execute("DELETE FROM devices WHERE device_id = %s", (DEVICE_ID,))
+    db_manager.conn.commit()
+    cursor.close()
+
+def run_method(method, samples, batch_size):
+    """Medir el tiempo de escritura de todas las muestras con un método"""
+    db_manager = DatabaseManager(write_method=method)
+    db_manager.connect()
+    db_manager.initialize_schema()
+
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(samples), batch_size):
+            db_manager.save_samples(samples[i:i + batch_size], DEVICE_ID)
+        elapsed = time.perf_counter() - start
+    finally:
+        cleanup(db_manager, samples)
+        db_manager.close()
+
+    return {
+        'method': method,
+        'samples': len(samples),
+        'batch_size': batch_size,
+        'seconds': round(elapsed, 3),
+        'samples_per_second': round(len(samples) / elapsed, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--methods', nargs='+', default=list(DB_WRITE_METHODS),
+                        choices=DB_WRITE_METHODS)
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    samples = generate_samples(args.samples, start_ms=SYNTHETIC_START_MS, seed=42)
+    results = [run_method(m, samples, args.batch_size) for m in args.methods]
+
+    print(f"{'método':<12} {'muestras/s':>12} {'segundos':>10}")
+    for r in results:
+        print(f"{r['method']:<12} {r['samples_per_second']:>12.1f} {r['seconds']:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
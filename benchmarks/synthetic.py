@@ -0,0 +1,43 @@
+"""
+Generación de datos sintéticos del MPU6050
+"""
+import math
+import random
+
+# Frecuencia de muestreo real del ESP32
+SAMPLE_RATE_HZ = 100
+
+# Timestamp base para datos sintéticos (2001-09-09), lejos de los datos reales
+SYNTHETIC_START_MS = 1_000_000_000_000
+
+def generate_samples(count, start_ms=SYNTHETIC_START_MS, rate_hz=SAMPLE_RATE_HZ,
+                     spike_probability=0.001, seed=None):
+    """Generar muestras con el formato del payload del ESP32 ({'t', 'a', 'g'})
+
+    Aceleración en reposo con gravedad sobre Z, vibración senoidal, ruido
+    gaussiano y picos ocasionales; giroscopio con ruido alrededor de cero.
+    """
+    rng = random.Random(seed)
+    step_ms = 1000.0 / rate_hz
+    samples = []
+
+    for i in range(count):
+        t = int(start_ms + i * step_ms)
+        vibration = 0.3 * math.sin(2 * math.pi * 12 * i / rate_hz)
+        spike = rng.uniform(5, 15) if rng.random() < spike_probability else 0.0
+
+        samples.append({
+            't': t,
+            'a': [
+                round(rng.gauss(0, 0.05) + vibration, 4),
+                round(rng.gauss(0, 0.05), 4),
+                round(9.81 + rng.gauss(0, 0.05) + spike, 4),
+            ],
+            'g': [
+                round(rng.gauss(0, 0.5), 4),
+                round(rng.gauss(0, 0.5), 4),
+                round(rng.gauss(0, 0.5) + spike * 10, 4),
+            ],
+        })
+
+    return samples
@@ -2,26 +2,42 @@
 Dashboard en tiempo real para visualización de datos del sensor MPU6050
 """
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, ctx, Input, Output, State, Patch, ClientsideFunction, no_update
+from dash.exceptions import PreventUpdate
 import plotly.graph_objs as go
-from datetime import datetime
-import psycopg2
 import numpy as np
 import logging
 import os
+import re
+import hmac
+import threading
+from html import escape
 from dotenv import load_dotenv
+from flask import Response, jsonify, request
 
 # Importar estilos
 from frontend.styles import (
     COLORS, MAIN_CONTAINER_STYLE, HEADER_CONTAINER_STYLE, HEADER_TITLE_STYLE,
     HEADER_SUBTITLE_STYLE, TIME_SELECTOR_CONTAINER_STYLE, TIME_SELECTOR_LABEL_STYLE,
-    TIME_SELECTOR_DROPDOWN_STYLE, CARD_STYLE, CARD_TITLE_STYLE, LAST_UPDATE_STYLE,
+    TIME_SELECTOR_DROPDOWN_STYLE, DEVICE_SELECTOR_LABEL_STYLE, CARD_STYLE, CARD_TITLE_STYLE, LAST_UPDATE_STYLE,
     INDICATORS_CONTAINER_STYLE, ACCEL_SECTION_STYLE, GYRO_SECTION_STYLE,
     INDICATOR_TITLE_ACCEL_STYLE, INDICATOR_TITLE_GYRO_STYLE, INDICATOR_VALUES_CONTAINER_STYLE,
     INDICATOR_ITEM_STYLE, GRAPH_CONTAINER_STYLE, INDICATOR_BOX_STYLE, INDICATOR_LABEL_STYLE,
     get_indicator_value_style, GRAPH_CONFIG, get_graph_layout, ACCEL_LINE_CONFIG,
-    GYRO_LINE_CONFIG, ACCEL_FILL_COLOR, GYRO_FILL_COLOR, TIME_RANGE_OPTIONS, UPDATE_INTERVAL
+    GYRO_LINE_CONFIG, ACCEL_FILL_COLOR, GYRO_FILL_COLOR, MAGNITUDE_HOVER_TEMPLATE,
+    TIME_RANGE_OPTIONS, UPDATE_INTERVAL
 )
+from frontend.config import (
+    MAX_POINTS, ZOOM_MAX_POINTS, DEFAULT_DEVICE_ID, QUERY_DEBUG_PAGE, STREAM_ENABLED,
+    EXPORT_ENABLED, EXPORT_TOKEN, EXPORT_MAX_CONCURRENT, EXPORT_MAX_DAYS
+)
+from frontend.database import (
+    get_data_by_days, get_data_since, get_data_window, get_latest_values, get_devices,
+    query_plan, tail_plan, tail_last_ts
+)
+from frontend.export import EXPORTERS, CONTENT_TYPES, parse_time
+from frontend.profiling import PROFILER
+from frontend.stream import FEED, last_update_text
 
 # Cargar variables de entorno
 load_dotenv()
@@ -30,97 +46,6 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ====
-# CONFIGURACIÓN TIMESCALE CLOUD
-# ====
-TIMESCALE_HOST = os.getenv('TIMESCALE_HOST')
-TIMESCALE_PORT = int(os.getenv('TIMESCALE_PORT', 5432))
-TIMESCALE_DB = os.getenv('TIMESCALE_DB', 'tsdb')
-TIMESCALE_USER = os.getenv('TIMESCALE_USER')
-TIMESCALE_PASSWORD = os.getenv('TIMESCALE_PASSWORD')
-
-# ====
-# FUNCIONES DE BASE DE DATOS
-# ====
-def get_db_connection():
-    """Crear conexión a la base de datos"""
-    try:
-        conn = psycopg2.connect(
-            host=TIMESCALE_HOST,
-            port=TIMESCALE_PORT,
-            database=TIMESCALE_DB,
-            user=TIMESCALE_USER,
-            password=TIMESCALE_PASSWORD,
-            sslmode='require'
-        )
-        return conn
-    except Exception as e:
-        logger.error(f"Error conectando a la base de datos: {e}")
-        return None
-
-def get_data_by_days(days=1):
-    """Obtener datos de los últimos N días"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
-    try:
-        cursor = conn.cursor()
-        ms_range = days * 24 * 60 * 60 * 1000
-        
-        cursor.execute("""
-            SELECT 
-                timestamp,
-                ax, ay, az,
-                gx, gy, gz,
-                received_at
-            FROM sensor_data
-            WHERE timestamp > (
-                SELECT MAX(timestamp) - %s 
-                FROM sensor_data
-            )
-            ORDER BY timestamp ASC
-        """, (ms_range,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return results
-    except Exception as e:
-        logger.error(f"Error obteniendo datos: {e}")
-        if conn:
-            conn.close()
-        return []
-
-def get_latest_values():
-    """Obtener los últimos valores registrados"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                timestamp,
-                ax, ay, az,
-                gx, gy, gz,
-                received_at
-            FROM sensor_data
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """)
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return result
-    except Exception as e:
-        logger.error(f"Error obteniendo últimos valores: {e}")
-        if conn:
-            conn.close()
-        return None
-
 # ====
 # INICIALIZAR DASH APP
 # ====
@@ -130,81 +55,132 @@ app.title = "Monitor MPU6050 - Tiempo Real"
 # ====
 # LAYOUT DEL DASHBOARD
 # ====
-app.layout = html.Div([
-    # Encabezado
-    html.Div([
-        html.H1("📊 Monitor de Sensor MPU6050", style=HEADER_TITLE_STYLE),
-        html.P("Visualización en tiempo real de acelerómetro y giroscopio", 
-               style=HEADER_SUBTITLE_STYLE)
-    ], style=HEADER_CONTAINER_STYLE),
-    
-    # Selector de rango de tiempo
-    html.Div([
-        html.Label("Rango de tiempo histórico:", style=TIME_SELECTOR_LABEL_STYLE),
-        dcc.Dropdown(
-            id='time-range-selector',
-            options=TIME_RANGE_OPTIONS,
-            value=1,
-            clearable=False,
-            style=TIME_SELECTOR_DROPDOWN_STYLE
-        )
-    ], style=TIME_SELECTOR_CONTAINER_STYLE),
+def serve_layout():
+    """Layout generado en cada carga de página (lista de dispositivos actualizada)"""
+    devices = get_devices()
+    device = DEFAULT_DEVICE_ID if DEFAULT_DEVICE_ID in devices else devices[0]
     
-    # Sección de últimos valores
-    html.Div([
-        html.H3("📍 Últimos Valores Registrados", style=CARD_TITLE_STYLE),
-        html.Div(id='last-update-time', style=LAST_UPDATE_STYLE),
+    return html.Div([
+        # Encabezado
+        html.Div([
+            html.H1("📊 Monitor de Sensor MPU6050", style=HEADER_TITLE_STYLE),
+            html.P("Visualización en tiempo real de acelerómetro y giroscopio", 
+                   style=HEADER_SUBTITLE_STYLE)
+        ], style=HEADER_CONTAINER_STYLE),
         
-        # Indicadores numéricos
+        # Selector de rango de tiempo
         html.Div([
-            # Acelerómetro
-            html.Div([
-                html.H4("Acelerómetro (m/s²)", style=INDICATOR_TITLE_ACCEL_STYLE),
-                html.Div([
-                    html.Div(id='indicator-ax', style=INDICATOR_ITEM_STYLE),
-                    html.Div(id='indicator-ay', style=INDICATOR_ITEM_STYLE),
-                    html.Div(id='indicator-az', style=INDICATOR_ITEM_STYLE)
-                ], style=INDICATOR_VALUES_CONTAINER_STYLE)
-            ], style=ACCEL_SECTION_STYLE),
+            html.Label("Rango de tiempo histórico:", style=TIME_SELECTOR_LABEL_STYLE),
+            dcc.Dropdown(
+                id='time-range-selector',
+                options=TIME_RANGE_OPTIONS,
+                value=1,
+                clearable=False,
+                style=TIME_SELECTOR_DROPDOWN_STYLE
+            ),
+            html.Label("Dispositivo:", style=DEVICE_SELECTOR_LABEL_STYLE),
+            dcc.Dropdown(
+                id='device-selector',
+                options=[{'label': d, 'value': d} for d in devices],
+                value=device,
+                clearable=False,
+                style=TIME_SELECTOR_DROPDOWN_STYLE
+            )
+        ], style=TIME_SELECTOR_CONTAINER_STYLE),
+        
+        # Sección de últimos valores
+        html.Div([
+            html.H3("📍 Últimos Valores Registrados", style=CARD_TITLE_STYLE),
+            html.Div(id='last-update-time', style=LAST_UPDATE_STYLE),
             
-            # Giroscopio
+            # Indicadores numéricos
             html.Div([
-                html.H4("Giroscopio (°/s)", style=INDICATOR_TITLE_GYRO_STYLE),
+                # Acelerómetro
                 html.Div([
-                    html.Div(id='indicator-gx', style=INDICATOR_ITEM_STYLE),
-                    html.Div(id='indicator-gy', style=INDICATOR_ITEM_STYLE),
-                    html.Div(id='indicator-gz', style=INDICATOR_ITEM_STYLE)
-                ], style=INDICATOR_VALUES_CONTAINER_STYLE)
-            ], style=GYRO_SECTION_STYLE)
-        ], style=INDICATORS_CONTAINER_STYLE)
-    ], style=CARD_STYLE),
-    
-    # Gráficos en tiempo real
-    html.Div([
-        html.H3("📈 Magnitud Absoluta en Tiempo Real", style=CARD_TITLE_STYLE),
+                    html.H4("Acelerómetro (m/s²)", style=INDICATOR_TITLE_ACCEL_STYLE),
+                    html.Div([
+                        html.Div(id='indicator-ax', style=INDICATOR_ITEM_STYLE),
+                        html.Div(id='indicator-ay', style=INDICATOR_ITEM_STYLE),
+                        html.Div(id='indicator-az', style=INDICATOR_ITEM_STYLE)
+                    ], style=INDICATOR_VALUES_CONTAINER_STYLE)
+                ], style=ACCEL_SECTION_STYLE),
+                
+                # Giroscopio
+                html.Div([
+                    html.H4("Giroscopio (°/s)", style=INDICATOR_TITLE_GYRO_STYLE),
+                    html.Div([
+                        html.Div(id='indicator-gx', style=INDICATOR_ITEM_STYLE),
+                        html.Div(id='indicator-gy', style=INDICATOR_ITEM_STYLE),
+                        html.Div(id='indicator-gz', style=INDICATOR_ITEM_STYLE)
+                    ], style=INDICATOR_VALUES_CONTAINER_STYLE)
+                ], style=GYRO_SECTION_STYLE)
+            ], style=INDICATORS_CONTAINER_STYLE)
+        ], style=CARD_STYLE),
         
-        # Gráfico de aceleración absoluta
+        # Gráficos en tiempo real
         html.Div([
-            dcc.Graph(id='accel-magnitude-graph', config=GRAPH_CONFIG)
-        ], style=GRAPH_CONTAINER_STYLE),
+            html.H3("📈 Magnitud Absoluta en Tiempo Real", style=CARD_TITLE_STYLE),
+            
+            # Gráfico de aceleración absoluta
+            html.Div([
+                dcc.Graph(id='accel-magnitude-graph', config=GRAPH_CONFIG)
+            ], style=GRAPH_CONTAINER_STYLE),
+            
+            # Gráfico de giroscopio absoluto
+            html.Div([
+                dcc.Graph(id='gyro-magnitude-graph', config=GRAPH_CONFIG)
+            ])
+        ], style=CARD_STYLE),
         
-        # Gráfico de giroscopio absoluto
-        html.Div([
-            dcc.Graph(id='gyro-magnitude-graph', config=GRAPH_CONFIG)
-        ])
-    ], style=CARD_STYLE),
-    
-    # Intervalo de actualización
-    dcc.Interval(
-        id='interval-component',
-        interval=UPDATE_INTERVAL,
-        n_intervals=0
-    )
-], style=MAIN_CONTAINER_STYLE)
+        # Estado de la sesión para actualizaciones incrementales
+        dcc.Store(id='graph-state'),
+        
+        # Ancho en píxeles de los gráficos (resolución del zoom)
+        dcc.Store(id='graph-width'),
+        
+        # Envío en vivo: configuración y estado de la conexión SSE (assets/stream.js)
+        dcc.Store(id='stream-config', data={'enabled': STREAM_ENABLED, 'url': '/stream'}),
+        dcc.Store(id='stream-status'),
+        
+        # Intervalo de actualización
+        dcc.Interval(
+            id='interval-component',
+            interval=UPDATE_INTERVAL,
+            n_intervals=0
+        )
+    ], style=MAIN_CONTAINER_STYLE)
+
+app.layout = serve_layout
 
 # ====
 # CALLBACKS
 # ====
+def get_series(data):
+    """Columnas para los gráficos (máximo por intervalo para conservar picos).
+
+    Los arrays NumPy se pasan tal cual a Plotly, sin crear objetos Python
+    por muestra; los timestamps se convierten una sola vez a datetime64.
+    """
+    timestamps = data['timestamp'].astype('datetime64[ms]')
+    return (timestamps, data['accel_max'], data['accel_mean'],
+            data['gyro_max'], data['gyro_mean'])
+
+def get_indicators(latest):
+    """Indicadores numéricos y hora de la última muestra"""
+    if latest:
+        timestamp, ax, ay, az, gx, gy, gz, received_at = latest
+    else:
+        ax = ay = az = gx = gy = gz = 0
+    last_update = last_update_text(latest)
+    
+    return (create_indicator('AX', ax, COLORS['accel_color']),
+            create_indicator('AY', ay, COLORS['accel_color']),
+            create_indicator('AZ', az, COLORS['accel_color']),
+            create_indicator('GX', gx, COLORS['gyro_color']),
+            create_indicator('GY', gy, COLORS['gyro_color']),
+            create_indicator('GZ', gz, COLORS['gyro_color']),
+            last_update)
+
 @app.callback(
     [Output('accel-magnitude-graph', 'figure'),
      Output('gyro-magnitude-graph', 'figure'),
@@ -214,111 +190,355 @@ app.layout = html.Div([
      Output('indicator-gx', 'children'),
      Output('indicator-gy', 'children'),
      Output('indicator-gz', 'children'),
-     Output('last-update-time', 'children')],
-    [Input('interval-component', 'n_intervals'),
-     Input('time-range-selector', 'value')]
+     Output('last-update-time', 'children'),
+     Output('graph-state', 'data')],
+    [Input('time-range-selector', 'value'),
+     Input('device-selector', 'value')]
 )
-def update_dashboard(n, days):
-    """Actualizar todos los componentes del dashboard"""
+def update_dashboard(days, device):
+    """Recargar todos los componentes del dashboard para el rango y dispositivo elegidos"""
     
     # Obtener datos históricos
-    data = get_data_by_days(days)
+    plan = query_plan(days, device=device)
+    data = get_data_by_days(days, device=device)
     
     # Obtener últimos valores
-    latest = get_latest_values()
+    latest = get_latest_values(device)
     
     # Preparar datos para gráficos
-    if data:
-        timestamps = [datetime.fromtimestamp(row[0]/1000) for row in data]
-        ax_vals = [row[1] for row in data]
-        ay_vals = [row[2] for row in data]
-        az_vals = [row[3] for row in data]
-        gx_vals = [row[4] for row in data]
-        gy_vals = [row[5] for row in data]
-        gz_vals = [row[6] for row in data]
-        
-        # Calcular magnitudes absolutas
-        accel_magnitude = [np.sqrt(ax**2 + ay**2 + az**2) 
-                          for ax, ay, az in zip(ax_vals, ay_vals, az_vals)]
-        gyro_magnitude = [np.sqrt(gx**2 + gy**2 + gz**2) 
-                         for gx, gy, gz in zip(gx_vals, gy_vals, gz_vals)]
-    else:
-        timestamps = []
-        accel_magnitude = []
-        gyro_magnitude = []
+    timestamps, accel_magnitude, accel_mean, gyro_magnitude, gyro_mean = get_series(data)
     
     # Gráfico de aceleración absoluta
     accel_fig = go.Figure()
-    accel_fig.add_trace(go.Scatter(
+    accel_fig.add_trace(go.Scattergl(
         x=timestamps,
         y=accel_magnitude,
+        customdata=accel_mean,
         mode='lines',
         name='|Aceleración|',
         line=ACCEL_LINE_CONFIG,
         fill='tozeroy',
-        fillcolor=ACCEL_FILL_COLOR
+        fillcolor=ACCEL_FILL_COLOR,
+        hovertemplate=MAGNITUDE_HOVER_TEMPLATE
     ))
     accel_fig.update_layout(**get_graph_layout(
-        f'Magnitud Absoluta de Aceleración (últimos {days} día(s))',
+        f'Magnitud Absoluta de Aceleración - {device} (últimos {days} día(s))',
         'Magnitud (m/s²)'
     ))
     
     # Gráfico de giroscopio absoluto
     gyro_fig = go.Figure()
-    gyro_fig.add_trace(go.Scatter(
+    gyro_fig.add_trace(go.Scattergl(
         x=timestamps,
         y=gyro_magnitude,
+        customdata=gyro_mean,
         mode='lines',
         name='|Giroscopio|',
         line=GYRO_LINE_CONFIG,
         fill='tozeroy',
-        fillcolor=GYRO_FILL_COLOR
+        fillcolor=GYRO_FILL_COLOR,
+        hovertemplate=MAGNITUDE_HOVER_TEMPLATE
     ))
     gyro_fig.update_layout(**get_graph_layout(
-        f'Magnitud Absoluta de Giroscopio (últimos {days} día(s))',
+        f'Magnitud Absoluta de Giroscopio - {device} (últimos {days} día(s))',
         'Magnitud (°/s)'
     ))
     
-    # Indicadores numéricos
-    if latest:
-        timestamp, ax, ay, az, gx, gy, gz, received_at = latest
-        dt = datetime.fromtimestamp(timestamp/1000)
-        time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        indicator_ax = create_indicator('AX', ax, COLORS['accel_color'])
-        indicator_ay = create_indicator('AY', ay, COLORS['accel_color'])
-        indicator_az = create_indicator('AZ', az, COLORS['accel_color'])
-        indicator_gx = create_indicator('GX', gx, COLORS['gyro_color'])
-        indicator_gy = create_indicator('GY', gy, COLORS['gyro_color'])
-        indicator_gz = create_indicator('GZ', gz, COLORS['gyro_color'])
-        
-        last_update = f"🕐 Última actualización: {time_str}"
+    # Estado de la sesión: resolución de los intervalos nuevos, último
+    # intervalo mostrado y zoom
+    has_data = len(data['timestamp']) > 0
+    tail = tail_plan(plan)
+    last_ts = tail_last_ts(plan, tail, int(data['timestamp'][-1]) if has_data else None)
+    state = dict(tail, days=days, zoom=None, last_ts=last_ts)
+    
+    return (accel_fig, gyro_fig) + get_indicators(latest) + (state,)
+
+@app.callback(
+    [Output('accel-magnitude-graph', 'extendData'),
+     Output('gyro-magnitude-graph', 'extendData'),
+     Output('indicator-ax', 'children', allow_duplicate=True),
+     Output('indicator-ay', 'children', allow_duplicate=True),
+     Output('indicator-az', 'children', allow_duplicate=True),
+     Output('indicator-gx', 'children', allow_duplicate=True),
+     Output('indicator-gy', 'children', allow_duplicate=True),
+     Output('indicator-gz', 'children', allow_duplicate=True),
+     Output('last-update-time', 'children', allow_duplicate=True),
+     Output('graph-state', 'data', allow_duplicate=True)],
+    [Input('interval-component', 'n_intervals')],
+    [State('graph-state', 'data')],
+    prevent_initial_call=True
+)
+def extend_dashboard(n, state):
+    """Agregar a los gráficos solo los intervalos nuevos desde el último mostrado"""
+    if not state:
+        raise PreventUpdate
+    
+    latest = get_latest_values(state['device'])
+    
+    # Con zoom los gráficos muestran una ventana fija: solo se actualizan los
+    # indicadores hasta volver a la vista completa
+    if state.get('zoom'):
+        return (no_update, no_update) + get_indicators(latest) + (no_update,)
+    
+    since = state['last_ts'] + state['width'] if state['last_ts'] is not None else None
+    data = get_data_since(state, since)
+    
+    if len(data['timestamp']):
+        timestamps, accel_magnitude, accel_mean, gyro_magnitude, gyro_mean = get_series(data)
+        accel_extend = (
+            {'x': [timestamps], 'y': [accel_magnitude], 'customdata': [accel_mean]},
+            [0], MAX_POINTS
+        )
+        gyro_extend = (
+            {'x': [timestamps], 'y': [gyro_magnitude], 'customdata': [gyro_mean]},
+            [0], MAX_POINTS
+        )
+        state = dict(state, last_ts=int(data['timestamp'][-1]))
     else:
-        indicator_ax = create_indicator('AX', 0, COLORS['accel_color'])
-        indicator_ay = create_indicator('AY', 0, COLORS['accel_color'])
-        indicator_az = create_indicator('AZ', 0, COLORS['accel_color'])
-        indicator_gx = create_indicator('GX', 0, COLORS['gyro_color'])
-        indicator_gy = create_indicator('GY', 0, COLORS['gyro_color'])
-        indicator_gz = create_indicator('GZ', 0, COLORS['gyro_color'])
-        last_update = "🕐 Sin datos disponibles"
+        accel_extend = gyro_extend = no_update
+        state = no_update
     
-    return (accel_fig, gyro_fig, 
-            indicator_ax, indicator_ay, indicator_az,
-            indicator_gx, indicator_gy, indicator_gz,
-            last_update)
+    return (accel_extend, gyro_extend) + get_indicators(latest) + (state,)
+
+def to_ms(value):
+    """Fecha del eje x de Plotly ('YYYY-MM-DD HH:MM:SS.fff', UTC) a ms"""
+    return int(np.datetime64(str(value).replace(' ', 'T')).astype('datetime64[ms]').astype(np.int64))
+
+def zoom_window(relayout):
+    """Ventana (start, end) en ms del eje x tras un zoom, 'reset' al
+    autoescalar o None si el evento no cambia el eje x"""
+    if not relayout:
+        return None
+    if relayout.get('xaxis.autorange'):
+        return 'reset'
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        bounds = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        bounds = relayout['xaxis.range']
+    else:
+        return None
+    start, end = sorted(to_ms(b) for b in bounds)
+    return (start, end) if end > start else None
+
+def zoom_figure(series, xrange):
+    """Reemplazar los datos de la traza y fijar (o liberar) el rango del eje x"""
+    timestamps, magnitude, mean = series
+    patch = Patch()
+    patch['data'][0]['x'] = timestamps
+    patch['data'][0]['y'] = magnitude
+    patch['data'][0]['customdata'] = mean
+    if xrange is None:
+        patch['layout']['xaxis']['autorange'] = True
+    else:
+        patch['layout']['xaxis']['range'] = xrange
+        patch['layout']['xaxis']['autorange'] = False
+    return patch
+
+@app.callback(
+    [Output('accel-magnitude-graph', 'figure', allow_duplicate=True),
+     Output('gyro-magnitude-graph', 'figure', allow_duplicate=True),
+     Output('graph-state', 'data', allow_duplicate=True)],
+    [Input('accel-magnitude-graph', 'relayoutData'),
+     Input('gyro-magnitude-graph', 'relayoutData')],
+    [State('graph-state', 'data'),
+     State('graph-width', 'data')],
+    prevent_initial_call=True
+)
+def zoom_graphs(accel_relayout, gyro_relayout, state, width):
+    """Volver a consultar la ventana visible con un punto por píxel.
+
+    El zoom de un gráfico se aplica a los dos. Al acercarse la consulta
+    pasa a rollups más finos y, en ventanas cortas, a las muestras crudas;
+    al autoescalar se recarga la vista completa y se reanuda la
+    actualización incremental.
+    """
+    if not state:
+        raise PreventUpdate
+    
+    relayout = accel_relayout if ctx.triggered_id == 'accel-magnitude-graph' else gyro_relayout
+    window = zoom_window(relayout)
+    if window is None:
+        raise PreventUpdate
+    
+    if window == 'reset':
+        if not state.get('zoom'):
+            raise PreventUpdate
+        plan = query_plan(state['days'], device=state['device'])
+        data = get_data_by_days(state['days'], device=state['device'])
+        has_data = len(data['timestamp']) > 0
+        last_ts = tail_last_ts(plan, tail_plan(plan), int(data['timestamp'][-1])) \
+            if has_data else state['last_ts']
+        state = dict(state, zoom=None, last_ts=last_ts)
+        xrange = None
+    else:
+        points = min(int(width), ZOOM_MAX_POINTS) if width else MAX_POINTS
+        data = get_data_window(window[0], window[1], points, state['device'])
+        state = dict(state, zoom=list(window))
+        xrange = [np.datetime64(window[0], 'ms'), np.datetime64(window[1], 'ms')]
+    
+    timestamps, accel_magnitude, accel_mean, gyro_magnitude, gyro_mean = get_series(data)
+    return (zoom_figure((timestamps, accel_magnitude, accel_mean), xrange),
+            zoom_figure((timestamps, gyro_magnitude, gyro_mean), xrange),
+            state)
+
+# Ancho real del gráfico, medido en el navegador al dibujarlo
+app.clientside_callback(
+    """
+    function(figure) {
+        var graph = document.getElementById('accel-magnitude-graph');
+        return graph ? graph.offsetWidth : window.innerWidth;
+    }
+    """,
+    Output('graph-width', 'data'),
+    Input('accel-magnitude-graph', 'figure')
+)
 
 def create_indicator(label, value, color):
-    """Crear un indicador numérico estilizado"""
+    """Crear un indicador numérico estilizado (el valor lo actualiza también el envío en vivo)"""
     return html.Div([
         html.Div(label, style=INDICATOR_LABEL_STYLE),
-        html.Div(f"{value:.2f}", style=get_indicator_value_style(color))
+        html.Div(f"{value:.2f}", id=f'indicator-{label.lower()}-value',
+                 style=get_indicator_value_style(color))
     ], style=INDICATOR_BOX_STYLE)
 
+# Suscripción SSE del navegador: se renueva al cambiar rango, dispositivo o
+# resolución; los eventos se aplican con set_props sin pasar por callbacks
+app.clientside_callback(
+    ClientsideFunction(namespace='stream', function_name='subscribe'),
+    Output('stream-status', 'data'),
+    Input('graph-state', 'data'),
+    State('stream-config', 'data')
+)
+
 # ====
-# EJECUTAR SERVIDOR
+# DEPURACIÓN DE CONSULTAS
 # ====
 server = app.server
 
+def render_query_report(report):
+    """Página HTML con las estadísticas por consulta y los planes capturados"""
+    rows = ''.join(
+        f"<tr><td>{q['calls']}</td><td>{q['total_ms']}</td><td>{q['avg_ms']}</td>"
+        f"<td>{q['max_ms']}</td><td>{q['rows']}</td><td>{q['bytes']}</td><td>{q['slow']}</td>"
+        f"<td><code>{escape(q['query'])}</code></td></tr>"
+        for q in report['queries']
+    )
+    captures = ''.join(
+        f"<h3>{c['captured_at']} - {c['ms']} ms, {c['rows']} filas</h3>"
+        f"<code>{escape(c['query'])}</code><pre>{escape(c['plan'])}</pre>"
+        for c in report['slow_queries']
+    )
+    return (
+        "<html><head><title>Consultas del dashboard</title></head><body>"
+        f"<h1>Consultas del dashboard (proceso {os.getpid()})</h1>"
+        "<table border='1'><tr><th>llamadas</th><th>total ms</th><th>media ms</th>"
+        "<th>máx ms</th><th>filas</th><th>bytes</th><th>lentas</th><th>consulta</th></tr>"
+        f"{rows}</table>"
+        f"<h2>Consultas lentas (más de {report['slow_ms']:g} ms)</h2>"
+        f"{captures or '<p>Ninguna</p>'}"
+        "</body></html>"
+    )
+
+if QUERY_DEBUG_PAGE:
+    @server.route('/debug/queries')
+    def debug_queries():
+        """Perfilado de consultas de este proceso (?format=json para el informe crudo)"""
+        report = PROFILER.report()
+        if request.args.get('format') == 'json':
+            return jsonify(report)
+        return render_query_report(report)
+
+# ====
+# ENVÍO EN VIVO
+# ====
+if STREAM_ENABLED:
+    @server.route('/stream')
+    def stream():
+        """Server-sent events con los intervalos nuevos del dispositivo y rango pedidos"""
+        try:
+            days = int(request.args.get('days', 1))
+            device = request.args.get('device', DEFAULT_DEVICE_ID)
+            last_ts = request.args.get('last_ts')
+            last_ts = int(last_ts) if last_ts not in (None, '', 'null') else None
+        except ValueError:
+            return Response("Parámetros inválidos", status=400)
+        
+        subscription = FEED.subscribe(days, device, last_ts)
+        if subscription is None:
+            # Sin hilos libres para otra conexión abierta: el dashboard sigue con el sondeo
+            return Response("Demasiadas conexiones en vivo", status=503,
+                            headers={'Retry-After': '60'})
+        return Response(
+            FEED.stream(subscription),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+# ====
+# EXPORTACIÓN
+# ====
+# Mismos identificadores que acepta el receptor (backend/mqtt_handler.py): nada
+# que pueda romper la cabecera Content-Disposition
+DEVICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+def export_authorized():
+    """La petición trae EXPORT_TOKEN (cabecera Bearer o ?token=), si está configurado"""
+    if not EXPORT_TOKEN:
+        return True
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else request.args.get('token', '')
+    return hmac.compare_digest(token.encode('utf-8'), EXPORT_TOKEN.encode('utf-8'))
+
+if EXPORT_ENABLED:
+    if not EXPORT_TOKEN:
+        logger.warning("/export activo sin EXPORT_TOKEN: cualquiera puede exportar datos")
+    
+    # Cada exportación mantiene una conexión y una consulta larga abiertas
+    EXPORT_SLOTS = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+    
+    @server.route('/export')
+    def export():
+        """Muestras crudas de [start, end) en CSV o Parquet, enviadas por bloques"""
+        if not export_authorized():
+            return Response("No autorizado", status=401,
+                            headers={'WWW-Authenticate': 'Bearer'})
+        
+        export_format = request.args.get('format', 'csv')
+        device = request.args.get('device') or None
+        try:
+            start = parse_time(request.args['start'])
+            end = parse_time(request.args['end'])
+        except (KeyError, ValueError):
+            return Response("Parámetros inválidos: start y end (ms o fecha ISO)", status=400)
+        
+        if export_format not in EXPORTERS:
+            return Response(f"Formato no soportado: {export_format}", status=400)
+        if device is not None and not DEVICE_ID_PATTERN.match(device):
+            return Response("Dispositivo inválido", status=400)
+        if end <= start:
+            return Response("El fin debe ser posterior al inicio", status=400)
+        if EXPORT_MAX_DAYS and end - start > EXPORT_MAX_DAYS * 24 * 60 * 60 * 1000:
+            return Response(f"Rango máximo: {EXPORT_MAX_DAYS:g} días", status=400)
+        
+        if not EXPORT_SLOTS.acquire(blocking=False):
+            return Response("Demasiadas exportaciones en curso", status=429,
+                            headers={'Retry-After': '60'})
+        
+        # ':' no es válido en nombres de archivo de Windows
+        filename = f"sensor_data_{(device or 'todos').replace(':', '_')}_{start}_{end}.{export_format}"
+        response = Response(
+            EXPORTERS[export_format](start, end, device),
+            mimetype=CONTENT_TYPES[export_format],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        # Al terminar o cortarse el envío (también si no llegó a empezar)
+        response.call_on_close(EXPORT_SLOTS.release)
+        return response
+
+# ====
+# EJECUTAR SERVIDOR
+# ====
+
 if __name__ == '__main__':
     logger.info("🚀 Iniciando dashboard...")
     logger.info("📊 Dashboard disponible en: http://127.0.0.1:8050")
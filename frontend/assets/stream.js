@@ -0,0 +1,114 @@
+/*
+ * Envío en vivo del dashboard: suscripción SSE a /stream y aplicación de los
+ * eventos con set_props (intervalos nuevos con extendData e indicadores).
+ * Mientras la conexión SSE está abierta se desactiva el sondeo de
+ * dcc.Interval; si se cae, el sondeo se reanuda hasta que EventSource
+ * reconecte. Si el servidor rechaza la conexión (503: sin hilos libres para
+ * más dashboards en vivo) se sigue con el sondeo y se reintenta pasado
+ * RETRY_MS.
+ */
+(function () {
+    var INDICATORS = ['ax', 'ay', 'az', 'gx', 'gy', 'gz'];
+    var RETRY_MS = 60000;
+    var live = {source: null, key: null, state: null, retryAt: 0};
+
+    function setProps(id, props) {
+        window.dash_clientside.set_props(id, props);
+    }
+
+    function applySeries(series) {
+        // Solo los intervalos posteriores al último mostrado
+        var lastTs = live.state.last_ts;
+        var keep = [];
+        series.ts.forEach(function (ts, i) {
+            if (lastTs === null || lastTs === undefined || ts > lastTs) {
+                keep.push(i);
+            }
+        });
+        if (!keep.length) {
+            return;
+        }
+
+        var pick = function (values) {
+            return keep.map(function (i) { return values[i]; });
+        };
+        var x = pick(series.x);
+        setProps('accel-magnitude-graph', {extendData: [
+            {x: [x], y: [pick(series.accel_max)], customdata: [pick(series.accel_mean)]},
+            [0], series.max_points
+        ]});
+        setProps('gyro-magnitude-graph', {extendData: [
+            {x: [x], y: [pick(series.gyro_max)], customdata: [pick(series.gyro_mean)]},
+            [0], series.max_points
+        ]});
+
+        // Mantener graph-state al día por si se vuelve al sondeo
+        live.state = Object.assign({}, live.state, {last_ts: series.ts[keep[keep.length - 1]]});
+        setProps('graph-state', {data: live.state});
+    }
+
+    function applyLatest(latest) {
+        INDICATORS.forEach(function (name, i) {
+            setProps('indicator-' + name + '-value', {children: latest.values[i]});
+        });
+        setProps('last-update-time', {children: latest.text});
+    }
+
+    function onMessage(message) {
+        var event = JSON.parse(message.data);
+        // Con zoom los gráficos muestran una ventana fija
+        if (event.series && !live.state.zoom) {
+            applySeries(event.series);
+        }
+        if (event.latest) {
+            applyLatest(event.latest);
+        }
+    }
+
+    function subscribe(state, config) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!state || !config || !config.enabled || !window.EventSource) {
+            return noUpdate;
+        }
+
+        live.state = state;
+        var key = [state.device, state.days, state.width, state.view].join('|');
+        if (live.source && live.key === key) {
+            return noUpdate;
+        }
+        if (!live.source && live.key === key && Date.now() < live.retryAt) {
+            return noUpdate;
+        }
+        if (live.source) {
+            live.source.close();
+        }
+
+        var url = config.url + '?device=' + encodeURIComponent(state.device)
+            + '&days=' + state.days;
+        if (state.last_ts !== null && state.last_ts !== undefined) {
+            url += '&last_ts=' + state.last_ts;
+        }
+
+        var source = new EventSource(url);
+        source.onopen = function () {
+            setProps('interval-component', {disabled: true});
+        };
+        source.onerror = function () {
+            setProps('interval-component', {disabled: false});
+            // Respuesta de error (p. ej. 503): EventSource no reconecta solo
+            if (source.readyState === EventSource.CLOSED && live.source === source) {
+                live.source = null;
+                live.retryAt = Date.now() + RETRY_MS;
+            }
+        };
+        source.onmessage = onMessage;
+
+        live.source = source;
+        live.key = key;
+        return key;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        stream: {subscribe: subscribe}
+    });
+})();
@@ -0,0 +1,541 @@
+"""
+Caché en memoria de las muestras recientes, compartida por todas las sesiones
+"""
+import logging
+import threading
+import time
+import numpy as np
+from frontend.config import (
+    CACHE_MAX_AGE, CACHE_MAX_MB, CACHE_REFRESH_INTERVAL, CACHE_PAGE_ROWS,
+    CACHE_MAX_DEVICES, CACHE_RESYNC_INTERVAL, CACHE_SAMPLE_RATE_HZ
+)
+
+logger = logging.getLogger(__name__)
+
+# Columnas de las series de magnitudes (caché y consultas de frontend.database)
+SERIES_COLUMNS = (
+    'timestamp', 'accel_min', 'accel_max', 'accel_mean',
+    'gyro_min', 'gyro_max', 'gyro_mean'
+)
+
+# Bytes por fila: timestamp (int64) + magnitudes de aceleración y giroscopio (float32)
+ROW_BYTES = 8 + 4 + 4
+
+NEW_ROWS_QUERY = """
+    SELECT
+        timestamp,
+        ax, ay, az,
+        gx, gy, gz,
+        received_at
+    FROM sensor_data
+    WHERE device_id = %s
+      AND timestamp > %s
+    ORDER BY timestamp ASC
+    LIMIT %s
+"""
+
+NEWEST_QUERY = "SELECT MAX(timestamp) FROM sensor_data WHERE device_id = %s"
+
+# Timestamp de la fila número capacity contando desde la más nueva: la carga
+# inicial no pide filas anteriores, que el buffer descartaría
+CAPACITY_START_QUERY = """
+    SELECT timestamp
+    FROM sensor_data
+    WHERE device_id = %s
+      AND timestamp >= %s
+    ORDER BY timestamp DESC
+    OFFSET %s
+    LIMIT 1
+"""
+
+# Recarga de un rango ya cubierto (start, end], por páginas
+RANGE_ROWS_QUERY = """
+    SELECT timestamp, ax, ay, az, gx, gy, gz
+    FROM sensor_data
+    WHERE device_id = %s
+      AND timestamp > %s
+      AND timestamp <= %s
+    ORDER BY timestamp ASC
+    LIMIT %s
+"""
+
+# Filas por hora de [start, end] para detectar filas tardías
+RESYNC_WIDTH = 60 * 60 * 1000
+RESYNC_QUERY = """
+    SELECT time_bucket(%s::BIGINT, timestamp) AS hour, COUNT(*)
+    FROM sensor_data
+    WHERE device_id = %s
+      AND timestamp >= %s
+      AND timestamp <= %s
+    GROUP BY hour
+"""
+
+def magnitudes(rows):
+    """(ts, |aceleración|, |giroscopio|) de filas (timestamp, ax, ay, az, gx, gy, gz, ...)"""
+    data = np.asarray([row[:7] for row in rows], dtype=np.float64).reshape(-1, 7)
+    ts = data[:, 0].astype(np.int64)
+    accel = np.sqrt(np.sum(data[:, 1:4] ** 2, axis=1))
+    gyro = np.sqrt(np.sum(data[:, 4:7] ** 2, axis=1))
+    return ts, accel, gyro
+
+def _merge_ranges(a, b):
+    """Unión (envolvente) de dos rangos (start, end) o None"""
+    if a is None or b is None:
+        return a or b
+    return min(a[0], b[0]), max(a[1], b[1])
+
+class RingBuffer:
+    """Buffer circular columnar con las magnitudes recientes de un dispositivo.
+
+    Las filas se descartan por antigüedad (max_age) y por capacidad.
+    """
+
+    def __init__(self, capacity, max_age):
+        self.capacity = capacity
+        self.max_age = max_age
+
+        self._ts = np.empty(self.capacity, dtype=np.int64)
+        self._accel = np.empty(self.capacity, dtype=np.float32)
+        self._gyro = np.empty(self.capacity, dtype=np.float32)
+        self._head = 0
+        self._size = 0
+
+        # Desde este timestamp el buffer contiene todas las muestras
+        self.coverage_start = None
+        self.latest = None
+        self._lock = threading.RLock()
+
+    def watermark(self):
+        """Timestamp desde el que hay que pedir filas nuevas (exclusivo)"""
+        return self.latest[0] if self.latest else self.coverage_start - 1
+
+    def append(self, rows):
+        """Agregar filas ordenadas, posteriores a la última, y aplicar la expulsión"""
+        ts, accel, gyro = magnitudes(rows)
+
+        with self._lock:
+            # Si el lote supera la capacidad solo se conservan las más nuevas
+            if len(ts) > self.capacity:
+                ts, accel, gyro = ts[-self.capacity:], accel[-self.capacity:], gyro[-self.capacity:]
+
+            overflow = self._size + len(ts) - self.capacity
+            if overflow > 0:
+                self._drop(overflow)
+
+            tail = (self._head + self._size) % self.capacity
+            first = min(len(ts), self.capacity - tail)
+            self._ts[tail:tail + first] = ts[:first]
+            self._accel[tail:tail + first] = accel[:first]
+            self._gyro[tail:tail + first] = gyro[:first]
+            rest = len(ts) - first
+            if rest:
+                self._ts[:rest] = ts[first:]
+                self._accel[:rest] = accel[first:]
+                self._gyro[:rest] = gyro[first:]
+            self._size += len(ts)
+            self.latest = rows[-1]
+
+            # Expulsión por antigüedad
+            cutoff = int(ts[-1]) - self.max_age
+            old = sum(int(np.searchsorted(seg, cutoff)) for seg in self._segments(self._ts))
+            if old:
+                self._drop(old)
+            self.coverage_start = max(self.coverage_start, cutoff)
+
+    def replace(self, start, end, ts, accel, gyro):
+        """Sustituir las filas con start < ts <= end por (ts, accel, gyro) ordenados.
+
+        Para rangos ya cubiertos que cambiaron en la base de datos (filas
+        tardías). El buffer se reescribe completo, así que solo conviene para
+        recargas ocasionales; si no cabe todo se descartan las más antiguas.
+        """
+        with self._lock:
+            old_ts, old_accel, old_gyro = (np.concatenate(self._segments(array))
+                                           for array in (self._ts, self._accel, self._gyro))
+            keep = (old_ts <= start) | (old_ts > end)
+            merged_ts = np.concatenate([old_ts[keep], ts])
+            order = np.argsort(merged_ts, kind='stable')
+            trimmed = len(order) > self.capacity
+            order = order[-self.capacity:]
+            size = len(order)
+
+            self._ts[:size] = merged_ts[order]
+            self._accel[:size] = np.concatenate([old_accel[keep], accel])[order]
+            self._gyro[:size] = np.concatenate([old_gyro[keep], gyro])[order]
+            self._head = 0
+            self._size = size
+            if trimmed:
+                self.coverage_start = max(self.coverage_start, int(self._ts[0]))
+
+    def counts(self, start, end, width):
+        """Filas por intervalo de width ms en [start, end]: {inicio: filas}"""
+        window = self.window(start, end + 1)
+        if window is None:
+            return None
+        buckets, counts = np.unique(window[0] - window[0] % width, return_counts=True)
+        return dict(zip(buckets.tolist(), counts.tolist()))
+
+    def _drop(self, count):
+        """Descartar las count filas más antiguas"""
+        count = min(count, self._size)
+        if count == 0:
+            return
+        self._head = (self._head + count) % self.capacity
+        self._size -= count
+        if self._size:
+            oldest = int(self._ts[self._head])
+            self.coverage_start = max(self.coverage_start, oldest)
+
+    def _segments(self, array):
+        """Vistas del buffer en orden cronológico (como máximo dos tramos)"""
+        end = self._head + self._size
+        if end <= self.capacity:
+            return [array[self._head:end]]
+        return [array[self._head:], array[:end - self.capacity]]
+
+    def window(self, start, end):
+        """Copias de (ts, accel, gyro) con start <= ts < end, o None si no hay cobertura"""
+        with self._lock:
+            if self.coverage_start is None or start < self.coverage_start:
+                return None
+
+            parts = ([], [], [])
+            for seg_ts, seg_accel, seg_gyro in zip(self._segments(self._ts),
+                                                   self._segments(self._accel),
+                                                   self._segments(self._gyro)):
+                lo = np.searchsorted(seg_ts, start)
+                hi = np.searchsorted(seg_ts, end)
+                parts[0].append(seg_ts[lo:hi])
+                parts[1].append(seg_accel[lo:hi])
+                parts[2].append(seg_gyro[lo:hi])
+
+            return tuple(np.concatenate(p) for p in parts)
+
+    def buckets(self, plan, since=None):
+        """Intervalos completos según el plan, o None si no cubre la ventana.
+
+        Los planes de una ventana fija (window_plan) devuelven todos sus
+        intervalos, incluido el último aunque esté incompleto.
+        """
+        if not self.latest:
+            return None
+
+        width = plan['width']
+        newest = self.latest[0]
+        if plan.get('end') is not None:
+            start, end = plan['start'], plan['end']
+        else:
+            start = newest - plan['range'] if since is None else since
+            end = newest - newest % width
+
+        window = self.window(start, end)
+        if window is None:
+            return None
+
+        ts, accel, gyro = window
+        if len(ts) == 0:
+            return {name: np.empty(0, dtype=np.int64 if name == 'timestamp' else np.float64)
+                    for name in SERIES_COLUMNS}
+
+        bucket = ts - ts % width
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        counts = np.diff(np.r_[starts, len(ts)])
+
+        columns = (
+            bucket[starts],
+            np.minimum.reduceat(accel, starts).astype(np.float64),
+            np.maximum.reduceat(accel, starts).astype(np.float64),
+            np.add.reduceat(accel, starts, dtype=np.float64) / counts,
+            np.minimum.reduceat(gyro, starts).astype(np.float64),
+            np.maximum.reduceat(gyro, starts).astype(np.float64),
+            np.add.reduceat(gyro, starts, dtype=np.float64) / counts,
+        )
+        return dict(zip(SERIES_COLUMNS, columns))
+
+class RecentSampleCache:
+    """Muestras recientes de los dispositivos consultados por el dashboard.
+
+    Un único hilo por proceso consulta las filas nuevas de cada dispositivo
+    cada intervalo y las sesiones leen de memoria, por lo que la carga sobre
+    la base de datos no depende del número de dashboards abiertos. Un
+    dispositivo entra en la caché la primera vez que se consulta (esa
+    consulta va a la base de datos); se mantienen como máximo max_devices,
+    descartando el consultado hace más tiempo, y cada uno dispone de una
+    parte igual de max_mb. La antigüedad cubierta se limita a lo que cabe
+    en esa parte al ritmo sample_rate.
+
+    Con un listener (frontend.notify.ChangeListener) el refresco se
+    adelanta al llegar un aviso y solo consulta los dispositivos con datos
+    nuevos: sin avisos, la caché sigue al día sin ir a la base de datos.
+
+    Las filas nuevas se piden a partir de la última en caché, así que las
+    que llegan con timestamps anteriores (reenvío del spool del receptor,
+    lotes desordenados) se recargan aparte: el rango de cada aviso que
+    empieza antes de la última fila en caché, y sin escucha activa (o tras
+    una reconexión), las horas cuyas filas difieren de la base de datos,
+    comparadas cada resync_interval.
+    """
+
+    def __init__(self, connection_factory, max_age=CACHE_MAX_AGE, max_mb=CACHE_MAX_MB,
+                 refresh_interval=CACHE_REFRESH_INTERVAL, page_rows=CACHE_PAGE_ROWS,
+                 max_devices=CACHE_MAX_DEVICES, listener=None,
+                 resync_interval=CACHE_RESYNC_INTERVAL, sample_rate=CACHE_SAMPLE_RATE_HZ):
+        self.connection_factory = connection_factory
+        self.listener = listener
+        self.refresh_interval = refresh_interval
+        self.page_rows = page_rows
+        self.resync_interval = resync_interval
+        self.max_devices = max(1, max_devices)
+        self.capacity = max(1, int(max_mb * 1024 * 1024 // ROW_BYTES // self.max_devices))
+        # Más antigüedad de la que cabe solo haría fallar las consultas largas
+        self.max_age = max_age
+        if sample_rate > 0:
+            self.max_age = min(max_age, int(self.capacity / sample_rate * 1000))
+
+        self._buffers = {}
+        self._last_access = {}
+        self._last_refresh = {}
+        # Inicio de la última consulta de cada dispositivo (para el listener)
+        self._synced = {}
+        # Última comparación por horas y rangos pendientes de recargar
+        self._resynced = {}
+        self._stale = {}
+        self._lock = threading.Lock()
+        # El envío en vivo también refresca: un solo refresco a la vez
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Iniciar el hilo de refresco"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        if self.listener:
+            self.listener.add_callback(self.on_changes)
+        self._thread = threading.Thread(target=self._run, name='sample-cache', daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Caché de muestras iniciada ({self.max_devices} dispositivos, "
+            f"{self.capacity} filas c/u, {self.max_age / 3600000:.1f} h por dispositivo)"
+        )
+
+    def stop(self):
+        """Detener el hilo de refresco"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self):
+        """Adelantar el próximo refresco (p. ej. al recibir un aviso)"""
+        self._wakeup.set()
+
+    def invalidate(self, device_id, start, end):
+        """Marcar (start, end] ms del dispositivo para recargarlo en el próximo refresco"""
+        with self._lock:
+            if device_id not in self._buffers:
+                return
+            self._stale[device_id] = _merge_ranges(self._stale.get(device_id), (start, end))
+        self.wake()
+
+    def on_changes(self, changes):
+        """Callback del listener: recargar los rangos ya cubiertos que recibieron filas.
+
+        Las filas posteriores a la última en caché llegan en el refresco
+        normal; con changes None (reconexión) toca la comparación por horas.
+        """
+        for device_id, (oldest, newest) in (changes or {}).items():
+            buffer = self._buffers.get(device_id)
+            if buffer is not None and oldest <= buffer.watermark():
+                self.invalidate(device_id, oldest - 1, newest)
+        self.wake()
+
+    def is_fresh(self, device_id):
+        """La caché del dispositivo se refrescó hace menos de dos intervalos"""
+        last_refresh = self._last_refresh.get(device_id)
+        return (last_refresh is not None
+                and time.monotonic() - last_refresh < 2 * self.refresh_interval)
+
+    def _buffer(self, device_id):
+        """Buffer del dispositivo si está al día; si no, lo registra y devuelve None"""
+        with self._lock:
+            self._last_access[device_id] = time.monotonic()
+            if device_id not in self._buffers:
+                self._buffers[device_id] = None
+                self._evict()
+        if not self.is_fresh(device_id):
+            return None
+        return self._buffers.get(device_id)
+
+    def _evict(self):
+        """Descartar los dispositivos consultados hace más tiempo"""
+        while len(self._buffers) > self.max_devices:
+            device_id = min(self._buffers, key=lambda d: self._last_access.get(d, 0))
+            del self._buffers[device_id]
+            self._last_access.pop(device_id, None)
+            self._last_refresh.pop(device_id, None)
+            self._synced.pop(device_id, None)
+            self._resynced.pop(device_id, None)
+            self._stale.pop(device_id, None)
+            logger.info(f"Dispositivo {device_id} descartado de la caché")
+
+    # ====
+    # REFRESCO
+    # ====
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refrescando caché de muestras: {e}")
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+
+    def refresh(self):
+        """Traer las filas nuevas de cada dispositivo registrado"""
+        with self._lock:
+            devices = list(self._buffers)
+        if not devices:
+            return
+
+        with self._refresh_lock, self.connection_factory() as conn:
+            cursor = conn.cursor()
+            for device_id in devices:
+                self._refresh_device(cursor, device_id)
+            cursor.close()
+
+    def _refresh_device(self, cursor, device_id):
+        """Traer las filas posteriores a la última en caché, por páginas, y
+        recargar los rangos ya cubiertos que cambiaron"""
+        buffer = self._buffers.get(device_id)
+        with self._lock:
+            stale = self._stale.pop(device_id, None)
+        resync = buffer is not None and self._resync_due(device_id)
+
+        # Sin avisos posteriores a la última consulta no hay nada que traer
+        if (buffer is not None and stale is None and not resync and self.listener
+                and self.listener.unchanged(device_id, buffer.watermark(),
+                                            self._synced.get(device_id))):
+            with self._lock:
+                if device_id in self._buffers:
+                    self._last_refresh[device_id] = time.monotonic()
+            return
+
+        started = time.monotonic()
+        if buffer is None:
+            cursor.execute(NEWEST_QUERY, (device_id,))
+            newest = cursor.fetchone()[0]
+            if newest is None:
+                with self._lock:
+                    if device_id in self._buffers:
+                        self._last_refresh[device_id] = time.monotonic()
+                return
+            buffer = RingBuffer(self.capacity, self.max_age)
+            buffer.coverage_start = newest - self.max_age
+            # Solo las filas que caben: desde la capacity-ésima más nueva
+            cursor.execute(CAPACITY_START_QUERY,
+                           (device_id, buffer.coverage_start, self.capacity - 1))
+            first = cursor.fetchone()
+            if first is not None:
+                buffer.coverage_start = max(buffer.coverage_start, first[0])
+            resync = True
+
+        last_ts = buffer.watermark()
+        while True:
+            cursor.execute(NEW_ROWS_QUERY, (device_id, last_ts, self.page_rows))
+            rows = cursor.fetchall()
+            if rows:
+                buffer.append(rows)
+                last_ts = rows[-1][0]
+            if len(rows) < self.page_rows:
+                break
+
+        try:
+            if resync and device_id in self._resynced:
+                stale = _merge_ranges(stale, self._resync(cursor, device_id, buffer))
+            if stale:
+                self._reload(cursor, device_id, buffer, *stale)
+        except Exception:
+            if stale:
+                self.invalidate(device_id, *stale)
+            raise
+
+        with self._lock:
+            # El dispositivo pudo descartarse mientras se consultaba
+            if device_id in self._buffers:
+                self._buffers[device_id] = buffer
+                self._last_refresh[device_id] = time.monotonic()
+                self._synced[device_id] = started
+                if resync:
+                    self._resynced[device_id] = started
+
+    def _resync_due(self, device_id):
+        """Toca comparar por horas: no hay avisos desde la última comparación y pasó el intervalo"""
+        resynced = self._resynced.get(device_id)
+        if resynced is None:
+            return True
+        # Con la escucha activa desde entonces, los avisos traen las filas tardías
+        listening_since = self.listener.listening_since if self.listener else None
+        if listening_since is not None and listening_since <= resynced:
+            return False
+        return time.monotonic() - resynced >= self.resync_interval
+
+    def _resync(self, cursor, device_id, buffer):
+        """Rango (start, end] de las horas cuyas filas difieren de la base de datos, o None"""
+        start, end = buffer.coverage_start, buffer.watermark()
+        cached = buffer.counts(start, end, RESYNC_WIDTH)
+        if cached is None or end < start:
+            return None
+
+        cursor.execute(RESYNC_QUERY, (RESYNC_WIDTH, device_id, start, end))
+        stored = dict(cursor.fetchall())
+        hours = sorted(hour for hour in cached.keys() | stored.keys()
+                       if cached.get(hour) != stored.get(hour))
+        if not hours:
+            return None
+        logger.info(f"Caché de {device_id}: {len(hours)} hora(s) con filas tardías")
+        return hours[0] - 1, hours[-1] + RESYNC_WIDTH - 1
+
+    def _reload(self, cursor, device_id, buffer, start, end):
+        """Volver a leer las filas de (start, end] ya cubiertas por el buffer"""
+        start = max(start, buffer.coverage_start - 1)
+        end = min(end, buffer.watermark())
+        if end <= start:
+            return
+
+        pages = []
+        last_ts = start
+        while True:
+            cursor.execute(RANGE_ROWS_QUERY, (device_id, last_ts, end, self.page_rows))
+            rows = cursor.fetchall()
+            if rows:
+                pages.append(magnitudes(rows))
+                last_ts = rows[-1][0]
+            if len(rows) < self.page_rows:
+                break
+
+        ts, accel, gyro = (np.concatenate(columns) for columns in zip(*pages)) \
+            if pages else (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        buffer.replace(start, end, ts, accel, gyro)
+        logger.info(f"Caché de {device_id}: recargadas {len(ts)} filas de ({start}, {end}]")
+
+    # ====
+    # LECTURA
+    # ====
+    def latest(self, device_id):
+        """Última muestra en caché del dispositivo, o None si no está al día"""
+        buffer = self._buffer(device_id)
+        return buffer.latest if buffer else None
+
+    def buckets(self, plan, since=None):
+        """Intervalos completos según el plan (mismas columnas que las consultas SQL).
+
+        Devuelve None si la caché del dispositivo no está al día o no cubre
+        la ventana, para que el llamador consulte la base de datos.
+        """
+        buffer = self._buffer(plan['device'])
+        return buffer.buckets(plan, since) if buffer else None
@@ -0,0 +1,113 @@
+"""
+Configuración del dashboard usando variables de entorno
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# TimescaleDB Cloud
+TIMESCALE_HOST = os.getenv('TIMESCALE_HOST')
+TIMESCALE_PORT = int(os.getenv('TIMESCALE_PORT', 5432))
+TIMESCALE_DB = os.getenv('TIMESCALE_DB', 'tsdb')
+TIMESCALE_USER = os.getenv('TIMESCALE_USER')
+TIMESCALE_PASSWORD = os.getenv('TIMESCALE_PASSWORD')
+TIMESCALE_CONNECT_TIMEOUT = int(os.getenv('TIMESCALE_CONNECT_TIMEOUT', 5))  # segundos
+
+# Dispositivo seleccionado al abrir el dashboard (y el de los datos
+# anteriores a multi-dispositivo)
+DEFAULT_DEVICE_ID = os.getenv('DEFAULT_DEVICE_ID', 'esp32')
+
+# Pool de conexiones (por proceso)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10.0))  # espera máxima por una conexión
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', 30.0))  # segundos inactiva antes de verificar
+
+# Reducción de datos en el servidor
+# 'bucket': agregados time_bucket (mín/máx/media de magnitud por intervalo)
+# 'lttb': agregados finos reducidos con Largest-Triangle-Three-Buckets
+DOWNSAMPLE_METHOD = os.getenv('DOWNSAMPLE_METHOD', 'bucket')
+MAX_POINTS = int(os.getenv('MAX_POINTS', 2000))  # puntos por gráfico y rango
+LTTB_OVERSAMPLING = int(os.getenv('LTTB_OVERSAMPLING', 4))  # cubetas finas por punto final
+ZOOM_MAX_POINTS = int(os.getenv('ZOOM_MAX_POINTS', 4000))  # puntos por gráfico al hacer zoom (uno por píxel)
+
+# Lectura de series y muestras: 'copy_binary' (COPY ... TO STDOUT binario
+# leído con NumPy, sin objetos de Python por fila) o 'fetchall' (filas de psycopg2)
+DB_READ_METHODS = ('fetchall', 'copy_binary')
+DB_READ_METHOD = os.getenv('DB_READ_METHOD', 'copy_binary')
+
+# Agregados continuos: los crea el backend (ROLLUPS en backend/config.py) y
+# el dashboard lee de timescaledb_information los que existen y su ancho.
+# Esta lista solo se usa si el catálogo no está disponible (vista -> ancho en
+# ms), y aun así únicamente con las vistas que existan
+ROLLUPS = {
+    'sensor_data_1s': 1000,
+    'sensor_data_1m': 60 * 1000,
+    'sensor_data_1h': 60 * 60 * 1000,
+}
+ROLLUP_RECHECK_INTERVAL = float(os.getenv('ROLLUP_RECHECK_INTERVAL', 300))  # segundos entre comprobaciones
+
+# Caché en memoria de muestras recientes (compartida por las sesiones del proceso).
+# Cada dispositivo guarda como máximo CACHE_MAX_MB / CACHE_MAX_DEVICES (16 bytes
+# por fila): la antigüedad cubierta es la menor entre CACHE_MAX_AGE_HOURS y lo
+# que cabe al ritmo CACHE_SAMPLE_RATE_HZ. Un día completo a 100 Hz son 8,64M
+# filas (~132 MB) por dispositivo
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
+CACHE_MAX_AGE = int(float(os.getenv('CACHE_MAX_AGE_HOURS', 24)) * 60 * 60 * 1000)  # ms
+CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', 128))
+CACHE_SAMPLE_RATE_HZ = float(os.getenv('CACHE_SAMPLE_RATE_HZ', 100))  # muestras/s por dispositivo
+CACHE_REFRESH_INTERVAL = float(os.getenv('CACHE_REFRESH_INTERVAL', 5.0))  # segundos
+CACHE_PAGE_ROWS = int(os.getenv('CACHE_PAGE_ROWS', 50000))  # filas por consulta de refresco
+CACHE_MAX_DEVICES = int(os.getenv('CACHE_MAX_DEVICES', 8))  # dispositivos en caché (se reparten CACHE_MAX_MB)
+# Filas que llegan con timestamps ya cubiertos por la caché (reenvío del spool,
+# lotes desordenados): se recarga el rango de cada aviso (LISTEN) y, sin
+# escucha activa, cada CACHE_RESYNC_INTERVAL segundos se comparan las filas
+# por hora de la caché con las de la base de datos y se recargan las que difieren
+CACHE_RESYNC_INTERVAL = float(os.getenv('CACHE_RESYNC_INTERVAL', 300))
+
+# Perfilado de consultas: duración, filas y bytes de cada consulta; las que
+# superan QUERY_SLOW_MS se capturan con su plan en el log y, con
+# QUERY_DEBUG_PAGE, en /debug/queries. El plan es un EXPLAIN simple salvo con
+# QUERY_EXPLAIN_ANALYZE, que vuelve a ejecutar la consulta lenta (el doble de
+# carga justo cuando la base de datos ya va lenta): solo para diagnosticar
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', 'True').lower() == 'true'
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', 500))
+QUERY_EXPLAIN_ANALYZE = os.getenv('QUERY_EXPLAIN_ANALYZE', 'False').lower() == 'true'
+QUERY_EXPLAIN_INTERVAL = float(os.getenv('QUERY_EXPLAIN_INTERVAL', 300))  # segundos entre EXPLAIN de una misma consulta
+QUERY_SLOW_LOG_SIZE = int(os.getenv('QUERY_SLOW_LOG_SIZE', 50))  # capturas conservadas
+QUERY_DEBUG_PAGE = os.getenv('QUERY_DEBUG_PAGE', 'False').lower() == 'true'
+
+# Envío en vivo (server-sent events en /stream): mientras haya dashboards
+# conectados cada proceso comprueba los datos nuevos al llegar un aviso
+# (LISTEN) o, sin escucha activa, cada STREAM_POLL_INTERVAL segundos; sin
+# conexión SSE los dashboards vuelven al sondeo con dcc.Interval.
+# Cada conexión SSE ocupa un hilo del servidor mientras está abierta (con
+# gunicorn gthread, uno de --threads por worker): por encima de
+# STREAM_MAX_SUBSCRIBERS por proceso /stream responde 503 y el dashboard
+# sigue con el sondeo, de modo que siempre quedan hilos para los callbacks.
+# Debe ser menor que --threads (ver render.yaml)
+STREAM_ENABLED = os.getenv('STREAM_ENABLED', 'True').lower() == 'true'
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', 0.5))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv('STREAM_MAX_SUBSCRIBERS', 16))
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 100))  # eventos pendientes antes de desconectar al cliente
+STREAM_KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 15))  # segundos entre comentarios keepalive
+
+# Avisos de datos nuevos (LISTEN): el receptor emite un NOTIFY por lote
+# guardado con el rango de timestamps insertado; mientras cada proceso
+# escucha, la caché y el envío en vivo solo consultan cuando hay datos nuevos. Debe coincidir con NOTIFY_CHANNEL en
+# backend/config.py (vacío = desactivado, vuelven a consultar cada intervalo)
+NOTIFY_CHANNEL = os.getenv('NOTIFY_CHANNEL', 'sensor_data_changes')
+NOTIFY_RETRY = float(os.getenv('NOTIFY_RETRY', 5.0))  # segundos entre reconexiones del LISTEN
+
+# Exportación de rangos a CSV/Parquet (/export y python -m frontend.export):
+# las filas se leen por dispositivo con COPY binario en bloques de
+# EXPORT_CHUNK_ROWS (y un row group de Parquet por bloque), así que la
+# memoria no depende del rango. /export está desactivado por defecto: con
+# EXPORT_TOKEN exige 'Authorization: Bearer <token>' (o ?token=) y atiende
+# como mucho EXPORT_MAX_CONCURRENT exportaciones a la vez por proceso
+EXPORT_ENABLED = os.getenv('EXPORT_ENABLED', 'False').lower() == 'true'
+EXPORT_TOKEN = os.getenv('EXPORT_TOKEN', '')
+EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', 2))
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 50000))
+EXPORT_MAX_DAYS = float(os.getenv('EXPORT_MAX_DAYS', 31))  # rango máximo por petición a /export (0 = sin límite)
@@ -0,0 +1,643 @@
+"""
+Acceso a TimescaleDB para el dashboard mediante un pool de conexiones
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from frontend.config import (
+    TIMESCALE_HOST, TIMESCALE_PORT, TIMESCALE_DB, TIMESCALE_USER,
+    TIMESCALE_PASSWORD, TIMESCALE_CONNECT_TIMEOUT, DB_POOL_MIN, DB_POOL_MAX,
+    DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE, DOWNSAMPLE_METHOD, MAX_POINTS,
+    LTTB_OVERSAMPLING, ROLLUPS, CACHE_ENABLED, DEFAULT_DEVICE_ID, QUERY_PROFILING,
+    NOTIFY_CHANNEL, DB_READ_METHOD, ROLLUP_RECHECK_INTERVAL
+)
+from frontend.cache import RecentSampleCache, SERIES_COLUMNS
+from frontend.downsampling import lttb
+from frontend.notify import ChangeListener
+from frontend.pgcopy import copy_columns
+from frontend.profiling import ProfilingCursor
+
+logger = logging.getLogger(__name__)
+
+# ====
+# POOL DE CONEXIONES
+# ====
+class ConnectionPool:
+    """Pool de conexiones compartido por todas las sesiones del proceso.
+
+    Verifica las conexiones al entregarlas y descarta las rotas, de modo
+    que tras una caída o failover de la base de datos el pool se repone
+    con conexiones nuevas sin reiniciar el proceso. Una conexión usada
+    hace poco se entrega sin verificar, salvo que después de su último uso
+    alguna otra haya fallado: entonces todas las anteriores al fallo se
+    verifican antes de entregarse.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = ThreadedConnectionPool(
+            minconn, maxconn,
+            host=TIMESCALE_HOST,
+            port=TIMESCALE_PORT,
+            database=TIMESCALE_DB,
+            user=TIMESCALE_USER,
+            password=TIMESCALE_PASSWORD,
+            sslmode='require',
+            connect_timeout=TIMESCALE_CONNECT_TIMEOUT,
+            # Todas las consultas del dashboard (y de la caché) pasan por el perfilado
+            cursor_factory=ProfilingCursor if QUERY_PROFILING else None
+        )
+        # ThreadedConnectionPool falla en vez de esperar cuando se agota
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        # Último fallo de conexión (time.monotonic())
+        self._failed_at = None
+
+    def _is_healthy(self, conn):
+        """Comprobar que la conexión sigue viva"""
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is None:
+            return True
+        recent = time.monotonic() - last_used < self.healthcheck_idle
+        suspect = self._failed_at is not None and last_used <= self._failed_at
+        if recent and not suspect:
+            return True
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        """Cerrar una conexión y sacarla del pool"""
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except psycopg2.Error:
+            pass
+
+    def _checkout(self):
+        """Obtener una conexión sana del pool"""
+        # Una conexión nueva por cada ranura como máximo antes de desistir
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                if conn.autocommit is False:
+                    conn.set_session(readonly=True, autocommit=True)
+                return conn
+            logger.warning("Conexión del pool inválida, reconectando...")
+            self._discard(conn)
+
+        raise psycopg2.OperationalError("No se pudo obtener una conexión válida")
+
+    @contextmanager
+    def connection(self):
+        """Prestar una conexión del pool durante el bloque"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError("Tiempo de espera agotado en el pool")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._failed_at = time.monotonic()
+            self._discard(conn)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def close(self):
+        """Cerrar todas las conexiones"""
+        self._pool.closeall()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Obtener el pool del proceso, creándolo en el primer uso.
+
+    La creación es diferida para que cada worker de gunicorn tenga su
+    propio pool tras el fork.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logger.info(f"Creando pool de conexiones ({DB_POOL_MIN}-{DB_POOL_MAX})")
+                _pool = ConnectionPool()
+    return _pool
+
+@contextmanager
+def db_connection():
+    """Prestar una conexión del pool del proceso"""
+    with get_pool().connection() as conn:
+        yield conn
+
+def run_query(work):
+    """Ejecutar work(cursor) con una conexión del pool y devolver su resultado.
+
+    Si la conexión resulta rota (caída, reinicio o failover de la base de
+    datos) se descarta y se reintenta una vez: el pool verifica entonces
+    las demás conexiones antes de entregarlas.
+    """
+    for attempt in (1, 2):
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    return work(cursor)
+                finally:
+                    if not cursor.closed:
+                        cursor.close()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if attempt == 2:
+                raise
+            logger.warning(f"Conexión del pool rota ({e}), reintentando...")
+
+# ====
+# CONEXIONES DEDICADAS
+# ====
+def open_connection():
+    """Conexión propia fuera del pool, para usos que la ocupan mucho tiempo
+    (LISTEN, exportaciones) sin quitar ranuras a las sesiones del dashboard"""
+    return psycopg2.connect(
+        host=TIMESCALE_HOST,
+        port=TIMESCALE_PORT,
+        database=TIMESCALE_DB,
+        user=TIMESCALE_USER,
+        password=TIMESCALE_PASSWORD,
+        sslmode='require',
+        connect_timeout=TIMESCALE_CONNECT_TIMEOUT,
+        # Una conexión caída se detecta por keepalive, sin consultas periódicas
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+
+# ====
+# AVISOS DE DATOS NUEVOS
+# ====
+_listener = None
+_listener_lock = threading.Lock()
+
+def get_listener():
+    """Obtener la escucha de avisos del proceso (o None si está desactivada).
+
+    Igual que el pool, se crea en el primer uso para que cada worker abra
+    su propia conexión tras el fork.
+    """
+    global _listener
+    if not NOTIFY_CHANNEL:
+        return None
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                _listener = ChangeListener(open_connection)
+                _listener.start()
+    return _listener
+
+# ====
+# CACHÉ DE MUESTRAS RECIENTES
+# ====
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Obtener la caché del proceso (o None si está desactivada).
+
+    Igual que el pool, se crea en el primer uso para que el hilo de
+    refresco se inicie en cada worker tras el fork.
+    """
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RecentSampleCache(db_connection, listener=get_listener())
+                _cache.start()
+    return _cache
+
+# ====
+# CONSULTAS
+# ====
+ACCEL_MAGNITUDE_SQL = "sqrt(ax * ax + ay * ay + az * az)"
+GYRO_MAGNITUDE_SQL = "sqrt(gx * gx + gy * gy + gz * gz)"
+
+# Ventana: desde el inicio del rango (relativo al último dato recibido del
+# dispositivo) o desde un timestamp dado, hasta el último intervalo completo.
+# Todas las consultas filtran por device_id para leer solo sus particiones.
+WINDOW_START_SQL = """(SELECT MAX(timestamp) - %(range)s FROM sensor_data
+    WHERE device_id = %(device)s)"""
+SINCE_START_SQL = "%(since)s::BIGINT"
+WINDOW_END_SQL = """(SELECT time_bucket(%(width)s::BIGINT, MAX(timestamp)) FROM sensor_data
+    WHERE device_id = %(device)s)"""
+
+# Ventana fija (zoom): límites explícitos en ms
+RANGE_START_SQL = "%(start)s::BIGINT"
+RANGE_END_SQL = "%(end)s::BIGINT"
+
+# Las consultas de series devuelven una fila por intervalo con SERIES_COLUMNS
+RAW_BUCKETS_QUERY = f"""
+    SELECT
+        time_bucket(%(width)s::BIGINT, timestamp) AS bucket,
+        MIN({ACCEL_MAGNITUDE_SQL}), MAX({ACCEL_MAGNITUDE_SQL}), AVG({ACCEL_MAGNITUDE_SQL}),
+        MIN({GYRO_MAGNITUDE_SQL}), MAX({GYRO_MAGNITUDE_SQL}), AVG({GYRO_MAGNITUDE_SQL})
+    FROM sensor_data
+    WHERE device_id = %(device)s
+      AND timestamp >= {{start}}
+      AND timestamp < {{end}}
+    GROUP BY bucket
+    ORDER BY bucket ASC
+"""
+
+# Re-agregación de un rollup: medias ponderadas por número de muestras
+ROLLUP_BUCKETS_QUERY = f"""
+    SELECT
+        time_bucket(%(width)s::BIGINT, bucket) AS b,
+        MIN(accel_min), MAX(accel_max), SUM(accel_avg * samples) / SUM(samples),
+        MIN(gyro_min), MAX(gyro_max), SUM(gyro_avg * samples) / SUM(samples)
+    FROM {{view}}
+    WHERE device_id = %(device)s
+      AND bucket >= {{start}}
+      AND bucket < {{end}}
+    GROUP BY b
+    ORDER BY b ASC
+"""
+
+# Tipos de SERIES_COLUMNS para la lectura con COPY binario
+SERIES_FIELDS = [('timestamp', 'int8')] + [(name, 'float8') for name in SERIES_COLUMNS[1:]]
+
+# Muestras crudas de un dispositivo en [start, end) (análisis y exportación)
+SAMPLE_FIELDS = [('timestamp', 'int8')] + [(axis, 'float8') for axis in
+                                           ('ax', 'ay', 'az', 'gx', 'gy', 'gz')]
+SAMPLES_QUERY = """
+    SELECT timestamp, ax, ay, az, gx, gy, gz
+    FROM sensor_data
+    WHERE device_id = %(device)s
+      AND timestamp >= %(start)s
+      AND timestamp < %(end)s
+    ORDER BY timestamp ASC
+"""
+
+# ====
+# ROLLUPS DISPONIBLES
+# ====
+# El backend solo avisa si no pudo crear un agregado continuo, así que las
+# vistas se comprueban en la base de datos en vez de suponerlas
+ROLLUP_CATALOG_QUERY = """
+    SELECT view_name, view_definition
+    FROM timescaledb_information.continuous_aggregates
+    WHERE hypertable_name = 'sensor_data'
+"""
+ROLLUP_EXISTS_QUERY = """
+    SELECT view FROM unnest(%s::TEXT[]) AS view WHERE to_regclass(view) IS NOT NULL
+"""
+# Ancho en la definición del agregado: time_bucket((60000)::bigint, ...)
+BUCKET_WIDTH_PATTERN = re.compile(r"time_bucket\(\(?'?(\d+)'?\)?::bigint", re.IGNORECASE)
+
+_rollups = None
+_rollups_checked_at = None
+_rollups_lock = threading.Lock()
+
+def _load_rollups(cursor):
+    """Agregados continuos de sensor_data en la base de datos: vista -> ancho (ms)"""
+    try:
+        cursor.execute(ROLLUP_CATALOG_QUERY)
+    except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn):
+        # Sin catálogo de TimescaleDB: las vistas configuradas que existan
+        cursor.execute(ROLLUP_EXISTS_QUERY, (list(ROLLUPS),))
+        existing = {row[0] for row in cursor.fetchall()}
+        return {view: width for view, width in ROLLUPS.items() if view in existing}
+
+    rollups = {}
+    for view, definition in cursor.fetchall():
+        match = BUCKET_WIDTH_PATTERN.search(definition or '')
+        width = int(match.group(1)) if match else ROLLUPS.get(view)
+        if width:
+            rollups[view] = width
+    return rollups
+
+def available_rollups():
+    """Rollups que se pueden leer, comprobados cada ROLLUP_RECHECK_INTERVAL segundos"""
+    global _rollups, _rollups_checked_at
+    now = time.monotonic()
+    if _rollups is not None and now - _rollups_checked_at < ROLLUP_RECHECK_INTERVAL:
+        return _rollups
+
+    with _rollups_lock:
+        if _rollups is None or now - _rollups_checked_at >= ROLLUP_RECHECK_INTERVAL:
+            try:
+                rollups = run_query(_load_rollups)
+                if rollups != _rollups:
+                    logger.info(f"Rollups disponibles: {', '.join(sorted(rollups)) or 'ninguno'}")
+            except Exception as e:
+                logger.error(f"Error comprobando rollups: {e}")
+                rollups = _rollups if _rollups is not None else dict(ROLLUPS)
+            _rollups, _rollups_checked_at = rollups, now
+    return _rollups
+
+def _forget_rollup(view):
+    """Dejar de usar una vista que resultó no existir (hasta la próxima comprobación)"""
+    global _rollups
+    with _rollups_lock:
+        if _rollups and view in _rollups:
+            _rollups = {v: w for v, w in _rollups.items() if v != view}
+
+def _bucket_width(ms_range, points):
+    """Ancho de intervalo (ms) para repartir el rango en points puntos"""
+    return max(1, -(-ms_range // points))
+
+def select_source(width):
+    """Elegir el rollup más grueso cuyo intervalo no supere width.
+
+    Devuelve (vista, ancho del rollup) o (None, None) si la densidad pedida
+    exige leer los datos crudos.
+    """
+    for view, rollup_width in sorted(available_rollups().items(), key=lambda item: -item[1]):
+        if rollup_width <= width:
+            return view, rollup_width
+    return None, None
+
+def query_plan(days=1, max_points=MAX_POINTS, method=DOWNSAMPLE_METHOD,
+               device=DEFAULT_DEVICE_ID):
+    """Fuente y ancho de intervalo con que se consulta un rango de un dispositivo.
+
+    Devuelve un dict serializable para que las sesiones puedan pedir los
+    datos nuevos con la misma resolución que la carga completa.
+    """
+    ms_range = days * 24 * 60 * 60 * 1000
+    points = max_points * LTTB_OVERSAMPLING if method == 'lttb' else max_points
+    width = _bucket_width(ms_range, points)
+    view, rollup_width = select_source(width)
+
+    if view:
+        # Múltiplo del ancho del rollup para no partir sus intervalos
+        width = -(-width // rollup_width) * rollup_width
+
+    return {'range': ms_range, 'width': width, 'view': view, 'method': method,
+            'device': device}
+
+def tail_plan(plan):
+    """Plan con que se extiende una serie cargada con plan.
+
+    Con 'lttb' la serie mostrada tiene la resolución final (~max_points
+    puntos) y no la de los intervalos finos que se reducen, así que los
+    intervalos nuevos se piden LTTB_OVERSAMPLING veces más anchos (máximo
+    por intervalo, igual que los picos que conserva LTTB).
+    """
+    if plan['method'] != 'lttb':
+        return plan
+
+    width = plan['width'] * LTTB_OVERSAMPLING
+    view, rollup_width = select_source(width)
+    if view:
+        width = -(-width // rollup_width) * rollup_width
+    return dict(plan, width=width, view=view, method='bucket')
+
+def tail_last_ts(plan, tail, last_ts):
+    """Último intervalo de tail que se da por mostrado tras cargar plan hasta last_ts.
+
+    El intervalo de tail que contiene el final de lo mostrado se omite
+    (quedaría mezclado con intervalos finos ya dibujados): los intervalos
+    nuevos empiezan en el siguiente múltiplo de su ancho.
+    """
+    if last_ts is None or tail is plan:
+        return last_ts
+    shown_end = last_ts + plan['width']
+    return -(-shown_end // tail['width']) * tail['width'] - tail['width']
+
+def window_plan(start, end, max_points=MAX_POINTS, device=DEFAULT_DEVICE_ID):
+    """Plan de una ventana fija [start, end) en ms con ~max_points intervalos.
+
+    Al acercarse, el ancho baja hasta los rollups más finos y, por debajo
+    de 1 s, hasta los datos crudos (un intervalo por muestra cuando el
+    ancho no supera el periodo de muestreo).
+    """
+    width = _bucket_width(end - start, max_points)
+    view, rollup_width = select_source(width)
+
+    if view:
+        width = -(-width // rollup_width) * rollup_width
+
+    return {'range': end - start, 'width': width, 'view': view, 'method': 'bucket',
+            'device': device, 'start': start, 'end': end}
+
+def empty_series():
+    """Serie sin datos con las mismas columnas"""
+    return to_columns([])
+
+def to_columns(rows):
+    """Convertir filas de series en columnas NumPy (timestamp int64, resto float64)"""
+    data = np.asarray(rows, dtype=np.float64).reshape(-1, len(SERIES_COLUMNS))
+    columns = {name: data[:, i] for i, name in enumerate(SERIES_COLUMNS)}
+    columns['timestamp'] = columns['timestamp'].astype(np.int64)
+    return columns
+
+def read_columns(cursor, query, params, fields, read_method=DB_READ_METHOD):
+    """Columnas NumPy de una consulta de columnas de ancho fijo sin NULL.
+
+    Con 'copy_binary' el resultado llega como COPY binario y se lee con
+    np.frombuffer; con 'fetchall' pasa por las tuplas de psycopg2.
+    """
+    if read_method == 'copy_binary':
+        return copy_columns(cursor, query, params, fields)
+
+    cursor.execute(query, params)
+    data = np.asarray(cursor.fetchall(), dtype=np.float64).reshape(-1, len(fields))
+    return {name: data[:, i].astype(np.int64) if pg_type == 'int8' else data[:, i]
+            for i, (name, pg_type) in enumerate(fields)}
+
+def _fetch_buckets(cursor, plan, since=None, read_method=DB_READ_METHOD):
+    """Consultar intervalos según el plan: todo el rango, desde since o la ventana fija.
+
+    Si la vista del plan no existe se leen los datos crudos con el mismo
+    ancho de intervalo.
+    """
+    try:
+        return _query_buckets(cursor, plan, since, read_method)
+    except psycopg2.errors.UndefinedTable:
+        if not plan['view']:
+            raise
+        logger.warning(f"La vista {plan['view']} no existe, leyendo sensor_data")
+        _forget_rollup(plan['view'])
+        return _query_buckets(cursor, dict(plan, view=None), since, read_method)
+
+def _query_buckets(cursor, plan, since, read_method):
+    if plan.get('end') is not None:
+        start, end = RANGE_START_SQL, RANGE_END_SQL
+    else:
+        start = WINDOW_START_SQL if since is None else SINCE_START_SQL
+        end = WINDOW_END_SQL
+
+    if plan['view']:
+        query = ROLLUP_BUCKETS_QUERY.format(view=plan['view'], start=start, end=end)
+    else:
+        query = RAW_BUCKETS_QUERY.format(start=start, end=end)
+
+    params = {
+        'width': plan['width'],
+        'range': plan['range'],
+        'since': since,
+        'start': plan.get('start'),
+        'end': plan.get('end'),
+        'device': plan['device'],
+    }
+    if read_method == 'copy_binary':
+        return copy_columns(cursor, query, params, SERIES_FIELDS)
+
+    cursor.execute(query, params)
+    return to_columns(cursor.fetchall())
+
+def _lttb_series(series, max_points):
+    """Reducir agregados finos con LTTB sobre los máximos de cada magnitud.
+
+    Se reparte el presupuesto entre aceleración y giroscopio y se unen
+    los índices elegidos, para conservar los picos de ambas series.
+    """
+    if len(series['timestamp']) <= max_points:
+        return series
+
+    half = max(3, max_points // 2)
+    indices = np.union1d(
+        lttb(series['timestamp'], series['accel_max'], half),
+        lttb(series['timestamp'], series['gyro_max'], half)
+    )
+    return {name: column[indices] for name, column in series.items()}
+
+def get_data_by_days(days=1, max_points=MAX_POINTS, method=DOWNSAMPLE_METHOD,
+                     device=DEFAULT_DEVICE_ID):
+    """Obtener datos de los últimos N días de un dispositivo reducidos a ~max_points puntos.
+
+    Devuelve un dict de columnas NumPy (SERIES_COLUMNS), una fila por
+    intervalo.
+
+    La agregación se hace en el servidor con time_bucket, leyendo del
+    agregado continuo más grueso que cumpla la densidad pedida, de modo que
+    el tamaño de la respuesta no depende del rango. Con method='lttb' se
+    piden LTTB_OVERSAMPLING veces más intervalos y se reducen con LTTB.
+    Solo se incluyen intervalos completos.
+    """
+    try:
+        plan = query_plan(days, max_points, method, device)
+        cache = get_cache()
+        results = cache.buckets(plan) if cache else None
+
+        if results is None:
+            results = run_query(lambda cursor: _fetch_buckets(cursor, plan))
+
+        if method == 'lttb':
+            results = _lttb_series(results, max_points)
+        return results
+    except Exception as e:
+        logger.error(f"Error obteniendo datos: {e}")
+        return empty_series()
+
+def get_data_since(plan, since):
+    """Obtener los intervalos completos a partir de since (ms) según el plan"""
+    try:
+        cache = get_cache()
+        results = cache.buckets(plan, since) if cache else None
+        if results is not None:
+            return results
+
+        return run_query(lambda cursor: _fetch_buckets(cursor, plan, since))
+    except Exception as e:
+        logger.error(f"Error obteniendo datos nuevos: {e}")
+        return empty_series()
+
+def get_data_window(start, end, max_points=MAX_POINTS, device=DEFAULT_DEVICE_ID):
+    """Obtener los intervalos de la ventana [start, end) ms de un dispositivo.
+
+    Para el zoom de los gráficos: la resolución depende solo del ancho de
+    la ventana y de max_points (los píxeles del gráfico), de modo que al
+    acercarse se ve cada vez más detalle sin enviar más puntos.
+    """
+    try:
+        plan = window_plan(start, end, max_points, device)
+        cache = get_cache()
+        results = cache.buckets(plan) if cache else None
+        if results is not None:
+            return results
+
+        return run_query(lambda cursor: _fetch_buckets(cursor, plan))
+    except Exception as e:
+        logger.error(f"Error obteniendo datos de la ventana: {e}")
+        return empty_series()
+
+def get_latest_values(device=DEFAULT_DEVICE_ID):
+    """Obtener los últimos valores registrados de un dispositivo"""
+    try:
+        cache = get_cache()
+        latest = cache.latest(device) if cache else None
+        if latest:
+            return latest
+
+        def latest_row(cursor):
+            cursor.execute("""
+                SELECT
+                    timestamp,
+                    ax, ay, az,
+                    gx, gy, gz,
+                    received_at
+                FROM sensor_data
+                WHERE device_id = %s
+                ORDER BY timestamp DESC
+                LIMIT 1
+            """, (device,))
+            return cursor.fetchone()
+
+        return run_query(latest_row)
+    except Exception as e:
+        logger.error(f"Error obteniendo últimos valores: {e}")
+        return None
+
+def get_samples(start, end, device=DEFAULT_DEVICE_ID, read_method=DB_READ_METHOD):
+    """Obtener las muestras crudas de [start, end) ms de un dispositivo.
+
+    Para análisis: devuelve un dict de columnas NumPy (timestamp int64 y
+    los seis ejes float64) leídas de una vez, sin reducción. Los errores
+    se propagan para no confundir un fallo con un rango vacío.
+    """
+    return run_query(lambda cursor: read_columns(
+        cursor, SAMPLES_QUERY, {'device': device, 'start': start, 'end': end},
+        SAMPLE_FIELDS, read_method
+    ))
+
+def get_devices():
+    """Obtener los dispositivos conocidos (o el dispositivo por defecto si no hay)"""
+    try:
+        def device_ids(cursor):
+            cursor.execute("SELECT device_id FROM devices ORDER BY device_id")
+            return [row[0] for row in cursor.fetchall()]
+
+        devices = run_query(device_ids)
+    except Exception as e:
+        logger.error(f"Error obteniendo dispositivos: {e}")
+        devices = []
+
+    return devices or [DEFAULT_DEVICE_ID]
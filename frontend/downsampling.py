@@ -0,0 +1,44 @@
+"""
+Reducción de series temporales a un número fijo de puntos
+"""
+import numpy as np
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: índices de los n_out puntos a conservar.
+
+    Divide la serie en n_out - 2 cubetas y en cada una elige el punto que
+    forma el triángulo de mayor área con el punto elegido en la cubeta
+    anterior y el promedio de la siguiente, lo que conserva los picos.
+    Siempre incluye el primer y el último punto.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Promedio de la cubeta siguiente (o el último punto)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Área (doble) del triángulo para cada candidato de la cubeta
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
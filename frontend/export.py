@@ -0,0 +1,228 @@
+"""
+Exportación de rangos de muestras crudas a CSV o Parquet con memoria acotada
+
+Uso (con las mismas variables TIMESCALE_* que el dashboard):
+    python -m frontend.export --start 2026-09-01 --end 2026-10-01 [--device esp32]
+                              [--format csv|parquet] [--output archivo]
+"""
+import argparse
+import csv
+import io
+import logging
+import sys
+import numpy as np
+from frontend.config import EXPORT_CHUNK_ROWS
+from frontend.database import open_connection
+from frontend.pgcopy import copy_columns
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ('timestamp', 'device_id', 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'received_at')
+
+# Columnas leídas con COPY binario (todas de ancho fijo y NOT NULL); el
+# device_id es el mismo en todo el bloque y se añade aparte
+EXPORT_FIELDS = (
+    [('timestamp', 'int8')]
+    + [(axis, 'float8') for axis in EXPORT_COLUMNS[2:8]]
+    + [('received_at', 'timestamptz')]
+)
+
+# Siguiente dispositivo con datos en el rango (salto por el índice
+# (device_id, timestamp) en vez de un DISTINCT sobre todas las filas)
+NEXT_DEVICE_QUERY = """
+    SELECT MIN(device_id) FROM sensor_data
+    WHERE device_id > %(after)s AND timestamp >= %(start)s AND timestamp < %(end)s
+"""
+
+# Un bloque de un dispositivo a partir del último timestamp exportado
+EXPORT_QUERY = """
+    SELECT timestamp, ax, ay, az, gx, gy, gz, received_at
+    FROM sensor_data
+    WHERE device_id = %(device)s AND timestamp > %(after)s AND timestamp < %(end)s
+    ORDER BY timestamp
+    LIMIT %(limit)s
+"""
+
+# Tipos MIME de cada formato
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def parse_time(value):
+    """Instante en ms a partir de ms epoch o de una fecha ISO (UTC)"""
+    value = str(value).strip()
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return int(np.datetime64(value.replace(' ', 'T'), 'ms').astype(np.int64))
+
+# ====
+# LECTURA
+# ====
+def _devices(cursor, start, end):
+    """Dispositivos con datos en [start, end), en orden"""
+    device = ''
+    while True:
+        cursor.execute(NEXT_DEVICE_QUERY, {'after': device, 'start': start, 'end': end})
+        device = cursor.fetchone()[0]
+        if device is None:
+            return
+        yield device
+
+def iter_chunks(start, end, device=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Columnas NumPy de [start, end) ms en bloques de como máximo chunk_rows.
+
+    Cada bloque es un COPY binario de un dispositivo, paginado por
+    timestamp (la clave única), que se lee de una vez con pgcopy.parse_copy
+    sin crear tuplas por fila. Va sobre una conexión propia (no ocupa el
+    pool del dashboard) en una transacción REPEATABLE READ, para que todos
+    los bloques vean la misma instantánea.
+    """
+    conn = open_connection()
+    try:
+        conn.set_session(readonly=True, isolation_level='REPEATABLE READ')
+        cursor = conn.cursor()
+        devices = [device] if device else list(_devices(cursor, start, end))
+        for device_id in devices:
+            after = start - 1
+            while True:
+                columns = copy_columns(cursor, EXPORT_QUERY, {
+                    'device': device_id, 'after': after, 'end': end, 'limit': chunk_rows,
+                }, EXPORT_FIELDS)
+                count = len(columns['timestamp'])
+                if not count:
+                    break
+                columns['device_id'] = device_id
+                yield columns
+                if count < chunk_rows:
+                    break
+                after = int(columns['timestamp'][-1])
+        cursor.close()
+    finally:
+        conn.close()
+
+# ====
+# FORMATOS
+# ====
+def export_csv(start, end, device=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """CSV por bloques (texto); received_at en ISO 8601 (UTC)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+
+    for columns in iter_chunks(start, end, device, chunk_rows):
+        count = len(columns['timestamp'])
+        # El texto del CSV se genera por valor; las columnas se convierten de una vez
+        writer.writerows(zip(
+            columns['timestamp'].tolist(),
+            [columns['device_id']] * count,
+            *(columns[axis].tolist() for axis in EXPORT_COLUMNS[2:8]),
+            np.char.add(np.datetime_as_string(columns['received_at'], unit='us'), '+00:00').tolist(),
+        ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Solo la cabecera si el rango está vacío
+    if buffer.tell():
+        yield buffer.getvalue()
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura cuyo contenido se recoge por partes"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """Bytes escritos desde la última llamada"""
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def export_parquet(start, end, device=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Parquet por bloques (bytes), un row group por bloque de filas"""
+    # Dependencia opcional: solo la necesita la exportación a Parquet
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow") from e
+
+    schema = pa.schema(
+        [('timestamp', pa.int64()), ('device_id', pa.string())]
+        + [(axis, pa.float64()) for axis in EXPORT_COLUMNS[2:8]]
+        + [('received_at', pa.timestamp('us', tz='UTC'))]
+    )
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for columns in iter_chunks(start, end, device, chunk_rows):
+            count = len(columns['timestamp'])
+            columns['device_id'] = [columns['device_id']] * count
+            table = pa.Table.from_arrays(
+                [pa.array(columns[field.name], type=field.type) for field in schema],
+                schema=schema
+            )
+            writer.write_table(table, row_group_size=count)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        # Pie del archivo (metadatos de los row groups)
+        writer.close()
+    yield sink.drain()
+
+EXPORTERS = {
+    'csv': export_csv,
+    'parquet': export_parquet,
+}
+
+# ====
+# CLI
+# ====
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--start', required=True, help="Inicio (ms epoch o fecha ISO, UTC)")
+    parser.add_argument('--end', required=True, help="Fin exclusivo (ms epoch o fecha ISO, UTC)")
+    parser.add_argument('--device', help="Solo este dispositivo (por defecto, todos)")
+    parser.add_argument('--format', choices=sorted(EXPORTERS), default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument('--output', help="Archivo de salida (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    start, end = parse_time(args.start), parse_time(args.end)
+    chunks = EXPORTERS[args.format](start, end, args.device, args.chunk_rows)
+    binary = args.format == 'parquet'
+
+    if args.output:
+        output = open(args.output, 'wb') if binary else open(args.output, 'w', newline='')
+    else:
+        output = sys.stdout.buffer if binary else sys.stdout
+
+    written = 0
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    logger.info(f"Exportación terminada ({written} bytes, formato {args.format})")
+
+if __name__ == '__main__':
+    main()
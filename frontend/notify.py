@@ -0,0 +1,144 @@
+"""
+Avisos de datos nuevos del receptor (LISTEN/NOTIFY)
+"""
+import json
+import logging
+import select
+import threading
+import time
+from psycopg2 import sql
+from frontend.config import NOTIFY_CHANNEL, NOTIFY_RETRY
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima de select() sin avisos antes de volver a comprobar la conexión
+LISTEN_TIMEOUT = 5.0
+
+class ChangeListener:
+    """Una conexión por proceso que escucha los NOTIFY del receptor.
+
+    Cada aviso trae un dispositivo y el primer y último timestamp guardados
+    en el lote. Mientras la escucha está activa, quien consultó un
+    dispositivo en un instante posterior a listening_since puede saber sin
+    ir a la base de datos si desde entonces llegó algo posterior a lo que
+    ya tiene (unchanged); las filas anteriores (reenvío del spool, lotes
+    desordenados) llegan a los callbacks con su rango. Tras una desconexión
+    los avisos perdidos no se recuperan: listening_since se reinicia y los
+    callbacks reciben None (cualquier dato pudo cambiar).
+    """
+
+    def __init__(self, connection_factory, channel=NOTIFY_CHANNEL, retry=NOTIFY_RETRY):
+        self.connection_factory = connection_factory
+        self.channel = channel
+        self.retry = retry
+        self.listening_since = None
+        self._newest = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Iniciar el hilo de escucha (una vez por proceso)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='change-listener', daemon=True)
+            self._thread.start()
+
+    def add_callback(self, callback):
+        """Registrar callback(changes) a llamar al recibir avisos.
+
+        changes es {dispositivo: (min_ts, max_ts)} de los avisos recibidos, o
+        None al (re)conectar, cuando los avisos perdidos son desconocidos.
+        """
+        with self._lock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+
+    def newest(self, device_id):
+        """Último timestamp anunciado para el dispositivo (o None)"""
+        return self._newest.get(device_id)
+
+    def unchanged(self, device_id, ts, since):
+        """No hay datos posteriores a ts desde since (time.monotonic()).
+
+        Solo es cierto si la escucha ya estaba activa en since: si no,
+        podría haberse perdido un aviso y hay que consultar. No dice nada de
+        las filas anteriores a ts: esas llegan a los callbacks.
+        """
+        listening_since = self.listening_since
+        if listening_since is None or since is None or ts is None or since < listening_since:
+            return False
+        newest = self._newest.get(device_id)
+        return newest is None or newest <= ts
+
+    # ====
+    # ESCUCHA
+    # ====
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Error en la escucha de avisos: {e}")
+            self.listening_since = None
+            time.sleep(self.retry)
+
+    def _listen(self):
+        """Abrir la conexión, suscribirse al canal y atender los avisos"""
+        conn = self.connection_factory()
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            cursor.close()
+            self.listening_since = time.monotonic()
+            logger.info(f"Escuchando avisos de datos nuevos en '{self.channel}'")
+            # Los avisos de la desconexión se perdieron: que se consulte de nuevo
+            self._notify_callbacks(None)
+
+            while True:
+                if not select.select([conn], [], [], LISTEN_TIMEOUT)[0]:
+                    continue
+                conn.poll()
+                if not conn.notifies:
+                    continue
+                changes = {}
+                while conn.notifies:
+                    change = self._handle(conn.notifies.pop(0).payload)
+                    if change:
+                        device_id, oldest, newest = change
+                        if device_id in changes:
+                            oldest = min(oldest, changes[device_id][0])
+                            newest = max(newest, changes[device_id][1])
+                        changes[device_id] = (oldest, newest)
+                if changes:
+                    self._notify_callbacks(changes)
+        finally:
+            conn.close()
+
+    def _handle(self, payload):
+        """Registrar el último timestamp anunciado y devolver (dispositivo, min, max)"""
+        try:
+            change = json.loads(payload)
+            device_id = change['device']
+            if 'max_ts' in change:
+                oldest, newest = int(change['min_ts']), int(change['max_ts'])
+            else:
+                # Receptores anteriores: solo el último timestamp
+                oldest = newest = int(change['ts'])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Aviso de datos nuevos inválido: {payload!r}")
+            return None
+        with self._lock:
+            self._newest[device_id] = max(newest, self._newest.get(device_id, newest))
+        return device_id, oldest, newest
+
+    def _notify_callbacks(self, changes):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"Error atendiendo aviso de datos nuevos: {e}")
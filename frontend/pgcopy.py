@@ -0,0 +1,81 @@
+"""
+Lectura de resultados con COPY ... TO STDOUT en formato binario directo a NumPy
+"""
+import io
+import struct
+import numpy as np
+
+# Firma + flags + longitud de la extensión de cabecera
+PGCOPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+PGCOPY_HEADER = struct.Struct('!11sii')
+PGCOPY_TRAILER = b'\xff\xff'
+
+# Tipos de ancho fijo admitidos: tipo de PostgreSQL -> dtype en el buffer
+FIELD_DTYPES = {
+    'int8': '>i8',
+    'float8': '>f8',
+    'timestamptz': '>i8',
+}
+
+# timestamptz en binario: microsegundos desde 2000-01-01 UTC
+PG_EPOCH_US = int(np.datetime64('2000-01-01T00:00:00', 'us').astype(np.int64))
+
+def row_dtype(fields):
+    """Formato de fila de COPY binario para [(nombre, tipo), ...].
+
+    Por fila: nº de campos y, por campo, longitud + valor, en big-endian y
+    sin relleno. Solo sirve para columnas de ancho fijo sin NULL: así todas
+    las filas miden lo mismo y el buffer se lee de una vez con frombuffer.
+    """
+    layout = [('fields', '>i2')]
+    for name, pg_type in fields:
+        layout += [(f'{name}_len', '>i4'), (name, FIELD_DTYPES[pg_type])]
+    return np.dtype(layout)
+
+def parse_copy(data, fields):
+    """Columnas NumPy (orden de bytes nativo) de un buffer de COPY binario.
+
+    Lanza ValueError si el buffer no tiene el formato esperado (otras
+    columnas, NULL o columnas de ancho variable).
+    """
+    if len(data) < PGCOPY_HEADER.size:
+        raise ValueError("El resultado no es COPY binario")
+    signature, _, extension = PGCOPY_HEADER.unpack_from(data)
+    if signature != PGCOPY_SIGNATURE:
+        raise ValueError("El resultado no es COPY binario")
+
+    offset = PGCOPY_HEADER.size + extension
+    end = len(data) - len(PGCOPY_TRAILER)
+    if bytes(data[end:]) != PGCOPY_TRAILER:
+        raise ValueError("COPY binario incompleto")
+
+    dtype = row_dtype(fields)
+    count, remainder = divmod(end - offset, dtype.itemsize)
+    if remainder:
+        raise ValueError("Filas de COPY binario de ancho variable (¿NULL?)")
+
+    rows = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+    if count and not (rows['fields'] == len(fields)).all():
+        raise ValueError("Número de columnas de COPY binario inesperado")
+
+    columns = {}
+    for name, pg_type in fields:
+        if count and not (rows[f'{name}_len'] == 8).all():
+            raise ValueError(f"Valores NULL o de otro tipo en la columna {name}")
+        # astype a orden nativo: copia contigua, independiente del buffer
+        values = rows[name].astype(rows[name].dtype.newbyteorder('='))
+        if pg_type == 'timestamptz':
+            values = (values + PG_EPOCH_US).astype('datetime64[us]')
+        columns[name] = values
+    return columns
+
+def copy_columns(cursor, query, params, fields):
+    """Ejecutar query con COPY binario y devolver sus columnas NumPy.
+
+    Los parámetros se interpolan con mogrify (COPY no admite parámetros)
+    y no se crea ningún objeto de Python por fila ni por valor.
+    """
+    select = cursor.mogrify(query, params).decode('utf-8').strip()
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return parse_copy(buffer.getbuffer(), fields)
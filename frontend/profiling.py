@@ -0,0 +1,174 @@
+"""
+Perfilado de las consultas del dashboard y captura de consultas lentas
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+import psycopg2.extensions
+from frontend.config import (
+    QUERY_SLOW_MS, QUERY_EXPLAIN_INTERVAL, QUERY_SLOW_LOG_SIZE, QUERY_EXPLAIN_ANALYZE
+)
+
+logger = logging.getLogger(__name__)
+
+# ====
+# REGISTRO DE CONSULTAS
+# ====
+def _query_key(query):
+    """Consulta sin parámetros con los espacios normalizados (agrupa las ejecuciones)"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    return ' '.join(str(query).split())
+
+# COPY (SELECT ...) TO STDOUT: la consulta llega con los parámetros ya
+# interpolados, así que se agrupa reemplazando los literales por '?'
+COPY_QUERY = re.compile(r'^\s*COPY\s*\((.*)\)\s*TO\s+STDOUT', re.IGNORECASE | re.DOTALL)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+class QueryProfiler:
+    """Estadísticas por consulta y últimas capturas de consultas lentas.
+
+    Cada ejecución suma duración, filas y bytes a las estadísticas de su
+    consulta (el SQL sin parámetros). Las que superan slow_ms se guardan
+    con su plan, como mucho una vez cada explain_interval segundos por
+    consulta. Con analyze el plan es EXPLAIN (ANALYZE, BUFFERS), que vuelve
+    a ejecutarla; si no, un EXPLAIN con los costes estimados.
+    """
+
+    def __init__(self, slow_ms=QUERY_SLOW_MS, explain_interval=QUERY_EXPLAIN_INTERVAL,
+                 max_captures=QUERY_SLOW_LOG_SIZE, analyze=QUERY_EXPLAIN_ANALYZE):
+        self.slow_ms = slow_ms
+        self.explain_interval = explain_interval
+        self.analyze = analyze
+        self.stats = {}
+        self.captures = deque(maxlen=max_captures)
+        self._last_explain = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, ms, rows, size):
+        """Sumar una ejecución. Devuelve True si hay que capturar su plan"""
+        with self._lock:
+            stats = self.stats.setdefault(key, {
+                'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'bytes': 0, 'slow': 0,
+            })
+            stats['calls'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            stats['rows'] += rows
+            stats['bytes'] += size
+
+            if ms < self.slow_ms:
+                return False
+            stats['slow'] += 1
+
+            now = time.monotonic()
+            if now - self._last_explain.get(key, -self.explain_interval) < self.explain_interval:
+                return False
+            self._last_explain[key] = now
+            return True
+
+    def capture(self, key, ms, rows, size, plan):
+        """Guardar y registrar en el log una consulta lenta con su plan"""
+        with self._lock:
+            self.captures.append({
+                'query': key,
+                'ms': round(ms, 2),
+                'rows': rows,
+                'bytes': size,
+                'plan': plan,
+                'captured_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+        logger.warning(
+            f"Consulta lenta ({ms:.0f} ms, {rows} filas, ~{size} bytes): {key}\n{plan}"
+        )
+
+    def report(self):
+        """Estadísticas (de mayor a menor tiempo total) y capturas recientes"""
+        with self._lock:
+            stats = [
+                dict(s, query=key, total_ms=round(s['total_ms'], 2), max_ms=round(s['max_ms'], 2),
+                     avg_ms=round(s['total_ms'] / s['calls'], 2))
+                for key, s in self.stats.items()
+            ]
+            captures = list(reversed(self.captures))
+        stats.sort(key=lambda s: -s['total_ms'])
+        return {'slow_ms': self.slow_ms, 'queries': stats, 'slow_queries': captures}
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.captures.clear()
+            self._last_explain.clear()
+
+PROFILER = QueryProfiler()
+
+# ====
+# CURSOR INSTRUMENTADO
+# ====
+def _result_bytes(cursor):
+    """Bytes aproximados del resultado según el ancho de cada columna.
+
+    psycopg2 no informa los bytes recibidos; se usa el tamaño interno de
+    los tipos de ancho fijo por fila (las columnas de ancho variable no
+    se cuentan).
+    """
+    if not cursor.description or cursor.rowcount <= 0:
+        return 0
+    width = sum(c.internal_size for c in cursor.description if c.internal_size and c.internal_size > 0)
+    return width * cursor.rowcount
+
+class ProfilingCursor(psycopg2.extensions.cursor):
+    """Cursor que registra cada consulta en PROFILER.
+
+    Con cursores del lado del cliente execute() ya recibe todas las filas,
+    así que su duración incluye la ejecución en el servidor y la
+    transferencia del resultado.
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        result = super().execute(query, vars)
+        ms = (time.perf_counter() - start) * 1000
+
+        try:
+            key = _query_key(query)
+            rows = max(self.rowcount, 0)
+            size = _result_bytes(self)
+            if PROFILER.record(key, ms, rows, size):
+                PROFILER.capture(key, ms, rows, size, self._explain(query, vars))
+        except Exception as e:
+            logger.debug(f"Error perfilando consulta: {e}")
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        result = super().copy_expert(sql, file, size)
+        ms = (time.perf_counter() - start) * 1000
+
+        try:
+            match = COPY_QUERY.match(sql)
+            if match:
+                select = match.group(1)
+                key = _query_key(LITERALS.sub('?', select))
+                rows = max(self.rowcount, 0)
+                # Aquí sí se conocen los bytes exactos recibidos
+                received = file.tell() if hasattr(file, 'tell') else 0
+                if PROFILER.record(key, ms, rows, received):
+                    PROFILER.capture(key, ms, rows, received, self._explain(select, None))
+        except Exception as e:
+            logger.debug(f"Error perfilando COPY: {e}")
+        return result
+
+    def _explain(self, query, vars):
+        """Plan de la consulta (real con PROFILER.analyze) con un cursor sin instrumentar"""
+        if isinstance(query, bytes):
+            query = query.decode('utf-8')
+        explain = "EXPLAIN (ANALYZE, BUFFERS) " if PROFILER.analyze else "EXPLAIN "
+        try:
+            with psycopg2.extensions.cursor(self.connection) as cursor:
+                cursor.execute(explain + query, vars)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+        except psycopg2.Error as e:
+            return f"EXPLAIN no disponible: {e}"
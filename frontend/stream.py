@@ -0,0 +1,258 @@
+"""
+Envío en vivo de intervalos nuevos a los dashboards (server-sent events)
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from frontend.config import (
+    STREAM_POLL_INTERVAL, STREAM_QUEUE_SIZE, STREAM_KEEPALIVE, STREAM_MAX_SUBSCRIBERS,
+    MAX_POINTS
+)
+from frontend.database import (
+    get_cache, get_listener, get_data_since, get_latest_values, query_plan, tail_plan
+)
+
+logger = logging.getLogger(__name__)
+
+# Con la escucha activa solo se comprueba al llegar avisos; este intervalo
+# es un respaldo por si la conexión del LISTEN cae sin avisar
+LISTEN_POLL_INTERVAL = 15.0
+
+def last_update_text(latest):
+    """Texto de la hora de la última muestra (el mismo en la carga y en vivo).
+
+    En UTC, como el eje de los gráficos (timestamps sin zona horaria).
+    """
+    if not latest:
+        return "🕐 Sin datos disponibles"
+    time_str = datetime.fromtimestamp(latest[0] / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return f"🕐 Última actualización: {time_str} UTC"
+
+def series_event(data):
+    """Intervalos en el formato que el navegador agrega con extendData"""
+    return {
+        'ts': data['timestamp'].tolist(),
+        'x': np.datetime_as_string(data['timestamp'].astype('datetime64[ms]')).tolist(),
+        'accel_max': data['accel_max'].tolist(),
+        'accel_mean': data['accel_mean'].tolist(),
+        'gyro_max': data['gyro_max'].tolist(),
+        'gyro_mean': data['gyro_mean'].tolist(),
+        'max_points': MAX_POINTS,
+    }
+
+def latest_event(latest):
+    """Indicadores numéricos ya formateados y hora de la última muestra"""
+    return {
+        'values': [f"{value:.2f}" for value in latest[1:7]],
+        'text': last_update_text(latest),
+    }
+
+class Subscription:
+    """Cola de eventos de un dashboard conectado"""
+
+    def __init__(self, plan, last_ts, max_size=STREAM_QUEUE_SIZE):
+        self.plan = plan
+        self.key = (plan['device'], plan['width'], plan['view'])
+        self.last_ts = last_ts
+        self.events = queue.Queue(maxsize=max_size)
+        self.closed = False
+
+    def send(self, event):
+        """Encolar un evento; un cliente que no consume se desconecta"""
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+
+class LiveFeed:
+    """Un único hilo por proceso que detecta datos nuevos y los reparte.
+
+    Con los avisos del receptor (LISTEN) el hilo despierta al llegar datos
+    y solo mira los dispositivos anunciados; sin escucha activa comprueba
+    todos cada poll_interval. Por cada dispositivo con suscriptores cuya
+    última muestra cambió refresca la caché de muestras (si está activa) y
+    consulta una sola vez los intervalos nuevos de cada resolución pedida.
+    El resultado se envía a todos los dashboards suscritos a ese
+    dispositivo y resolución, así que la carga no depende del número de
+    clientes y el hilo no consulta nada si no hay ninguno. Se admiten como
+    máximo max_subscribers conexiones a la vez (cada una ocupa un hilo del
+    servidor).
+    """
+
+    def __init__(self, poll_interval=STREAM_POLL_INTERVAL, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._subscriptions = set()
+        # Suscripciones en curso (aún no en _subscriptions) y dispositivos
+        # anunciados desde la última comprobación (None = todos)
+        self._pending = 0
+        self._dirty = None
+        self._last_ts = {}
+        self._newest = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Iniciar el hilo de envío (una vez por proceso)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+            self._thread.start()
+        listener = get_listener()
+        if listener:
+            listener.add_callback(self.wake)
+        logger.info(
+            f"Envío en vivo iniciado (hasta {self.max_subscribers} dashboards, "
+            f"sin avisos cada {self.poll_interval}s)"
+        )
+
+    def subscribe(self, days, device, last_ts=None):
+        """Registrar un dashboard y enviarle lo que le falte desde last_ts.
+
+        Devuelve None si ya hay max_subscribers conexiones abiertas.
+        """
+        with self._lock:
+            if len(self._subscriptions) + self._pending >= self.max_subscribers:
+                return None
+            self._pending += 1
+        try:
+            subscription = self._subscribe(days, device, last_ts)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self.start()
+        return subscription
+
+    def _subscribe(self, days, device, last_ts):
+        # last_ts viene del estado del dashboard, ya en la resolución de tail_plan
+        plan = tail_plan(query_plan(days, device=device))
+        subscription = Subscription(plan, last_ts)
+
+        since = last_ts + plan['width'] if last_ts is not None else None
+        if since is not None:
+            data = get_data_since(plan, since)
+            if len(data['timestamp']):
+                subscription.send({'series': series_event(data)})
+                subscription.last_ts = int(data['timestamp'][-1])
+        latest = get_latest_values(device)
+        if latest:
+            subscription.send({'latest': latest_event(latest)})
+
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if subscription.last_ts is not None:
+                self._last_ts[subscription.key] = max(
+                    self._last_ts.get(subscription.key, subscription.last_ts),
+                    subscription.last_ts
+                )
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            keys = {s.key for s in self._subscriptions}
+            for key in list(self._last_ts):
+                if key not in keys:
+                    del self._last_ts[key]
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def wake(self, changes=None):
+        """Callback del listener: comprobar los dispositivos anunciados (None = todos)"""
+        with self._lock:
+            if changes is None:
+                self._dirty = None
+            elif self._dirty is not None:
+                self._dirty.update(changes)
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            listener = get_listener()
+            listening = listener is not None and listener.listening_since is not None
+            self._wakeup.wait(LISTEN_POLL_INTERVAL if listening else self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error en el envío en vivo: {e}")
+
+    def poll(self):
+        """Enviar los intervalos nuevos y los últimos valores de cada dispositivo"""
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if not s.closed]
+            dirty, self._dirty = self._dirty, set()
+        if not subscriptions:
+            return
+
+        listener = get_listener()
+        devices = {s.plan['device'] for s in subscriptions}
+        if listener and listener.listening_since is not None and dirty is not None:
+            devices &= dirty
+        if not devices:
+            return
+
+        # Las sesiones leen de la caché: que tenga ya los datos anunciados
+        cache = get_cache()
+        if cache:
+            cache.refresh()
+
+        for device in devices:
+            if listener and listener.unchanged(device, self._newest.get(device),
+                                               self._checked.get(device)):
+                continue
+            checked = time.monotonic()
+            latest = get_latest_values(device)
+            self._checked[device] = checked
+            if not latest or latest[0] == self._newest.get(device):
+                continue
+            self._newest[device] = latest[0]
+            indicators = {'latest': latest_event(latest)}
+
+            groups = {}
+            for subscription in subscriptions:
+                if subscription.plan['device'] == device:
+                    groups.setdefault(subscription.key, []).append(subscription)
+
+            for key, members in groups.items():
+                plan = members[0].plan
+                with self._lock:
+                    last_ts = self._last_ts.get(key)
+                since = last_ts + plan['width'] if last_ts is not None else None
+                data = get_data_since(plan, since)
+                series = series_event(data) if len(data['timestamp']) else None
+                if series:
+                    with self._lock:
+                        self._last_ts[key] = series['ts'][-1]
+
+                # El navegador descarta los intervalos que ya tiene (p. ej. tras
+                # unirse con un last_ts posterior al del grupo)
+                for subscription in members:
+                    event = dict(indicators, series=series) if series else indicators
+                    subscription.send(event)
+
+    def stream(self, subscription):
+        """Generador de la respuesta text/event-stream de un suscriptor"""
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.closed:
+                try:
+                    event = subscription.events.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    # Comentario SSE: mantiene viva la conexión y detecta clientes caídos
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+FEED = LiveFeed()
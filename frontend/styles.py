@@ -69,6 +69,12 @@ TIME_SELECTOR_DROPDOWN_STYLE = {
     'display': 'inline-block'
 }
 
+DEVICE_SELECTOR_LABEL_STYLE = {
+    'fontWeight': 'bold',
+    'marginLeft': '30px',
+    'marginRight': '10px'
+}
+
 # ====
 # ESTILOS DE TARJETAS
 # ====
@@ -203,6 +209,9 @@ GYRO_LINE_CONFIG = {
 ACCEL_FILL_COLOR = 'rgba(231, 76, 60, 0.2)'
 GYRO_FILL_COLOR = 'rgba(52, 152, 219, 0.2)'
 
+# Máximo del intervalo en la línea y media en el tooltip
+MAGNITUDE_HOVER_TEMPLATE = 'máx: %{y:.2f}<br>media: %{customdata:.2f}'
+
 # ====
 # OPCIONES DE DROPDOWN
 # ====
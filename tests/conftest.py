@@ -0,0 +1,15 @@
+"""
+Configuración común de las pruebas (sin base de datos ni AWS IoT)
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# backend/ usa imports planos (from config import ...) y frontend/ es un paquete
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, ROOT)
+
+# backend/config.py valida estas variables al importarse; las pruebas no se conectan
+for name in ('TIMESCALE_HOST', 'TIMESCALE_USER', 'TIMESCALE_PASSWORD', 'AWS_IOT_ENDPOINT'):
+    os.environ.setdefault(name, 'test')
@@ -0,0 +1,93 @@
+"""
+Buffer circular de la caché: intervalos, expulsión y recarga de filas tardías
+"""
+import numpy as np
+from frontend.cache import ROW_BYTES, RecentSampleCache, RingBuffer
+
+def make_rows(timestamps):
+    """Filas (timestamp, ax, ay, az, gx, gy, gz, received_at): |a| = ts % 10, |g| = 1"""
+    return [(int(t), float(t % 10), 0.0, 0.0, 0.0, 0.0, 1.0, None) for t in timestamps]
+
+def make_buffer(timestamps, capacity=10000, max_age=10 ** 6):
+    buffer = RingBuffer(capacity, max_age)
+    buffer.coverage_start = int(timestamps[0])
+    buffer.append(make_rows(timestamps))
+    return buffer
+
+def test_buckets_aggregate_complete_intervals():
+    buffer = make_buffer(np.arange(1000))
+    series = buffer.buckets({'width': 100, 'range': 899})
+
+    # Desde newest - range (100) hasta el último intervalo completo (900 queda fuera)
+    assert series['timestamp'].tolist() == list(range(100, 900, 100))
+    assert series['accel_min'][0] == 0.0
+    assert series['accel_max'][0] == 9.0
+    assert series['accel_mean'][0] == 4.5
+    assert series['gyro_mean'].tolist() == [1.0] * 8
+
+def test_buckets_of_fixed_window_include_last_interval():
+    buffer = make_buffer(np.arange(1000))
+    series = buffer.buckets({'width': 100, 'start': 500, 'end': 950})
+    assert series['timestamp'].tolist() == [500, 600, 700, 800, 900]
+
+def test_buckets_outside_coverage_is_none():
+    buffer = make_buffer(np.arange(100, 1000))
+    assert buffer.buckets({'width': 100, 'range': 950}) is None
+    assert buffer.window(50, 200) is None
+
+def test_capacity_eviction_raises_coverage():
+    buffer = make_buffer(np.arange(100), capacity=150)
+    buffer.append(make_rows(np.arange(100, 200)))
+
+    assert buffer.coverage_start == 50
+    assert buffer.window(0, 200) is None
+    np.testing.assert_array_equal(buffer.window(50, 200)[0], np.arange(50, 200))
+
+def test_age_eviction():
+    buffer = make_buffer(np.arange(100), max_age=30)
+    assert buffer.coverage_start == 69
+    assert buffer.window(69, 100)[0][0] == 69
+
+def test_replace_late_rows_and_counts():
+    buffer = make_buffer(np.arange(30))
+    assert buffer.counts(0, 29, 10) == {0: 10, 10: 10, 20: 10}
+
+    # Recarga de (9, 19]: la base de datos tiene ahora 12, 15 y la fila tardía 19
+    ts = np.array([12, 15, 19])
+    buffer.replace(9, 19, ts, np.full(3, 50.0), np.ones(3))
+
+    assert buffer.counts(0, 29, 10) == {0: 10, 10: 3, 20: 10}
+    window_ts, accel, _ = buffer.window(10, 20)
+    assert window_ts.tolist() == [12, 15, 19]
+    assert accel.tolist() == [50.0, 50.0, 50.0]
+    # Sin recortar, la cobertura no cambia
+    assert buffer.coverage_start == 0
+
+def test_replace_inserts_rows_in_order():
+    buffer = make_buffer(np.arange(0, 100, 10))
+    buffer.replace(40, 60, np.array([45, 50, 55, 60]), np.zeros(4), np.zeros(4))
+
+    ts = buffer.window(0, 100)[0]
+    assert ts.tolist() == [0, 10, 20, 30, 40, 45, 50, 55, 60, 70, 80, 90]
+    # Lo siguiente se sigue anexando después de la última fila
+    buffer.append(make_rows([100]))
+    assert buffer.window(0, 101)[0][-2:].tolist() == [90, 100]
+
+def test_replace_beyond_capacity_trims_oldest():
+    buffer = make_buffer(np.arange(0, 20, 2), capacity=10)
+    buffer.replace(4, 6, np.array([5, 6]), np.zeros(2), np.zeros(2))
+
+    # 11 filas en 10 posiciones: se descarta la más antigua y la cobertura avanza
+    assert buffer.coverage_start == 2
+    assert buffer.window(2, 20)[0].tolist() == [2, 4, 5, 6, 8, 10, 12, 14, 16, 18]
+
+def test_cache_age_limited_to_capacity():
+    max_mb = 1000 * ROW_BYTES * 2 / 1024 / 1024
+    cache = RecentSampleCache(None, max_age=3600 * 1000, max_mb=max_mb, max_devices=2,
+                              sample_rate=100)
+    # 1000 filas por dispositivo a 100 Hz: 10 s
+    assert cache.capacity == 1000
+    assert cache.max_age == 10 * 1000
+
+    cache = RecentSampleCache(None, max_age=5000, max_mb=max_mb, max_devices=2, sample_rate=100)
+    assert cache.max_age == 5000
@@ -0,0 +1,53 @@
+"""
+Filtro de duplicados recientes (reentrega QoS 1)
+"""
+import numpy as np
+from dedup import RecentKeyFilter
+from samples import SAMPLE_DTYPE
+
+def make_samples(timestamps):
+    samples = np.zeros(len(timestamps), dtype=SAMPLE_DTYPE)
+    samples['t'] = timestamps
+    return samples
+
+def test_duplicate_message_only_after_remember():
+    dedup = RecentKeyFilter(max_messages=10, samples_per_device=10)
+    payload = b'{"samples": []}'
+
+    assert not dedup.is_duplicate_message('a', payload)
+    dedup.remember('a', payload, make_samples([]))
+    assert dedup.is_duplicate_message('a', payload)
+    # El resumen incluye el dispositivo
+    assert not dedup.is_duplicate_message('b', payload)
+
+def test_messages_are_forgotten_in_order():
+    dedup = RecentKeyFilter(max_messages=2, samples_per_device=0)
+    for payload in (b'1', b'2', b'3'):
+        dedup.remember('a', payload, make_samples([]))
+
+    assert not dedup.is_duplicate_message('a', b'1')
+    assert dedup.is_duplicate_message('a', b'2')
+    assert dedup.is_duplicate_message('a', b'3')
+
+def test_new_samples_filters_recent_timestamps_per_device():
+    dedup = RecentKeyFilter(max_messages=0, samples_per_device=10)
+    dedup.remember('a', b'x', make_samples([1, 2, 3]))
+
+    assert dedup.new_samples('a', make_samples([2, 3, 4, 5]))['t'].tolist() == [4, 5]
+    assert dedup.new_samples('b', make_samples([2, 3]))['t'].tolist() == [2, 3]
+
+def test_timestamp_ring_keeps_the_newest():
+    dedup = RecentKeyFilter(max_messages=0, samples_per_device=4)
+    dedup.remember('a', b'x', make_samples([1, 2, 3]))
+    dedup.remember('a', b'y', make_samples([4, 5, 6]))
+
+    # Capacidad 4: se olvidaron 1 y 2
+    assert dedup.new_samples('a', make_samples(range(1, 8)))['t'].tolist() == [1, 2, 7]
+
+def test_disabled_filter_passes_everything():
+    dedup = RecentKeyFilter(max_messages=0, samples_per_device=0)
+    samples = make_samples([1, 2])
+    dedup.remember('a', b'x', samples)
+
+    assert not dedup.is_duplicate_message('a', b'x')
+    assert dedup.new_samples('a', samples) is samples
@@ -0,0 +1,43 @@
+"""
+Reducción LTTB y extensión de series reducidas
+"""
+import numpy as np
+import pytest
+from frontend.database import tail_last_ts
+from frontend.downsampling import lttb
+
+@pytest.mark.parametrize('n, n_out', [(1000, 100), (1000, 3), (101, 50), (10, 9)])
+def test_lttb_size_and_endpoints(n, n_out):
+    x = np.arange(n)
+    y = np.sin(x / 7.0)
+    selected = lttb(x, y, n_out)
+
+    assert len(selected) == n_out
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert (np.diff(selected) > 0).all()
+
+@pytest.mark.parametrize('n_out', [2, 10, 20])
+def test_lttb_keeps_short_series(n_out):
+    np.testing.assert_array_equal(lttb(np.arange(10), np.zeros(10), n_out), np.arange(10))
+
+def test_lttb_keeps_peaks():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[[250, 500, 750]] = [5.0, -5.0, 8.0]
+    selected = lttb(x, y, 50)
+
+    assert {250, 500, 750} <= set(selected.tolist())
+
+def test_tail_starts_after_the_shown_interval():
+    plan = {'width': 100}
+    tail = {'width': 1000}
+
+    # Lo mostrado llega hasta 2050: el intervalo [2000, 3000) se omite
+    assert tail_last_ts(plan, tail, 1950) == 2000
+    # Si termina justo en un múltiplo no se omite nada
+    assert tail_last_ts(plan, tail, 1900) == 1000
+
+def test_tail_without_resampling_is_unchanged():
+    plan = {'width': 100}
+    assert tail_last_ts(plan, plan, 1950) == 1950
+    assert tail_last_ts(plan, {'width': 1000}, None) is None
@@ -0,0 +1,63 @@
+"""
+Decodificación de payloads JSON y binarios del ESP32
+"""
+import json
+import numpy as np
+import pytest
+from payload import (
+    BINARY_HEADER, BINARY_MAGIC, PACKED_SAMPLE_DTYPE, decode_payload, encode_binary
+)
+from samples import SAMPLE_DTYPE
+
+def make_samples(count):
+    samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+    samples['t'] = 1_700_000_000_000 + np.arange(count) * 10
+    samples['ax'] = 0.25
+    samples['gz'] = -1.5
+    return samples
+
+def test_json_payload():
+    payload = json.dumps({'samples': [
+        {'t': 1, 'a': [0.1, 0.2, 0.3], 'g': [1, 2, 3]},
+        {'t': 2, 'a': [0.4, 0.5, 0.6], 'g': [4, 5, 6]},
+    ]}).encode('utf-8')
+
+    samples = decode_payload(payload)
+    assert samples.dtype == SAMPLE_DTYPE
+    assert samples['t'].tolist() == [1, 2]
+    assert samples['gz'].tolist() == [3.0, 6.0]
+
+def test_json_payload_without_samples():
+    assert len(decode_payload(b'{}')) == 0
+
+def test_binary_round_trip():
+    samples = make_samples(4)
+    decoded = decode_payload(encode_binary(samples))
+
+    assert decoded.dtype == PACKED_SAMPLE_DTYPE
+    np.testing.assert_array_equal(decoded['t'], samples['t'])
+    np.testing.assert_array_equal(decoded['ax'], samples['ax'].astype(np.float32))
+
+@pytest.mark.parametrize('payload, message', [
+    (bytes([BINARY_MAGIC]), 'sin cabecera'),
+    (BINARY_HEADER.pack(BINARY_MAGIC, 2, 0), 'Versión'),
+    (BINARY_HEADER.pack(BINARY_MAGIC, 1, 2) + bytes(PACKED_SAMPLE_DTYPE.itemsize), 'Tamaño'),
+    (encode_binary(make_samples(1)) + b'\x00', 'Tamaño'),
+])
+def test_invalid_binary_payload(payload, message):
+    with pytest.raises(ValueError, match=message):
+        decode_payload(payload)
+
+@pytest.mark.parametrize('payload', [
+    b'{"samples": [',
+    b'\xff\xfe',
+    b'',
+    b'[1, 2]',
+    b'{"samples": [{"t": 1, "a": [0.1, 0.2, 0.3]}]}',
+    b'{"samples": [{"t": 1, "a": [0.1], "g": [1, 2, 3]}]}',
+    b'{"samples": [{"t": 1, "a": null, "g": [1, 2, 3]}]}',
+])
+def test_invalid_json_payload(payload):
+    # Todo error de formato es ValueError: el receptor lo cuenta en DECODE_ERRORS y sigue
+    with pytest.raises(ValueError):
+        decode_payload(payload)
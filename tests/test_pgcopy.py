@@ -0,0 +1,67 @@
+"""
+Lectura de buffers de COPY binario construidos a mano
+"""
+import struct
+import numpy as np
+import pytest
+from frontend.pgcopy import PGCOPY_SIGNATURE, PGCOPY_TRAILER, PG_EPOCH_US, parse_copy
+
+FIELDS = [('timestamp', 'int8'), ('ax', 'float8'), ('received_at', 'timestamptz')]
+
+def header(extension=b''):
+    return PGCOPY_SIGNATURE + struct.pack('!ii', 0, len(extension)) + extension
+
+def row(timestamp, ax, received_us):
+    return (struct.pack('!h', 3)
+            + struct.pack('!iq', 8, timestamp)
+            + struct.pack('!id', 8, ax)
+            + struct.pack('!iq', 8, received_us - PG_EPOCH_US))
+
+def test_parses_columns():
+    received = int(np.datetime64('2026-10-16T12:00:00.123456', 'us').astype(np.int64))
+    data = header() + row(1, 0.5, received) + row(2, -1.25, received + 1) + PGCOPY_TRAILER
+
+    columns = parse_copy(data, FIELDS)
+    assert columns['timestamp'].tolist() == [1, 2]
+    assert columns['timestamp'].dtype == np.int64
+    assert columns['ax'].tolist() == [0.5, -1.25]
+    assert columns['received_at'][0] == np.datetime64('2026-10-16T12:00:00.123456')
+    assert columns['received_at'].dtype == np.dtype('datetime64[us]')
+
+def test_skips_header_extension():
+    data = header(b'\x00' * 6) + row(7, 1.0, PG_EPOCH_US) + PGCOPY_TRAILER
+    assert parse_copy(data, FIELDS)['timestamp'].tolist() == [7]
+
+def test_empty_result():
+    columns = parse_copy(header() + PGCOPY_TRAILER, FIELDS)
+    assert all(len(values) == 0 for values in columns.values())
+
+def test_null_field_raises():
+    # NULL: longitud -1 y sin valor; se rellena la fila hasta el ancho fijo para
+    # que falle la comprobación de longitudes y no la del tamaño total
+    null_row = (struct.pack('!h', 3) + struct.pack('!iq', 8, 1)
+                + struct.pack('!i', -1) + b'\x00' * 8
+                + struct.pack('!iq', 8, 0))
+    with pytest.raises(ValueError, match='NULL'):
+        parse_copy(header() + null_row + PGCOPY_TRAILER, FIELDS)
+
+def test_null_field_without_padding_raises():
+    null_row = (struct.pack('!h', 3) + struct.pack('!iq', 8, 1)
+                + struct.pack('!i', -1) + struct.pack('!iq', 8, 0))
+    with pytest.raises(ValueError):
+        parse_copy(header() + null_row + PGCOPY_TRAILER, FIELDS)
+
+@pytest.mark.parametrize('data, message', [
+    (b'NOTCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0) + PGCOPY_TRAILER, 'no es COPY'),
+    (header() + row(1, 0.5, PG_EPOCH_US), 'incompleto'),
+    (PGCOPY_SIGNATURE, 'no es COPY'),
+])
+def test_invalid_buffer_raises(data, message):
+    with pytest.raises(ValueError, match=message):
+        parse_copy(data, FIELDS)
+
+def test_unexpected_column_count_raises():
+    # Mismo ancho de fila, pero la fila declara otro número de columnas
+    data = header() + struct.pack('!h', 2) + row(1, 0.5, PG_EPOCH_US)[2:] + PGCOPY_TRAILER
+    with pytest.raises(ValueError, match='columnas'):
+        parse_copy(data, FIELDS)